@@ -815,11 +815,8 @@ class Controller(object):
                     classification = model_result_files[index][0]
                     heatmap = model_result_files[index][1]
 
-                    classified_area = self._model.estimate_garbage_area(classification, "classified")
-                    low_area = self._model.estimate_garbage_area(heatmap, "heatmap", "low")
-                    medium_area = self._model.estimate_garbage_area(heatmap, "heatmap", "medium")
-                    high_area = self._model.estimate_garbage_area(heatmap, "heatmap", "high")
-                    values = [classified_area, low_area, medium_area, high_area]
+                    areas = self._model.estimate_garbage_areas(classified=classification, heatmap=heatmap)
+                    values = [areas["classified"], areas["low"], areas["medium"], areas["high"]]
 
                     if all([not (val is None) for val in values]):
                         labels = ["classified", "low", "medium", "high"]
@@ -1625,7 +1622,7 @@ class Controller(object):
                     classification_file = name + "_classified" + extension
                     if os.path.exists(classification_file):
                         with rasterio.open(classification_file, "r") as classification_dataset:
-                            classification_data = classification_dataset.read(1)
+                            classification_data = classification_dataset.read(1, masked=True).filled(0)
                     else:
                         classification_data = np.zeros(shape=(rows, cols), dtype=int)
                     self._model.add_classification_layer(file, classification_data)
@@ -5,9 +5,10 @@ import numpy as np
 import pandas as pd
 
 from matplotlib import cm
+from collections import OrderedDict
 
 from model.index_calculator import IndexCalculator
-from model.unet import UNET, UNETPP
+from model.registry import registry
 
 from PIL import ImageColor
 from model.model import Model
@@ -16,7 +17,6 @@ from model.persistence import Persistence
 from matplotlib.colors import ListedColormap
 from typing import List, Tuple, Callable, Dict
 from sklearn.ensemble import RandomForestClassifier
-import torch
 
 HEATMAP_COLORS = {0: "#000000", 1: "#1fff00", 2: "#fff300", 3: "#ff0000"}
 
@@ -129,8 +129,7 @@ class ViewModel(Model):
         :raise HotspotRandomForestFileException: if Random Forest file is incorrect for Hot-spot detection method
         """
         try:
-            with open(self.persistence.hotspot_rf_path, "rb") as file:
-                self._hotspot_rf = pickle.load(file)
+            self._hotspot_rf = registry.get_random_forest(self.persistence.hotspot_rf_path)
         except Exception:
             self._hotspot_rf = None
             raise HotspotRandomForestFileException()
@@ -142,8 +141,7 @@ class ViewModel(Model):
         :raise FloatingRandomForestFileException: if Random Forest file is incorrect for Floating waste detection method
         """
         try:
-            with open(self.persistence.floating_rf_path, "rb") as file:
-                self._floating_rf = pickle.load(file)
+            self._floating_rf = registry.get_random_forest(self.persistence.floating_rf_path)
         except Exception:
             self._floating_rf = None
             raise FloatingRandomForestFileException()
@@ -155,9 +153,9 @@ class ViewModel(Model):
         :raise UNETFileException: if UNET file is incorrect
         """
         try:
-            self._unet = UNET()
-            unet_state_dict = torch.load(self.persistence.unet_path, weights_only=True)
-            self._unet.load_state_dict(unet_state_dict["model_state_dict"])
+            if self._load_exported_unet():
+                return
+            self._unet = registry.get_unet(self.persistence.unet_path, "unet")
         except Exception:
             raise UNETFileException("unet")
 
@@ -168,13 +166,13 @@ class ViewModel(Model):
         :raise UNETFileException: if UNET++ file is incorrect
         """
         try:
-            unet_state_dict = torch.load(self.persistence.unet_path, weights_only=True)
-            if unet_state_dict["pretrained"]:
-                base_unet = UNET()
-            else:
-                base_unet = None
-            self._unet = UNETPP(pretrained_unet=base_unet, deep_vision=unet_state_dict["deep_vision"])
-            self._unet.load_state_dict(unet_state_dict["model_state_dict"])
+            if self._load_exported_unet():
+                return
+            pruning_level = (
+                self.persistence.unetpp_pruning_level if hasattr(self.persistence, "unetpp_pruning_level") else 0
+            )
+            low_memory = self.persistence.unetpp_low_memory if hasattr(self.persistence, "unetpp_low_memory") else False
+            self._unet = registry.get_unet(self.persistence.unet_path, "unetpp", pruning_level, low_memory)
         except Exception:
             raise UNETFileException("unet++")
 
@@ -442,15 +440,13 @@ class ViewModel(Model):
         """
 
         labeled_layer = self._classification_layer_data[training_file].copy()
-        polygons = usable_training_data[training_file]
-        for c_id, polygon_data in polygons.items():
-            c_name, coords, bbox_coords = polygon_data
-            for i in range(len(coords)):
-                indices = Model.get_coords_inside_polygon(coords[i], bbox_coords[i])
-                indices = np.asarray(indices).transpose()
-                labeled_layer[indices[1], indices[0]] = c_id * 100
+        polygons = [
+            (coords[i], bbox_coords[i], c_id * 100)
+            for c_id, (c_name, coords, bbox_coords) in usable_training_data[training_file].items()
+            for i in range(len(coords))
+        ]
 
-        return labeled_layer
+        return Model.rasterize_polygons(labeled_layer, polygons)
 
     def create_training_df(self, usable_training_data: Dict[str, Dict]) -> Tuple[pd.DataFrame, Dict[str, np.ndarray]]:
         """
@@ -473,9 +469,9 @@ class ViewModel(Model):
         classified_layers = self._classification_layer_data
 
         for training_file, labeled_layer in classified_layers.items():
-            bands = self.get_bands(training_file, band_names, "float32")
+            bands = self.get_bands(training_file, Model.get_input_band_names(band_names, index_names), "float32")
             indices = IndexCalculator.calculate_indices(index_names, bands)
-            bands_and_indices = bands.copy()
+            bands_and_indices = OrderedDict((name, bands[name]) for name in band_names)
             bands_and_indices.update(indices)
             bands_and_indices = list(bands_and_indices.values())
             bands_and_indices = np.asarray(bands_and_indices)
@@ -561,9 +557,10 @@ class ViewModel(Model):
         """
 
         with rasterio.open(input_path, "r") as dataset:
-            input_array = dataset.read(1)
+            # the nodata pixels are transparent, they do not get a color
+            input_array = dataset.read(1, masked=True)
 
-            unique_values = np.unique(input_array)
+            unique_values = np.unique(input_array.compressed())
             cond_list = all([val % 100 == 0 for val in unique_values])
 
             if not cond_list:
@@ -649,6 +646,20 @@ class ViewModel(Model):
         self._classification_mode = "polygon"
         self._classification_layer_data = dict()
 
+    def _load_exported_unet(self) -> bool:
+        """
+        Loads the exported UNET or UNET++ network if a TorchScript or ONNX backend is set.
+
+        :return: whether an exported network is loaded
+        """
+
+        unet_backend = self.persistence.unet_backend if hasattr(self.persistence, "unet_backend") else "eager"
+        if unet_backend == "eager":
+            return False
+
+        self._unet = registry.get_unet_backend(self.persistence.unet_export_path, unet_backend)
+        return True
+
     def _process_hotspot_floating(self, hotspot: bool) -> Tuple[bool, bool]:
         """
         Creates the output images of both the Hotspot and Floating waste detection processes.
@@ -795,6 +806,7 @@ class ViewModel(Model):
                         band_count=1,
                         output_path=before_path,
                         new_geo_trans=coords_information[0],
+                        profile=self.get_output_profile("washed_up"),
                     )
 
                     Model.save_tif(
@@ -804,6 +816,7 @@ class ViewModel(Model):
                         band_count=1,
                         output_path=after_path,
                         new_geo_trans=coords_information[0],
+                        profile=self.get_output_profile("washed_up"),
                     )
 
                     if not ((file_1, file_2, before_path, after_path) in self._result_files_washed_up):
@@ -825,9 +838,10 @@ class ViewModel(Model):
         """
 
         with rasterio.open(input_path, "r") as dataset:
-            input_array = dataset.read(1)
+            # the nodata pixels are transparent, they do not get a color
+            input_array = dataset.read(1, masked=True)
 
-            unique_values = np.unique(input_array)
+            unique_values = np.unique(input_array.compressed())
             cond_list = all([val in HEATMAP_COLORS.keys() for val in unique_values])
 
             if not cond_list:
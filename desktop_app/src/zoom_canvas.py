@@ -151,7 +151,8 @@ class ZoomCanvas(ttk.Frame):
                     if dataset.width * dataset.height > MAX_PIXEL_COUNT:
                         raise TooLargeImageException(dataset.width * dataset.height, MAX_PIXEL_COUNT, input_path)
 
-                    dataset = dataset.read(1)
+                    # the nodata pixels (e.g. 255 of the uint8 outputs) are NaN, so they are transparent
+                    dataset = dataset.read(1, out_dtype="float32", masked=True).filled(np.nan)
 
                     unique_values = np.unique(dataset)
 
@@ -0,0 +1,218 @@
+import os
+import json
+import math
+import logging
+import rasterio
+import numpy as np
+from rasterio.enums import Resampling
+from typing import Dict, Iterable, NamedTuple, Tuple, Union
+
+# the percentiles computed with every full read, so a later percentile stretch does not need another one
+DEFAULT_PERCENTILES = (2.0, 98.0)
+
+# the longest side of the band in the approximate mode, the closest overview of the raster is read
+OVERVIEW_MAX_SIZE = 1024
+
+SIDECAR_SUFFIX = ".stats.json"
+
+
+class BandStatistics(NamedTuple):
+    minimum: float
+    maximum: float
+    percentiles: Dict[float, float]
+    approximate: bool
+
+    def get_stretch(self, percentiles: Union[Tuple[float, float], None] = None) -> Tuple[float, float]:
+        """
+        Returns the lower and upper values of a linear stretch of the band.
+        :param percentiles: the lower and upper percentiles, the minimum and the maximum are used if None
+        :returns: the lower and upper values.
+        """
+        if percentiles is None:
+            return self.minimum, self.maximum
+
+        low, high = percentiles
+        return self.percentiles[float(low)], self.percentiles[float(high)]
+
+
+def get_sidecar_path(path: str) -> str:
+    """
+    Returns the path of the file caching the statistics of a raster.
+    :param path: path of the raster
+    :returns: path of the sidecar file.
+    """
+    return path + SIDECAR_SUFFIX
+
+
+def get_stamp(path: str) -> Tuple[int, int]:
+    """
+    Returns the modification time and the size of a file, the cached statistics are invalid if they change.
+    :param path: path of the file
+    :returns: the modification time in nanoseconds and the size in bytes.
+    """
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def load_sidecar(path: str) -> Dict:
+    """
+    Loads the cached statistics of a raster, the statistics of an outdated sidecar file are ignored.
+    :param path: path of the raster
+    :returns: the cached statistics by "<band>/<mode>", empty if there are none.
+    """
+    try:
+        with open(get_sidecar_path(path), "r") as file:
+            sidecar = json.load(file)
+    except (OSError, ValueError):
+        return dict()
+
+    if sidecar.get("stamp") != list(get_stamp(path)):
+        return dict()
+
+    return sidecar.get("bands", dict())
+
+
+def save_sidecar(path: str, bands: Dict) -> None:
+    """
+    Saves the statistics of a raster next to it. The file is replaced atomically,
+    and the failure to write it (e.g. in a read-only directory) is only logged.
+    :param path: path of the raster
+    :param bands: the statistics by "<band>/<mode>"
+    """
+    sidecar_path = get_sidecar_path(path)
+    temp_path = f"{sidecar_path}.{os.getpid()}.tmp"
+
+    try:
+        with open(temp_path, "w") as file:
+            json.dump({"stamp": list(get_stamp(path)), "bands": bands}, file)
+        os.replace(temp_path, sidecar_path)
+    except OSError as error:
+        logging.warning("Could not cache the band statistics of %s: %s", path, error)
+
+
+def get_stored_statistics(img: rasterio.DatasetReader, band: int, approximate: bool) -> Union[BandStatistics, None]:
+    """
+    Returns the minimum and the maximum stored in the GeoTIFF metadata or in the .aux.xml file of GDAL.
+    :param img: the opened raster
+    :param band: serial number of the band
+    :param approximate: whether approximate statistics (computed by GDAL on an overview) are accepted
+    :returns: the statistics without percentiles, None if they are not stored.
+    """
+    tags = img.tags(band)
+    if "STATISTICS_MINIMUM" not in tags or "STATISTICS_MAXIMUM" not in tags:
+        return None
+
+    stored_approximate = tags.get("STATISTICS_APPROXIMATE", "NO").upper() == "YES"
+    if stored_approximate and not approximate:
+        return None
+
+    return BandStatistics(
+        float(tags["STATISTICS_MINIMUM"]), float(tags["STATISTICS_MAXIMUM"]), dict(), stored_approximate
+    )
+
+
+def read_band(img: rasterio.DatasetReader, band: int, approximate: bool, max_size: int) -> np.ndarray:
+    """
+    Reads a band, or its downsampled version from the closest overview in the approximate mode.
+    :param img: the opened raster
+    :param band: serial number of the band
+    :param approximate: whether the band is downsampled
+    :param max_size: the longest side of the downsampled band
+    :returns: the pixel values.
+    """
+    factor = math.ceil(max(img.height, img.width) / max_size) if approximate else 1
+    if factor <= 1:
+        return img.read(band)
+
+    out_shape = (math.ceil(img.height / factor), math.ceil(img.width / factor))
+    return img.read(band, out_shape=out_shape, resampling=Resampling.nearest)
+
+
+def compute_statistics(
+    values: np.ndarray, percentiles: Iterable[float], approximate: bool, nodata: Union[float, None] = None
+) -> BandStatistics:
+    """
+    Computes the statistics of pixel values, the NaN and the nodata values are ignored.
+    :param values: the pixel values
+    :param percentiles: the percentiles to compute, between 0 and 100
+    :param approximate: whether the values are a downsampled version of the band
+    :param nodata: the nodata value of the band, if any
+    :returns: the statistics, NaN if all values are NaN or nodata.
+    """
+    values = values.ravel()
+    if np.issubdtype(values.dtype, np.floating):
+        values = values[~np.isnan(values)]
+    if nodata is not None and not math.isnan(nodata):
+        values = values[values != nodata]
+
+    percentiles = sorted(set(float(percentile) for percentile in percentiles))
+    if values.size == 0:
+        return BandStatistics(math.nan, math.nan, {percentile: math.nan for percentile in percentiles}, approximate)
+
+    percentile_values = np.percentile(values, percentiles) if percentiles else []
+
+    return BandStatistics(
+        float(values.min()),
+        float(values.max()),
+        {percentile: float(value) for percentile, value in zip(percentiles, percentile_values)},
+        approximate,
+    )
+
+
+def get_band_statistics(
+    path: str,
+    band: int,
+    approximate: bool = False,
+    percentiles: Iterable[float] = DEFAULT_PERCENTILES,
+    max_size: int = OVERVIEW_MAX_SIZE,
+    use_cache: bool = True,
+) -> BandStatistics:
+    """
+    Returns the statistics of a band. The statistics are looked up in the following order:
+    the sidecar file of the raster, the statistics stored by GDAL (only if no percentiles are requested),
+    then they are computed from the band (or from an overview in the approximate mode) and saved to the sidecar file.
+    Exact statistics are returned in the approximate mode too, if they are already known.
+    :param path: path of the raster
+    :param band: serial number of the band
+    :param approximate: whether approximate statistics are accepted
+    :param percentiles: the percentiles to return, between 0 and 100
+    :param max_size: the longest side of the downsampled band in the approximate mode
+    :param use_cache: whether the sidecar file is used
+    :returns: the statistics.
+    """
+    percentiles = [float(percentile) for percentile in percentiles]
+    modes = ["exact", "approximate"] if approximate else ["exact"]
+
+    bands = load_sidecar(path) if use_cache else dict()
+    for mode in modes:
+        cached = bands.get(f"{band}/{mode}")
+        if cached is not None and all(str(percentile) in cached["percentiles"] for percentile in percentiles):
+            return BandStatistics(
+                cached["minimum"],
+                cached["maximum"],
+                {float(percentile): value for percentile, value in cached["percentiles"].items()},
+                mode == "approximate",
+            )
+
+    with rasterio.open(path, "r") as img:
+        if not percentiles:
+            stored = get_stored_statistics(img, band, approximate)
+            if stored is not None:
+                return stored
+
+        values = read_band(img, band, approximate, max_size)
+        nodata = img.nodatavals[band - 1]
+
+    # a band small enough is read fully in the approximate mode as well
+    mode = "approximate" if values.size < img.height * img.width else "exact"
+    statistics = compute_statistics(values, percentiles + list(DEFAULT_PERCENTILES), mode == "approximate", nodata)
+
+    if use_cache:
+        bands[f"{band}/{mode}"] = {
+            "minimum": statistics.minimum,
+            "maximum": statistics.maximum,
+            "percentiles": {str(percentile): value for percentile, value in statistics.percentiles.items()},
+        }
+        save_sidecar(path, bands)
+
+    return statistics
@@ -1,6 +1,14 @@
+import pyproj
+import cv2 as cv
 import numpy as np
+from affine import Affine
+from rasterio.crs import CRS
 from model.treshold import Treshold
-from typing import List
+import model.projections as projections
+from typing import Dict, List, NamedTuple, Tuple, Union
+
+# the values are counted with 16 bit histograms, larger values are counted with np.unique
+MAX_HISTOGRAM_VALUE = 65535
 
 
 def create_heatmap(probabilities: np.ndarray, tresholds: List[Treshold]) -> np.ndarray:
@@ -17,3 +25,121 @@ def create_heatmap(probabilities: np.ndarray, tresholds: List[Treshold]) -> np.n
         heatmap[probabilities >= treshold.percentage] = treshold.label
 
     return heatmap
+
+
+class AreaStatistics(NamedTuple):
+    counts: Dict[int, int]
+    pixel_area: Union[float, None]
+
+    def get_area(self, value: int) -> Union[float, None]:
+        """
+        Calculates the area covered by the pixels of a value.
+        :param value: the pixel value, e.g. a class id or a heatmap level
+        :returns: the area, None if the pixel area is unknown.
+        """
+        if self.pixel_area is None:
+            return None
+
+        return self.counts.get(value, 0) * self.pixel_area
+
+
+def count_values(array: np.ndarray, block_size: int = 1 << 22) -> Dict[int, int]:
+    """
+    Counts the pixels of every non-negative integer value of an array in one pass.
+    NaN, negative and fractional values are ignored. The array is processed in blocks of block_size pixels,
+    so the temporary arrays are small even for large images.
+    :param array: array of any shape and numeric type
+    :param block_size: the number of pixels processed at once
+    :returns: the number of pixels by value, only for the values present in the array.
+    """
+    # the float32 histogram counts of OpenCV are exact below 2^24
+    block_size = min(block_size, (1 << 24) - 1)
+    values = np.asarray(array).ravel()
+    counts = np.zeros(shape=0, dtype=np.int64)
+    other_counts = dict()
+
+    for start in range(0, values.size, block_size):
+        block = values[start : start + block_size]
+        if block.dtype in [np.uint8, np.uint16]:
+            counts = add_counts(counts, get_histogram(block))
+            continue
+
+        with np.errstate(invalid="ignore"):
+            integers = block.astype(np.uint16)
+        # NaN, negative, fractional and too large values, counted in the bin of 0 and removed from it
+        invalid = integers != block
+        integers[invalid] = 0
+        block_counts = get_histogram(integers)
+        block_counts[0] -= np.count_nonzero(invalid)
+        counts = add_counts(counts, block_counts)
+
+        large = block[invalid & (block > MAX_HISTOGRAM_VALUE)]
+        large = large[np.isfinite(large) & (large == np.floor(large))]
+        for value, count in zip(*np.unique(large, return_counts=True)):
+            other_counts[int(value)] = other_counts.get(int(value), 0) + int(count)
+
+    value_counts = {int(value): int(counts[value]) for value in np.flatnonzero(counts)}
+    value_counts.update(other_counts)
+
+    return value_counts
+
+
+def get_histogram(block: np.ndarray) -> np.ndarray:
+    """
+    Counts the values of a block of 8 or 16 bit unsigned integers.
+    :param block: 1D array with less than 2^24 values
+    :returns: the counts of every possible value.
+    """
+    # the 8 bit histogram is much faster, and classifications and heatmaps usually fit into it
+    if block.dtype == np.uint16 and block.size > 0 and block.max() <= np.iinfo(np.uint8).max:
+        block = block.astype(np.uint8)
+    bins = np.iinfo(block.dtype).max + 1
+
+    return cv.calcHist([block], [0], None, [bins], [0, bins]).ravel().astype(np.int64)
+
+
+def add_counts(counts: np.ndarray, block_counts: np.ndarray) -> np.ndarray:
+    """
+    Adds the counts of a block to the total counts, the shorter array is padded with zeros.
+    :param counts: the total counts by value
+    :param block_counts: the counts of the block by value
+    :returns: the sum of the counts.
+    """
+    if len(block_counts) > len(counts):
+        counts = np.pad(counts, (0, len(block_counts) - len(counts)))
+    counts[: len(block_counts)] += block_counts
+
+    return counts
+
+
+def get_pixel_area(transform: Affine, crs: Union[CRS, None], shape: Tuple[int, int] = (1, 1)) -> Union[float, None]:
+    """
+    Calculates the area of a pixel on the ground from the geotransform of an image.
+    The area is measured on the ellipsoid at the centre pixel of the image, since the determinant of the geotransform
+    is only the area in the units of the CRS (e.g. Web Mercator inflates it by sec^2 of the latitude).
+    :param transform: the affine geotransform of the image
+    :param crs: the coordinate reference system of the image
+    :param shape: the height and the width of the image
+    :returns: the area in square metres, None if the CRS is not projected.
+    """
+    if crs is None or not crs.is_projected:
+        return None
+
+    # the corners of the centre pixel
+    row, col = shape[0] // 2, shape[1] // 2
+    cols = np.array([col, col + 1, col + 1, col], dtype=np.float64)
+    rows = np.array([row, row, row + 1, row + 1], dtype=np.float64)
+    corners = np.stack(
+        [
+            transform.a * cols + transform.b * rows + transform.c,
+            transform.d * cols + transform.e * rows + transform.f,
+        ],
+        axis=-1,
+    )
+
+    projected = pyproj.CRS.from_wkt(crs.to_wkt())
+    geodetic = projected.geodetic_crs
+    lonlat = projections.transform_coordinates(corners, projected.to_wkt(), geodetic.to_wkt())
+    area, _ = geodetic.get_geod().polygon_area_perimeter(lonlat[:, 0], lonlat[:, 1])
+
+    return abs(area)
@@ -1,5 +1,12 @@
 from osgeo import gdal
 import numpy as np
+from typing import Dict, List, Tuple, Union
+
+DATA_TYPES = {
+    "uint8": gdal.GDT_Byte,
+    "uint16": gdal.GDT_UInt16,
+    "float32": gdal.GDT_Float32,
+}
 
 
 def create_in_memory_dataset(data: np.ndarray, input_ds: gdal.Dataset, datatype=gdal.GDT_Int32) -> gdal.Dataset:
@@ -20,3 +27,88 @@ def create_in_memory_dataset(data: np.ndarray, input_ds: gdal.Dataset, datatype=
     mask_band.SetNoDataValue(0)
 
     return ds
+
+
+def get_output_data_type(arrays: List[np.ndarray], profile: Dict = None) -> Tuple[int, Union[float, None]]:
+    """
+    Selects the data type and the no data value of an output image based on the output profile.
+    :param arrays: the bands of the output image
+    :param profile: the output profile, see get_creation_options
+    :returns: the GDAL data type and the no data value (None if it is not needed).
+    NaN values of the arrays must be replaced with the latter.
+    """
+    data_type = profile.get("data_type", "float32") if profile is not None else "float32"
+
+    if data_type == "auto":
+        data_type = get_smallest_data_type(arrays)
+
+    if data_type not in DATA_TYPES:
+        raise ValueError(f"Unsupported output data type: {data_type}")
+
+    if data_type == "float32":
+        return DATA_TYPES[data_type], float("NaN")
+
+    has_nan = any(np.isnan(array).any() for array in arrays)
+
+    return DATA_TYPES[data_type], float(np.iinfo(data_type).max) if has_nan else None
+
+
+def get_smallest_data_type(arrays: List[np.ndarray]) -> str:
+    """
+    Selects the smallest data type from uint8, uint16 and float32 that can hold the values of the arrays.
+    If there are NaN values, the largest value of the integer types is kept for the no data value.
+    :param arrays: the bands of an image
+    :returns: the name of the data type.
+    """
+    max_value, has_nan = 0, False
+
+    for array in arrays:
+        nan_mask = np.isnan(array)
+        has_nan = has_nan or nan_mask.any()
+
+        values = array[~nan_mask]
+        if values.size == 0:
+            continue
+
+        if np.isinf(values).any() or values.min() < 0 or not np.array_equal(values, np.trunc(values)):
+            return "float32"
+
+        max_value = max(max_value, values.max())
+
+    for data_type in ["uint8", "uint16"]:
+        limit = np.iinfo(data_type).max if has_nan else np.iinfo(data_type).max + 1
+        if max_value < limit:
+            return data_type
+
+    return "float32"
+
+
+def get_creation_options(profile: Dict = None, data_type: int = gdal.GDT_Float32) -> List[str]:
+    """
+    Creates the GTiff creation options of an output profile.
+    The profile can contain the following keys:
+    "data_type": "auto", "uint8", "uint16" or "float32",
+    "compress": compression method, e.g. "DEFLATE", "ZSTD", "LZW" or "NONE",
+    "predictor": whether the predictor is used (horizontal differencing for integers, floating point for floats),
+    "tiled": whether the image is tiled,
+    "tile_size": width and height of the tiles (multiple of 16).
+    :param profile: the output profile, None means an uncompressed striped image
+    :param data_type: the GDAL data type of the output image
+    :returns: the list of creation options.
+    """
+    if profile is None:
+        return list()
+
+    options = list()
+
+    if profile.get("tiled", False):
+        tile_size = profile.get("tile_size", 256)
+        options += ["TILED=YES", f"BLOCKXSIZE={tile_size}", f"BLOCKYSIZE={tile_size}"]
+
+    compress = profile.get("compress", "NONE").upper()
+    if compress != "NONE":
+        options += [f"COMPRESS={compress}", "BIGTIFF=IF_SAFER"]
+        if profile.get("predictor", False):
+            options.append("PREDICTOR=3" if data_type == gdal.GDT_Float32 else "PREDICTOR=2")
+
+    return options
@@ -1,108 +1,387 @@
 from collections import OrderedDict
-from typing import List
+from typing import List, Dict, Tuple, Union
 import numpy as np
 
+# sub-expressions of the fraction based indices: name -> (ufunc, left operand, right operand),
+# the operands are band names, names of other sub-expressions or numbers
+TERMS = {
+    "nir+red": (np.add, "nir", "red"),
+    "nir-red": (np.subtract, "nir", "red"),
+    "red+nir": (np.add, "red", "nir"),
+    "red-nir": (np.subtract, "red", "nir"),
+    "green+nir": (np.add, "green", "nir"),
+    "green-nir": (np.subtract, "green", "nir"),
+    "swir+nir": (np.add, "swir", "nir"),
+    "swir-nir": (np.subtract, "swir", "nir"),
+    "red+green": (np.add, "red", "green"),
+    "red+green+nir": (np.add, "red+green", "nir"),
+    "(red+green+nir)/3": (np.divide, "red+green+nir", 3),
+    "1-(red+green+nir)/3": (np.subtract, 1, "(red+green+nir)/3"),
+}
+
+# (numerator, denominator) of the fraction based indices
+FRACTIONS = {
+    "pi": ("nir", "nir+red"),
+    "ndwi": ("green-nir", "green+nir"),
+    "ndvi": ("nir-red", "nir+red"),
+    "rndvi": ("red-nir", "red+nir"),
+    "sr": ("nir", "red"),
+    "apwi": ("blue", "1-(red+green+nir)/3"),
+    "mndbi": ("swir-nir", "swir+nir"),
+}
+
+# indices combined from other indices
+COMBINED = {
+    "api": ("pi", "ndvi", "mndbi"),
+}
+
 
 class IndexCalculator(object):
+    # number of pixels processed at once by calculate_indices
+    BLOCK_PIXELS = 1 << 16
+
     @staticmethod
-    def calculate_indices(index_names: List[str], bands: OrderedDict) -> OrderedDict:
+    def calculate_indices(
+        index_names: List[str],
+        bands: OrderedDict,
+        numerator_ranges: Dict[str, Tuple[float, float]] = None,
+        out: np.ndarray = None,
+        block_pixels: int = None,
+    ) -> OrderedDict:
         """
-        Calculates indices using the given satellite bands
+        Calculates indices using the given satellite bands.
+        The indices are calculated together in blocks of rows, so the sums and differences of the bands
+        shared by several indices are calculated only once per block, and the temporary arrays are block sized.
+        The indices needed by the requested ones (e.g. PI, NDVI and MNDBI for API) are calculated as well,
+        but they are only returned if they are requested (see get_dependencies and get_required_bands).
+        The result is identical to calculating the indices one by one with calculate_index.
         :param index_names: list of indices to be calculated
         :param bands: a dictionary of bands.
+        :param numerator_ranges: precomputed (min, max) of the numerators, keyed by index name.
+        Needed when the bands only cover a part of the image (see calculate_fraction).
+        :param out: float32 array of shape (number of indices, *band shape) to write the indices into.
+        Allocated if not given.
+        :param block_pixels: the number of pixels processed at once, BLOCK_PIXELS if not given
 
         :returns: a list containing all the indices in the order in which they got requested.
         """
 
+        index_names = list(OrderedDict.fromkeys(index_names))
+        graph = IndexCalculator.get_dependencies(index_names)
+
         indices = OrderedDict()
-        for index_name in index_names:
-            indices[index_name] = IndexCalculator.calculate_index(index_name, bands, indices)
+        if not index_names:
+            return indices
+
+        shape = next(iter(bands.values())).shape
+        if out is None:
+            out = np.empty(shape=(len(index_names),) + shape, dtype="float32")
+        elif out.shape != (len(index_names),) + shape:
+            raise ValueError(f"The shape of out must be {(len(index_names),) + shape}, got {out.shape}")
+
+        for index_name, plane in zip(index_names, out):
+            indices[index_name] = plane
+
+        block_pixels = block_pixels or IndexCalculator.BLOCK_PIXELS
+        row_pixels = int(np.prod(shape[1:]))
+        block_rows = min(max(1, block_pixels // max(row_pixels, 1)), shape[0])
+        blocks = [slice(start, min(start + block_rows, shape[0])) for start in range(0, shape[0], block_rows)]
+
+        # the intermediate indices, which are not requested, are only kept for the current block
+        intermediates = {
+            index_name: np.empty(shape=(block_rows,) + shape[1:], dtype="float32")
+            for index_name in graph
+            if index_name not in indices
+        }
+        numerator_ranges = dict(numerator_ranges) if numerator_ranges else dict()
+        scratch = dict()
+
+        for block in blocks:
+            cache = dict()
+            block_indices = dict()
+            for index_name in graph:
+                if index_name in indices:
+                    index = indices[index_name][block]
+                else:
+                    index = intermediates[index_name][: block.stop - block.start]
+                block_indices[index_name] = index
+
+                if index_name in COMBINED:
+                    pi, ndvi, mndbi = [block_indices[name] for name in COMBINED[index_name]]
+                    IndexCalculator.calculate_api(pi, ndvi, mndbi, out=index)
+                    continue
+
+                numerator_name, denominator_name = FRACTIONS[index_name]
+                numerator = IndexCalculator.calculate_term(numerator_name, bands, block, cache, scratch)
+                denominator = IndexCalculator.calculate_term(denominator_name, bands, block, cache, scratch)
+
+                # 0 / 0 and NaN operands result in NaN, x / 0 in +-inf
+                with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+                    np.divide(numerator, denominator, out=index)
+
+                infinite = np.nonzero(np.isinf(index))
+                if len(infinite[0]) == 0:
+                    continue
+
+                zero = denominator[infinite] == 0
+                if not np.any(zero):
+                    continue
+
+                # the range of the whole numerator is only calculated if there is a zero denominator
+                if numerator_ranges.get(index_name) is None:
+                    numerator_ranges[index_name] = IndexCalculator.calculate_numerator_range(index_name, bands, blocks)
+                numerator_min, numerator_max = numerator_ranges[index_name]
+
+                positions = tuple(axis[zero] for axis in infinite)
+                positive = numerator[positions] > 0
+                index[tuple(axis[positive] for axis in positions)] = numerator_max
+                index[tuple(axis[~positive] for axis in positions)] = numerator_min
 
         return indices
 
     @staticmethod
-    def calculate_index(index: str, bands: OrderedDict, indices: OrderedDict) -> np.ndarray:
+    def get_dependencies(index_names: List[str]) -> List[str]:
+        """
+        Resolves the indices needed to calculate the given indices.
+
+        :param index_names: names of the indices
+        :return: names of the given indices and the indices they are combined from,
+        every index comes after the indices it depends on
+        :raise ValueError: if an index is unknown
+        """
+        dependencies = list()
+
+        def add(index_name: str) -> None:
+            if index_name in dependencies:
+                return
+            if index_name in COMBINED:
+                for dependency in COMBINED[index_name]:
+                    add(dependency)
+            elif index_name not in FRACTIONS:
+                raise ValueError(f"Unknown index: {index_name}")
+            dependencies.append(index_name)
+
+        for index_name in index_names:
+            add(index_name)
+
+        return dependencies
+
+    @staticmethod
+    def get_required_bands(index_names: List[str]) -> List[str]:
+        """
+        Collects the bands needed to calculate the given indices, including the indices they depend on.
+
+        :param index_names: names of the indices
+        :return: names of the bands, in the order of the first use
+        """
+        band_names = list()
+
+        def add(term: Union[str, int]) -> None:
+            if not isinstance(term, str):
+                return
+            if term in TERMS:
+                add(TERMS[term][1])
+                add(TERMS[term][2])
+            elif term not in band_names:
+                band_names.append(term)
+
+        for index_name in IndexCalculator.get_dependencies(index_names):
+            if index_name in FRACTIONS:
+                add(FRACTIONS[index_name][0])
+                add(FRACTIONS[index_name][1])
+
+        return band_names
+
+    @staticmethod
+    def calculate_term(
+        name: Union[str, int], bands: OrderedDict, block: slice, cache: Dict[str, np.ndarray], scratch: Dict
+    ) -> Union[np.ndarray, int]:
+        """
+        Calculates a band, a sub-expression (see TERMS) or a number in a block of rows.
+
+        :param name: name of the band or the sub-expression, or a number
+        :param bands: a dictionary of bands
+        :param block: the rows of the block
+        :param cache: the sub-expressions already calculated in the block
+        :param scratch: the reused buffers of the sub-expressions
+        :return: the values in the block
+        """
+        if not isinstance(name, str):
+            return name
+        if name in bands:
+            return bands[name][block]
+        if name in cache:
+            return cache[name]
+
+        ufunc, left_name, right_name = TERMS[name]
+        left = IndexCalculator.calculate_term(left_name, bands, block, cache, scratch)
+        right = IndexCalculator.calculate_term(right_name, bands, block, cache, scratch)
+
+        rows = block.stop - block.start
+        buffer = scratch.get(name)
+        if buffer is None or buffer.shape[0] < rows:
+            shape = (rows,) + np.shape(left if isinstance(left, np.ndarray) else right)[1:]
+            buffer = scratch[name] = np.empty(shape=shape, dtype=np.result_type(left, right))
+
+        cache[name] = ufunc(left, right, out=buffer[:rows])
+        return cache[name]
+
+    @staticmethod
+    def calculate_numerator_range(index: str, bands: OrderedDict, blocks: List[slice]) -> Tuple[float, float]:
+        """
+        Calculates the (min, max) of the numerator of a fraction based index, ignoring the NaN values.
+
+        :param index: name of the index
+        :param bands: a dictionary of bands
+        :param blocks: the blocks of rows covering the bands
+        :return: the minimum and the maximum, NaN if all values are NaN
+        """
+        numerator_min, numerator_max = np.nan, np.nan
+        scratch = dict()
+        for block in blocks:
+            numerator = IndexCalculator.calculate_term(FRACTIONS[index][0], bands, block, dict(), scratch)
+            numerator_min = np.fmin(numerator_min, np.fmin.reduce(numerator, axis=None))
+            numerator_max = np.fmax(numerator_max, np.fmax.reduce(numerator, axis=None))
+
+        return numerator_min, numerator_max
+
+    @staticmethod
+    def calculate_index(
+        index: str,
+        bands: OrderedDict,
+        indices: OrderedDict,
+        numerator_range: Tuple[float, float] = None,
+    ) -> np.ndarray:
         if index == "pi":
-            return IndexCalculator.calculate_pi(bands["red"], bands["nir"])
+            return IndexCalculator.calculate_pi(bands["red"], bands["nir"], numerator_range)
         if index == "ndwi":
-            return IndexCalculator.calculate_ndwi(bands["green"], bands["nir"])
+            return IndexCalculator.calculate_ndwi(bands["green"], bands["nir"], numerator_range)
         if index == "ndvi":
-            return IndexCalculator.calculate_ndvi(bands["red"], bands["nir"])
+            return IndexCalculator.calculate_ndvi(bands["red"], bands["nir"], numerator_range)
         if index == "rndvi":
-            return IndexCalculator.calculate_rndvi(bands["red"], bands["nir"])
+            return IndexCalculator.calculate_rndvi(bands["red"], bands["nir"], numerator_range)
         if index == "sr":
-            return IndexCalculator.calculate_sr(bands["red"], bands["nir"])
+            return IndexCalculator.calculate_sr(bands["red"], bands["nir"], numerator_range)
         if index == "apwi":
-            return IndexCalculator.calculate_apwi(bands["blue"], bands["green"], bands["red"], bands["nir"])
+            return IndexCalculator.calculate_apwi(
+                bands["blue"], bands["green"], bands["red"], bands["nir"], numerator_range
+            )
         if index == "mndbi":
-            return IndexCalculator.calculate_mndbi(bands["swir"], bands["nir"])
+            return IndexCalculator.calculate_mndbi(bands["swir"], bands["nir"], numerator_range)
+        if index in COMBINED:
+            dependencies = [
+                indices[name] if name in indices else IndexCalculator.calculate_index(name, bands, indices)
+                for name in COMBINED[index]
+            ]
+            return IndexCalculator.calculate_api(*dependencies)
+
+        raise ValueError(f"Unknown index: {index}")
+
+    @staticmethod
+    def calculate_numerator(index: str, bands: OrderedDict) -> Union[np.ndarray, None]:
+        """
+        Returns the numerator of a fraction based index.
+
+        :param index: name of the index
+        :param bands: a dictionary of bands
+        :return: the numerator values, None if the index is not a fraction
+        """
+        if index in ["pi", "sr"]:
+            return bands["nir"]
+        if index == "ndwi":
+            return bands["green"] - bands["nir"]
+        if index == "ndvi":
+            return bands["nir"] - bands["red"]
+        if index == "rndvi":
+            return bands["red"] - bands["nir"]
+        if index == "apwi":
+            return bands["blue"]
+        if index == "mndbi":
+            return bands["swir"] - bands["nir"]
         if index == "api":
-            return IndexCalculator.calculate_api(indices["pi"], indices["ndvi"], indices["mndbi"])
+            return None
 
         raise ValueError(f"Unknown index: {index}")
 
     @staticmethod
-    def calculate_pi(red: np.ndarray, nir: np.ndarray) -> np.ndarray:
+    def calculate_pi(red: np.ndarray, nir: np.ndarray, numerator_range: Tuple[float, float] = None) -> np.ndarray:
         """
         Formula:
         PI = NIR / (NIR + RED)
 
         :param red: Red band values
         :param nir: NIR band values
+        :param numerator_range: precomputed (min, max) of the numerator
         :return: Computed PI values
         """
-        return IndexCalculator.calculate_fraction(numerator=nir, denominator=nir + red)
+        return IndexCalculator.calculate_fraction(numerator=nir, denominator=nir + red, numerator_range=numerator_range)
 
     @staticmethod
-    def calculate_ndwi(green: np.ndarray, nir: np.ndarray) -> np.ndarray:
+    def calculate_ndwi(green: np.ndarray, nir: np.ndarray, numerator_range: Tuple[float, float] = None) -> np.ndarray:
         """
         Formula:
         NDWI = (GREEN - NIR) / (GREEN + NIR)
 
         :param green: Green band values
         :param nir: NIR band values
+        :param numerator_range: precomputed (min, max) of the numerator
         :return: Computed NDWI values
         """
-        return IndexCalculator.calculate_fraction(numerator=green - nir, denominator=green + nir)
+        return IndexCalculator.calculate_fraction(
+            numerator=green - nir, denominator=green + nir, numerator_range=numerator_range
+        )
 
     @staticmethod
-    def calculate_ndvi(red: np.ndarray, nir: np.ndarray) -> np.ndarray:
+    def calculate_ndvi(red: np.ndarray, nir: np.ndarray, numerator_range: Tuple[float, float] = None) -> np.ndarray:
         """
         Formula:
         NDVI = (NIR - RED) / (NIR + RED)
 
         :param red: Red band values
         :param nir: NIR band values
+        :param numerator_range: precomputed (min, max) of the numerator
         :return: Computed NDVI values
         """
-        return IndexCalculator.calculate_fraction(numerator=nir - red, denominator=nir + red)
+        return IndexCalculator.calculate_fraction(
+            numerator=nir - red, denominator=nir + red, numerator_range=numerator_range
+        )
 
     @staticmethod
-    def calculate_rndvi(red: np.ndarray, nir: np.ndarray) -> np.ndarray:
+    def calculate_rndvi(red: np.ndarray, nir: np.ndarray, numerator_range: Tuple[float, float] = None) -> np.ndarray:
         """
         Formula:
         RNDVI = (RED - NIR) / (RED + NIR)
 
         :param red: Red band values
         :param nir: NIR band values
+        :param numerator_range: precomputed (min, max) of the numerator
         :return: Computed RNDVI values
         """
-        return IndexCalculator.calculate_fraction(numerator=red - nir, denominator=red + nir)
+        return IndexCalculator.calculate_fraction(
+            numerator=red - nir, denominator=red + nir, numerator_range=numerator_range
+        )
 
     @staticmethod
-    def calculate_sr(red: np.ndarray, nir: np.ndarray) -> np.ndarray:
+    def calculate_sr(red: np.ndarray, nir: np.ndarray, numerator_range: Tuple[float, float] = None) -> np.ndarray:
         """
         Formula:
         SR = NIR / RED
 
         :param red: Red band values
         :param nir: NIR band values
+        :param numerator_range: precomputed (min, max) of the numerator
         :return: Computed SR values
         """
-        return IndexCalculator.calculate_fraction(numerator=nir, denominator=red)
+        return IndexCalculator.calculate_fraction(numerator=nir, denominator=red, numerator_range=numerator_range)
 
     @staticmethod
-    def calculate_apwi(blue: np.ndarray, green: np.ndarray, red: np.ndarray, nir: np.ndarray) -> np.ndarray:
+    def calculate_apwi(
+        blue: np.ndarray,
+        green: np.ndarray,
+        red: np.ndarray,
+        nir: np.ndarray,
+        numerator_range: Tuple[float, float] = None,
+    ) -> np.ndarray:
         """
         Formula:
         APWI = BLUE / (1 - (RED + GREEN + NIR) / 3)
@@ -111,24 +390,30 @@ class IndexCalculator(object):
         :param green: Green band values
         :param red: Red band values
         :param nir: NIR band values
+        :param numerator_range: precomputed (min, max) of the numerator
         :return: Computed APWI values
         """
-        return IndexCalculator.calculate_fraction(numerator=blue, denominator=1 - (red + green + nir) / 3)
+        return IndexCalculator.calculate_fraction(
+            numerator=blue, denominator=1 - (red + green + nir) / 3, numerator_range=numerator_range
+        )
 
     @staticmethod
-    def calculate_mndbi(swir: np.ndarray, nir: np.ndarray) -> np.ndarray:
+    def calculate_mndbi(swir: np.ndarray, nir: np.ndarray, numerator_range: Tuple[float, float] = None) -> np.ndarray:
         """
         Formula:
         MNDBI = (SWIR - NIR) / (SWIR + NIR)
 
         :param swir: SWIR band values
         :param nir: NIR band values
+        :param numerator_range: precomputed (min, max) of the numerator
         :return: Computed MNDBI values
         """
-        return IndexCalculator.calculate_fraction(numerator=swir - nir, denominator=swir + nir)
+        return IndexCalculator.calculate_fraction(
+            numerator=swir - nir, denominator=swir + nir, numerator_range=numerator_range
+        )
 
     @staticmethod
-    def calculate_api(pi: np.ndarray, ndvi: np.ndarray, mndbi: np.ndarray) -> np.ndarray:
+    def calculate_api(pi: np.ndarray, ndvi: np.ndarray, mndbi: np.ndarray, out: np.ndarray = None) -> np.ndarray:
         """
         Formula:
         API = PI_2 where:
@@ -138,22 +423,27 @@ class IndexCalculator(object):
         :param pi: PI values
         :param ndvi: NDVI values
         :param mndbi: MNDBI values
+        :param out: array to write the API values into, allocated if not given
         :return: Computed API values
         """
-        api = pi.copy()
-        ndvi_mask = ndvi > 0
-        api[ndvi_mask] -= ndvi[ndvi_mask]
-        mndbi_mask = mndbi > 0
-        api[mndbi_mask] -= mndbi[mndbi_mask]
-        return api
+        if out is None:
+            out = np.empty(shape=pi.shape, dtype=pi.dtype)
+        np.copyto(out, pi)
+        np.subtract(out, ndvi, out=out, where=ndvi > 0)
+        np.subtract(out, mndbi, out=out, where=mndbi > 0)
+        return out
 
     @staticmethod
-    def calculate_fraction(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    def calculate_fraction(
+        numerator: np.ndarray, denominator: np.ndarray, numerator_range: Tuple[float, float] = None
+    ) -> np.ndarray:
         """
         Calculates a fraction based on given numerator and denominator matrices.
+        Where the denominator is zero, the minimum or maximum of the numerator is used.
 
         :param numerator: numerator matrix
         :param denominator: denominator matrix
+        :param numerator_range: (min, max) of the numerator. Calculated from numerator if not given.
         :return: result matrix, containing the calculated values
         """
         index = np.ndarray(
@@ -161,8 +451,11 @@ class IndexCalculator(object):
             dtype="float32",
         )
 
-        numerator_nan_min = np.nanmin(numerator)
-        numerator_nan_max = np.nanmax(numerator)
+        if numerator_range is None:
+            numerator_nan_min = np.nanmin(numerator)
+            numerator_nan_max = np.nanmax(numerator)
+        else:
+            numerator_nan_min, numerator_nan_max = numerator_range
 
         nan_mask = np.isnan(numerator) | np.isnan(denominator)
         numerator_zero_mask = numerator == 0
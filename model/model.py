@@ -1,21 +1,24 @@
 from collections import OrderedDict
 import logging
+import gc
 import os
+import sys
 import copy
-import pyproj
+import hashlib
+import joblib
+import tempfile
+import functools
+import multiprocessing
 import geojson
 import rasterio
 import traceback
 import cv2 as cv
 import numpy as np
-import pandas as pd
 import geopandas as gpd
 import math
 
 from osgeo import gdal, osr
-from itertools import compress
-from scipy.ndimage import median_filter
-from skimage.filters import threshold_minimum
+from rasterio.windows import Window
 from model.treshold import Treshold
 import model.gdal_utils as gdal_utils
 
@@ -25,12 +28,21 @@ from model.unet import UNETPP
 
 import torch
 import model.estimations as estimations
+import model.regions as regions
+import model.tiling as tiling
+import model.water_masking as water_masking
+import model.projections as projections
+import model.band_statistics as band_statistics
+import model.unet_export as unet_export
 from model.exceptions import *
 from shapely.geometry import Point
 from model.persistence import Persistence
-from shapely.geometry.polygon import Polygon
 from sklearn.ensemble import RandomForestClassifier
-from typing import List, Tuple, Union, TextIO, Dict
+from typing import Iterable, Iterator, List, Tuple, Union, TextIO, Dict
+
+# the classifier, the pixels, the garbage class index and the chunk size of a forked worker process,
+# set by its initializer, see Model.predict_with_random_forest_in_parallel
+_worker_prediction = None
 
 
 class Model(object):
@@ -65,6 +77,7 @@ class Model(object):
     ) -> Union[float, None]:
         """
         Estimates the area covered by garbage, based on the pixel size of a picture.
+        See estimate_garbage_areas for estimating several areas with a single read.
 
         :param input_path: input path of classified picture
         :param image_type: classified or heatmap
@@ -78,29 +91,59 @@ class Model(object):
         if prob and prob not in ["low", "medium", "high"]:
             raise ValueError("The value of prob must be low, medium, high!")
 
-        try:
-            dataset = gdal.Open(input_path, gdal.GA_ReadOnly)
-            if dataset.RasterCount != 1:
-                raise NotEnoughBandsException(dataset.RasterCount, 1, input_path)
+        if image_type.lower() == "classified":
+            return self.estimate_garbage_areas(classified=input_path)["classified"]
+        if image_type.lower() == "heatmap":
+            return self.estimate_garbage_areas(heatmap=input_path)[prob]
+
+        raise ValueError("Unrecognized image_type!")
+
+    def estimate_garbage_areas(self, classified: str = None, heatmap: str = None) -> Dict[str, Union[float, None]]:
+        """
+        Estimates the area covered by garbage on a classified image and by each level of a heatmap.
+        Each image is read only once, and every area is counted in the same pass (see get_area_statistics).
+
+        :param classified: path of the classified image
+        :param heatmap: path of the heatmap image
+        :return: the areas by "classified", "low", "medium" and "high", for the given images
+        (None if the pixel area is unknown)
+        :raise NotEnoughBandsException: if an image to be opened does not have only one band
+        """
+
+        areas = dict()
+        if classified is not None:
+            statistics = self.get_area_statistics(classified)
+            areas["classified"] = statistics.get_area(self.persistence.garbage_c_id * 100)
+        if heatmap is not None:
+            statistics = self.get_area_statistics(heatmap)
+            areas["low"] = statistics.get_area(self.persistence.low_prob_value)
+            areas["medium"] = statistics.get_area(self.persistence.medium_prob_value)
+            areas["high"] = statistics.get_area(self.persistence.high_prob_value)
 
-            band = dataset.GetRasterBand(1)
-            band = band.ReadAsArray()
+        return areas
 
+    def get_area_statistics(self, image: str) -> estimations.AreaStatistics:
+        """
+        Counts the pixels of every value of a single band image and determines the area of a pixel.
+        The pixel area is measured on the ground from the geotransform of the image if it has a projected CRS
+        (see estimations.get_pixel_area), otherwise the nominal pixel size of the satellite is used.
+
+        :param image: path of the image
+        :return: the pixel counts by value and the pixel area
+        :raise NotEnoughBandsException: if the image does not have only one band
+        """
+
+        with rasterio.open(image, "r") as img:
+            if img.count != 1:
+                raise NotEnoughBandsException(img.count, 1, image)
+
+            pixel_area = estimations.get_pixel_area(img.transform, img.crs, img.shape)
+            band = img.read(1)
+
+        if pixel_area is None and self.pixel_size_x is not None:
             pixel_area = self.pixel_size_x * self.pixel_size_y
 
-            if image_type.lower() == "classified":
-                return np.count_nonzero(band == self.persistence.garbage_c_id * 100) * pixel_area
-            if image_type.lower() == "heatmap":
-                if prob == "low":
-                    return np.count_nonzero(band == self.persistence.low_prob_value) * pixel_area
-                if prob == "medium":
-                    return np.count_nonzero(band == self.persistence.medium_prob_value) * pixel_area
-                if prob == "high":
-                    return np.count_nonzero(band == self.persistence.high_prob_value) * pixel_area
-
-            raise ValueError("Unrecognized image_type!")
-        finally:
-            del dataset
+        return estimations.AreaStatistics(estimations.count_values(band), pixel_area)
 
     def format_satellite_band_name(self, band: str) -> str:
         """
@@ -138,9 +181,11 @@ class Model(object):
         else:
             raise NameError(f"Wrong satellite or band name! Band name: {band}")
 
-    def get_satellite_band(self, img: rasterio.DatasetReader, band: str, dtype: str) -> np.ndarray:
+    def get_satellite_band(
+        self, img: rasterio.DatasetReader, band: str, dtype: str, window: Window = None
+    ) -> np.ndarray:
         band_number = self.get_band_number(band)
-        return img.read(band_number).astype(dtype=dtype)
+        return img.read(band_number, window=window).astype(dtype=dtype)
 
     def get_bands(self, input_path: str, band_names: List[str], dtype: str) -> OrderedDict:
         """
@@ -151,10 +196,24 @@ class Model(object):
         :param dtype: the type of the data
         :return: and ordered dictionary containing band values. The order is the same as in band_names
         """
-        bands = OrderedDict()
         with rasterio.open(input_path, "r") as img:
-            for band_name in band_names:
-                bands[band_name] = self.get_satellite_band(img, band_name, dtype)
+            return self.get_bands_of_window(img, band_names, dtype)
+
+    def get_bands_of_window(
+        self, img: rasterio.DatasetReader, band_names: List[str], dtype: str, window: Window = None
+    ) -> OrderedDict:
+        """
+        Returns the requested bands from a window of an opened image.
+
+        :param img: the opened input image
+        :param band_names: names of bands
+        :param dtype: the type of the data
+        :param window: the window to be read, the whole image if not given
+        :return: and ordered dictionary containing band values. The order is the same as in band_names
+        """
+        bands = OrderedDict()
+        for band_name in band_names:
+            bands[band_name] = self.get_satellite_band(img, band_name, dtype, window)
         return bands
 
     def get_udm2_bands(self, udm2_input_path: str) -> np.ndarray:
@@ -195,6 +254,7 @@ class Model(object):
         postfix: str,
         working_dir: str,
         udm2_input_path: str = None,
+        block_size: int = None,
     ) -> str:
         """
         Saves the specified band values and/or index values to a single- or multi-band tif file.
@@ -204,9 +264,19 @@ class Model(object):
         :param working_dir: path of the working directory
         :param postfix: file name postfix of the output image
         :param udm2_input_path: path of the input image containing udm2 images
+        :param block_size: if positive, the image is processed in block_size x block_size windows
+        (see save_bands_indices_by_blocks). Taken from the block_size setting if not given.
         :return: path of the output image
         """
-        bands = self.get_bands(input_path, band_names, "float32")
+        if block_size is None:
+            block_size = self.persistence.block_size if hasattr(self.persistence, "block_size") else 0
+
+        if block_size > 0:
+            return self.save_bands_indices_by_blocks(
+                input_path, band_names, index_names, postfix, working_dir, block_size, udm2_input_path
+            )
+
+        bands = self.get_bands(input_path, Model.get_input_band_names(band_names, index_names), "float32")
 
         indices = IndexCalculator.calculate_indices(index_names, bands)
 
@@ -216,7 +286,7 @@ class Model(object):
 
         output_path = Model.output_path([input_path], postfix, self.persistence.file_extension, working_dir)
 
-        list_of_bands_and_indices = list(bands_and_indices.values())
+        list_of_bands_and_indices = [bands_and_indices[name] for name in band_names + list(indices.keys())]
         bands = len(list_of_bands_and_indices)
         Model.save_tif(
             input_path=input_path,
@@ -224,49 +294,163 @@ class Model(object):
             shape=list_of_bands_and_indices[0].shape,
             band_count=bands,
             output_path=output_path,
+            profile=self.get_output_profile("bands_indices"),
         )
 
         return output_path
 
+    def save_bands_indices_by_blocks(
+        self,
+        input_path: str,
+        band_names: List[str],
+        index_names: List[str],
+        postfix: str,
+        working_dir: str,
+        block_size: int,
+        udm2_input_path: str = None,
+    ) -> str:
+        """
+        Same as save_bands_indices, but reads, calculates and writes one window at a time,
+        so the memory usage depends on block_size instead of the size of the image.
+        The result is identical: the numerator ranges of the indices are collected beforehand,
+        and the water mask (which needs the whole image) is created from a single full size NDWI layer.
+
+        :param input_path: path of the input image
+        :param band_names: names of the bands to be saved
+        :param index_names: names of the indices to be saved
+        :param postfix: file name postfix of the output image
+        :param working_dir: path of the working directory
+        :param block_size: width and height of the windows in pixels
+        :param udm2_input_path: path of the input image containing udm2 images
+        :return: path of the output image
+        """
+        output_path = Model.output_path([input_path], postfix, self.persistence.file_extension, working_dir)
+        input_band_names = Model.get_input_band_names(band_names, index_names)
+
+        with rasterio.open(input_path, "r") as img:
+            windows = Model.get_block_windows(img.height, img.width, block_size)
+
+            mask_index_names = ["ndwi"] if self.persistence.masking else []
+            numerator_ranges = self.get_numerator_ranges(
+                img,
+                Model.get_input_band_names(input_band_names, mask_index_names),
+                index_names + mask_index_names,
+                windows,
+            )
+
+            water_mask = None
+            if self.persistence.masking:
+                ndwi = np.empty(shape=(img.height, img.width), dtype="float32")
+                for window in windows:
+                    bands = self.get_bands_of_window(img, ["green", "nir"], "float32", window)
+                    ndwi[Model.window_slices(window)] = IndexCalculator.calculate_ndwi(
+                        bands["green"], bands["nir"], numerator_ranges.get("ndwi")
+                    )
+                water_mask = self.get_water_mask(ndwi, udm2_input_path)
+                del ndwi
+
+            dataset = Model.create_tif(
+                input_path=input_path,
+                shape=(img.height, img.width),
+                band_count=len(band_names) + len(OrderedDict.fromkeys(index_names)),
+                output_path=output_path,
+                profile=self.get_output_profile("bands_indices"),
+            )
+
+            try:
+                for window in windows:
+                    bands = self.get_bands_of_window(img, input_band_names, "float32", window)
+                    indices = IndexCalculator.calculate_indices(index_names, bands, numerator_ranges)
+
+                    bands_and_indices = OrderedDict((name, bands[name]) for name in band_names)
+                    bands_and_indices.update(indices)
+
+                    if water_mask is not None:
+                        window_mask = water_mask[Model.window_slices(window)] == 0
+                        for band in bands_and_indices.values():
+                            band[window_mask] = np.nan
+
+                    for band_index, band in enumerate(bands_and_indices.values()):
+                        outband = dataset.GetRasterBand(band_index + 1)
+                        outband.WriteArray(band, xoff=int(window.col_off), yoff=int(window.row_off))
+
+                for band_index in range(dataset.RasterCount):
+                    dataset.GetRasterBand(band_index + 1).FlushCache()
+                dataset.FlushCache()
+            finally:
+                del dataset
+
+        return output_path
+
+    def get_numerator_ranges(
+        self,
+        img: rasterio.DatasetReader,
+        band_names: List[str],
+        index_names: List[str],
+        windows: List[Window],
+    ) -> Dict[str, Tuple[float, float]]:
+        """
+        Calculates the (min, max) of the numerators of the given indices over the whole image, window by window.
+
+        :param img: the opened input image
+        :param band_names: names of the available bands
+        :param index_names: names of the indices, the indices they depend on are included as well
+        :param windows: windows covering the image
+        :return: dictionary containing the ranges of the fraction based indices, whose numerator is not all NaN
+        """
+        numerator_ranges = dict()
+        for window in windows:
+            bands = self.get_bands_of_window(img, band_names, "float32", window)
+            for index_name in IndexCalculator.get_dependencies(index_names):
+                numerator = IndexCalculator.calculate_numerator(index_name, bands)
+                if numerator is None or np.all(np.isnan(numerator)):
+                    continue
+
+                window_range = np.nanmin(numerator), np.nanmax(numerator)
+                if index_name in numerator_ranges:
+                    current_min, current_max = numerator_ranges[index_name]
+                    window_range = min(current_min, window_range[0]), max(current_max, window_range[1])
+                numerator_ranges[index_name] = window_range
+
+        return numerator_ranges
+
     def get_pi_difference(
         self, input_path_1: str, input_path_2: str
     ) -> Union[Tuple[np.ndarray, Tuple], Tuple[None, None]]:
         """
         Calculates the PI difference of two different shaped images.
+        Only the overlapping windows of the images are read.
 
         :param input_path_1: path of the first input image
         :param input_path_2: path of the second input image
         :return: matrix containing the difference values, coordinate information for later use
         """
 
-        (
-            intersection_matrix,
-            coords_information,
-        ) = Model.get_empty_intersection_matrix_and_start_coords(input_path_1, input_path_2)
+        window_1, window_2, coords_information = Model.get_intersection_windows(input_path_1, input_path_2)
 
-        if not (intersection_matrix is None) and not (coords_information is None):
-            start_coords, input_1_start, input_2_start = coords_information
+        if not (window_1 is None) and not (window_2 is None):
+            input_1_pi = self.get_pi_of_window(input_path_1, window_1)
+            input_2_pi = self.get_pi_of_window(input_path_2, window_2)
 
-            [input_1_pi] = self.get_bands_indices(input_path_1, "pi")
-            [input_2_pi] = self.get_bands_indices(input_path_2, "pi")
+            intersection_matrix = input_1_pi - input_2_pi
 
-            img_1_size = input_1_pi.shape[0] * input_1_pi.shape[1]
-            img_2_size = input_2_pi.shape[0] * input_2_pi.shape[1]
+            return intersection_matrix, coords_information
 
-            rows, cols = intersection_matrix.shape
+        return None, None
 
-            for i in range(rows):
-                for j in range(cols):
-                    row_1, col_1 = input_1_start[0] + i, input_1_start[1] + j
-                    row_2, col_2 = input_2_start[0] + i, input_2_start[1] + j
-                    if img_1_size >= img_2_size:
-                        intersection_matrix[i, j] = input_1_pi[row_1, col_1] - input_2_pi[row_2, col_2]
-                    else:
-                        intersection_matrix[i, j] = input_1_pi[row_2, col_2] - input_2_pi[row_1, col_1]
+    def get_pi_of_window(self, input_path: str, window: Window) -> np.ndarray:
+        """
+        Calculates the PI values of a window of an image.
 
-            return intersection_matrix, coords_information
+        :param input_path: path of the input image
+        :param window: the window to be read
+        :return: matrix containing the PI values
+        """
 
-        return None, None
+        with rasterio.open(input_path, "r") as img:
+            bands = self.get_bands_of_window(img, ["red", "nir"], "float32", window)
+
+        return IndexCalculator.calculate_pi(bands["red"], bands["nir"])
 
     def get_pi_difference_heatmap(self, difference_matrix: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
         """
@@ -291,47 +475,47 @@ class Model(object):
         if not np.all(np.isnan(difference_matrix)):
             mean = np.nanmedian(difference_matrix)
 
-            mean_difference_pos = np.empty_like(difference_matrix)
-            mean_difference_neg = np.empty_like(difference_matrix)
-
-            rows, cols = difference_matrix.shape
-
-            for i in range(rows):
-                for j in range(cols):
-                    if difference_matrix[i, j] > mean:
-                        mean_difference_pos[i, j] = difference_matrix[i, j] - mean
-                        mean_difference_neg[i, j] = 0
-                    else:
-                        mean_difference_neg[i, j] = mean - difference_matrix[i, j]
-                        mean_difference_pos[i, j] = 0
-
-            max_pos = np.nanmax(mean_difference_pos)
-            max_neg = np.nanmax(mean_difference_neg)
-
-            for i in range(rows):
-                for j in range(cols):
-                    n_equal_parts = int(self.persistence.washed_up_heatmap_sections)
-
-                    value_pos = mean_difference_pos[i, j]
-                    equal_part_pos = max_pos / n_equal_parts
-                    if value_pos >= equal_part_pos * (n_equal_parts - 1):
-                        heatmap_pos[i, j] = self.persistence.high_prob_value
-                    elif equal_part_pos * (n_equal_parts - 2) <= value_pos < equal_part_pos * (n_equal_parts - 1):
-                        heatmap_pos[i, j] = self.persistence.medium_prob_value
-                    elif equal_part_pos * (n_equal_parts - 3) <= value_pos < equal_part_pos * (n_equal_parts - 2):
-                        heatmap_pos[i, j] = self.persistence.low_prob_value
-
-                    value_neg = mean_difference_neg[i, j]
-                    equal_part_neg = max_neg / n_equal_parts
-                    if value_neg >= equal_part_neg * (n_equal_parts - 1):
-                        heatmap_neg[i, j] = self.persistence.high_prob_value
-                    elif equal_part_neg * (n_equal_parts - 2) <= value_neg < equal_part_neg * (n_equal_parts - 1):
-                        heatmap_neg[i, j] = self.persistence.medium_prob_value
-                    elif equal_part_neg * (n_equal_parts - 3) <= value_neg < equal_part_neg * (n_equal_parts - 2):
-                        heatmap_neg[i, j] = self.persistence.low_prob_value
+            above_mean = difference_matrix > mean
+            mean_difference_pos = np.where(above_mean, difference_matrix - mean, 0).astype(difference_matrix.dtype)
+            mean_difference_neg = np.where(above_mean, 0, mean - difference_matrix).astype(difference_matrix.dtype)
+
+            heatmap_pos = self.get_sections_heatmap(mean_difference_pos)
+            heatmap_neg = self.get_sections_heatmap(mean_difference_neg)
 
         return heatmap_pos, heatmap_neg
 
+    def get_sections_heatmap(self, mean_difference: np.ndarray) -> np.ndarray:
+        """
+        Splits the [0, max] range of the values into washed_up_heatmap_sections equal parts,
+        then labels the values in the top three parts as high, medium and low probability.
+
+        :param mean_difference: matrix containing the non-negative differences from the median
+        :return: heatmap
+        """
+
+        n_equal_parts = int(self.persistence.washed_up_heatmap_sections)
+        equal_part = np.nanmax(mean_difference) / n_equal_parts
+
+        sections = [
+            equal_part * (n_equal_parts - 3),
+            equal_part * (n_equal_parts - 2),
+            equal_part * (n_equal_parts - 1),
+        ]
+        values = np.array(
+            [
+                0,
+                self.persistence.low_prob_value,
+                self.persistence.medium_prob_value,
+                self.persistence.high_prob_value,
+            ],
+            dtype=int,
+        )
+
+        heatmap = values[np.digitize(mean_difference, sections)]
+        heatmap[np.isnan(mean_difference)] = 0
+
+        return heatmap
+
     def create_masked_classification_and_heatmap(
         self,
         original_input_path: str,
@@ -339,19 +523,25 @@ class Model(object):
         heatmap_path: str,
         classification_postfix: str,
         heatmap_postfix: str,
+        debug: bool = None,
     ) -> Tuple[str, str]:
         """
         Creates the masked classification and masked heatmap based on the input classification and input heatmap.
-        Uses morphological transformations (opening and dilation).
+        Uses morphological transformations (opening and dilation), which are applied in memory.
 
         :param original_input_path: path of the original image
         :param classification_path: path of the classified image
         :param heatmap_path: path of the heatmap image
         :param classification_postfix: postfix of classified image name
         :param heatmap_postfix: postfix of heatmap image name
+        :param debug: if True, the intermediate results of the morphology are saved too.
+        Taken from the morphology_debug setting if not given.
         :return: the paths of the output images
         """
 
+        if debug is None:
+            debug = self.persistence.morphology_debug if hasattr(self.persistence, "morphology_debug") else False
+
         # open inputs
         with rasterio.open(classification_path, "r") as classification_matrix, rasterio.open(
             heatmap_path, "r"
@@ -360,103 +550,80 @@ class Model(object):
             classification_matrix = classification_matrix.read(1)
             heatmap_matrix = heatmap_matrix.read(1)
 
-            working_dir = working_dir = (
-                self.persistence.working_dir
-                if hasattr(self.persistence, "working_dir")
-                else os.path.dirname(original_input_path)
-            )
-
-            # output paths
-            morphology_path = Model.output_path(
-                [original_input_path],
-                "morphology",
-                self.persistence.file_extension,
-                working_dir,
-            )
-            opening_path = Model.output_path(
-                [original_input_path],
-                "morphology_opening",
-                self.persistence.file_extension,
-                working_dir,
-            )
-            dilation_path = Model.output_path(
-                [original_input_path],
-                "morphology_opening_dilation",
-                self.persistence.file_extension,
-                working_dir,
-            )
-            masked_classification_path = Model.output_path(
-                [original_input_path],
-                classification_postfix,
-                self.persistence.file_extension,
-                working_dir,
-            )
-            masked_heatmap_path = Model.output_path(
-                [original_input_path],
-                heatmap_postfix,
-                self.persistence.file_extension,
-                working_dir,
-            )
+        working_dir = (
+            self.persistence.working_dir
+            if hasattr(self.persistence, "working_dir")
+            else os.path.dirname(original_input_path)
+        )
 
-            morphology_matrix = np.zeros_like(classification_matrix)
-            morphology_matrix[classification_matrix == self.persistence.garbage_c_id * 100] = 1
-            morphology_matrix[classification_matrix == self.persistence.water_c_id * 100] = 1
+        # output paths
+        masked_classification_path = Model.output_path(
+            [original_input_path],
+            classification_postfix,
+            self.persistence.file_extension,
+            working_dir,
+        )
+        masked_heatmap_path = Model.output_path(
+            [original_input_path],
+            heatmap_postfix,
+            self.persistence.file_extension,
+            working_dir,
+        )
 
-            Model.save_tif(
-                input_path=original_input_path,
-                array=[morphology_matrix],
-                shape=morphology_matrix.shape,
-                band_count=1,
-                output_path=morphology_path,
-            )
+        morphology_matrix = np.zeros_like(classification_matrix)
+        morphology_matrix[classification_matrix == self.persistence.garbage_c_id * 100] = 1
+        morphology_matrix[classification_matrix == self.persistence.water_c_id * 100] = 1
 
-            matrix = (
-                self.persistence.morphology_matrix_size,
-                self.persistence.morphology_matrix_size,
-            )
-            opening = Model.morphology("opening", morphology_path, opening_path, matrix=matrix)
-
-            if opening is not None:
-                dilation = Model.morphology(
-                    "dilation",
-                    opening_path,
-                    dilation_path,
-                    iterations=self.persistence.morphology_iterations,
+        matrix = (
+            self.persistence.morphology_matrix_size,
+            self.persistence.morphology_matrix_size,
+        )
+        opening = Model.apply_morphology("opening", morphology_matrix, matrix=matrix)
+        dilation = Model.apply_morphology("dilation", opening, iterations=self.persistence.morphology_iterations)
+
+        if debug:
+            for postfix, array in [
+                ("morphology", morphology_matrix),
+                ("morphology_opening", opening),
+                ("morphology_opening_dilation", dilation),
+            ]:
+                Model.save_tif(
+                    input_path=original_input_path,
+                    array=[array],
+                    shape=array.shape,
+                    band_count=1,
+                    output_path=Model.output_path(
+                        [original_input_path], postfix, self.persistence.file_extension, working_dir
+                    ),
                 )
 
-                if dilation is not None:
-                    dilation_mask = dilation == 0
+        dilation_mask = dilation == 0
 
-                    masked_classification = classification_matrix
-                    masked_classification[dilation_mask] = 0
+        masked_classification = classification_matrix
+        masked_classification[dilation_mask] = 0
 
-                    masked_heatmap = heatmap_matrix
-                    masked_heatmap[dilation_mask] = 0
+        masked_heatmap = heatmap_matrix
+        masked_heatmap[dilation_mask] = 0
 
-                    Model.save_tif(
-                        input_path=original_input_path,
-                        array=[masked_classification],
-                        shape=masked_classification.shape,
-                        band_count=1,
-                        output_path=masked_classification_path,
-                    )
-
-                    Model.save_tif(
-                        input_path=original_input_path,
-                        array=[masked_heatmap],
-                        shape=masked_heatmap.shape,
-                        band_count=1,
-                        output_path=masked_heatmap_path,
-                    )
+        Model.save_tif(
+            input_path=original_input_path,
+            array=[masked_classification],
+            shape=masked_classification.shape,
+            band_count=1,
+            output_path=masked_classification_path,
+            profile=self.get_output_profile("classification"),
+        )
 
-            if os.path.exists(morphology_path):
-                os.remove(morphology_path)
-            if os.path.exists(opening_path):
-                os.remove(opening_path)
-            if os.path.exists(dilation_path):
-                os.remove(dilation_path)
+        Model.save_tif(
+            input_path=original_input_path,
+            array=[masked_heatmap],
+            shape=masked_heatmap.shape,
+            band_count=1,
+            output_path=masked_heatmap_path,
+            profile=self.get_output_profile("heatmap"),
+        )
 
-            return masked_classification_path, masked_heatmap_path
+        return masked_classification_path, masked_heatmap_path
 
     def create_classification_and_heatmap_with_random_forest(
         self,
@@ -486,16 +653,26 @@ class Model(object):
         classes = clf.classes_.astype(np.int32)
         garbage_class_index = np.nonzero(classes == (self.persistence.garbage_c_id * 100))[0][0]
 
-        array = np.stack(array, axis=2)
-        array = np.reshape(array, [rows * cols, bands])
-        nan_mask = np.count_nonzero(np.isnan(array), axis=1) > 0
+        chunk_size = self.persistence.rf_chunk_size if hasattr(self.persistence, "rf_chunk_size") else 262144
 
-        # array to data frame
-        array_df = pd.DataFrame(array, dtype="float32").fillna(axis="index", value=0)
+        workers = self.persistence.rf_workers if hasattr(self.persistence, "rf_workers") else 1
+        start_method = self.persistence.rf_start_method if hasattr(self.persistence, "rf_start_method") else None
 
-        pred_proba = clf.predict_proba(array_df)
-
-        garbage_probabilities = pred_proba[:, garbage_class_index]
+        array = np.reshape(array, [bands, rows * cols])
+        if workers > 1:
+            clf_path = (
+                self.persistence.clf_path
+                if hasattr(self.persistence, "clf_path") and clf is self.persistence.clf
+                else None
+            )
+            classification, garbage_probabilities = Model.predict_with_random_forest_in_parallel(
+                clf, array, garbage_class_index, chunk_size, workers, clf_path, start_method
+            )
+        else:
+            classification, garbage_probabilities = Model.predict_with_random_forest(
+                clf, array, garbage_class_index, chunk_size
+            )
+        del array
 
         tresholds = [
             Treshold(self.persistence.low_prob_percent / 100, self.persistence.low_prob_value),
@@ -503,12 +680,10 @@ class Model(object):
             Treshold(self.persistence.high_prob_percent / 100, self.persistence.high_prob_value),
         ]
 
+        # the probabilities of the NaN pixels are NaN, so they get 0 in the heatmap
         heatmap = estimations.create_heatmap(garbage_probabilities, tresholds)
-        heatmap[nan_mask] = 0
         heatmap = heatmap.reshape((rows, cols))
 
-        classification = classes.take(np.argmax(pred_proba, axis=1), axis=0)
-        classification[nan_mask] = 0
         classification = classification.reshape((rows, cols))
 
         working_dir = (
@@ -534,6 +709,7 @@ class Model(object):
             shape=classification.shape,
             band_count=1,
             output_path=classification_output_path,
+            profile=self.get_output_profile("classification"),
         )
 
         Model.save_tif(
@@ -542,6 +718,7 @@ class Model(object):
             shape=heatmap.shape,
             band_count=1,
             output_path=heatmap_output_path,
+            profile=self.get_output_profile("heatmap"),
         )
 
         return classification_output_path, heatmap_output_path
@@ -549,7 +726,7 @@ class Model(object):
     def create_classification_and_heatmap_with_UNET(
         self,
         input_path: str,
-        unet: Union[UNET, UNETPP],
+        unet: Union[UNET, UNETPP, unet_export.TorchScriptBackend, unet_export.OnnxBackend],
         classification_postfix: str,
         heatmap_postfix: str,
     ) -> Tuple[str, str]:
@@ -557,93 +734,241 @@ class Model(object):
         Creates classification and garbage heatmap with UNET Classifier.
 
         :param input_path: input path of the image to be processed
-        :param unet: an instance of UNET
+        :param unet: an instance of UNET, UNETPP or an exported network
         :param classification_postfix: postfix of classified image name
         :param heatmap_postfix: postfix of heatmap image name
         :return: path of the classified image and the heatmap image
         """
 
         try:
-            ds = gdal.Open(input_path, gdal.GA_ReadOnly)
+            array = self.read_UNET_input(input_path, unet)
+
+            tile_size = self.get_UNET_tile_size(unet)
+            if tile_size > 0:
+                prob = tiling.predict_tiled(
+                    unet,
+                    array,
+                    tile_size,
+                    self.get_UNET_tile_overlap(),
+                    self.get_UNET_batch_size(),
+                    self.get_UNET_min_valid_fraction(),
+                )
+            else:
+                array = torch.tensor(array)
+                array = array.unsqueeze(0)
 
-            # initialize variables
-            rows = ds.RasterYSize
-            cols = ds.RasterXSize
-            bands = ds.RasterCount
-            array = ds.ReadAsArray().astype(dtype="float32")
+                with torch.no_grad():
+                    prob = unet.predict(array)
+                prob = prob.squeeze()
+                prob = np.asarray(prob)
 
-            if bands < unet.in_channels:
-                raise NotEnoughBandsException(bands, unet.in_channels, input_path)
-            # merge band values
-            array = np.stack(array, axis=2)
-            # reshape array
-            array = np.reshape(array, [rows, cols, bands])
-            array = np.transpose(array, (2, 0, 1))
-            array = array[: unet.in_channels, :, :]
-            array = torch.tensor(array)
-            array = array.unsqueeze(0)
-
-            with torch.no_grad():
-                prob = unet.predict(array)
-            prob = prob.squeeze()
-            prob = np.asarray(prob)
-            classification = np.zeros(prob.shape)
-            classification[prob >= self.persistence.medium_prob_percent / 100] = 1
-
-            low_mask = np.where(
-                (prob > self.persistence.low_prob_percent / 100) & (prob <= self.persistence.medium_prob_percent / 100)
+            return self.save_classification_and_heatmap_of_UNET(
+                input_path, prob, classification_postfix, heatmap_postfix
             )
-            medium_mask = np.where(
-                (prob > self.persistence.medium_prob_percent / 100) & (prob <= self.persistence.high_prob_percent / 100)
-            )
-            high_mask = np.where(prob > self.persistence.high_prob_percent / 100)
+        except:
+            traceback.print_exc()
+            return "", ""
 
-            heatmap = np.zeros(prob.shape)
-            heatmap[low_mask] = self.persistence.low_prob_value
-            heatmap[medium_mask] = self.persistence.medium_prob_value
-            heatmap[high_mask] = self.persistence.high_prob_value
+    def create_classifications_and_heatmaps_with_UNET(
+        self,
+        input_paths: Iterable[str],
+        unet: Union[UNET, UNETPP, unet_export.TorchScriptBackend, unet_export.OnnxBackend],
+        classification_postfix: str,
+        heatmap_postfix: str,
+    ) -> Iterator[Tuple[str, str, str]]:
+        """
+        Creates classifications and garbage heatmaps of several images with UNET Classifier.
+        With tiled inference the batches passed to UNET are filled with the tiles of consecutive images,
+        and the images are read only when the tiles of the previous images do not fill a batch.
 
-            working_dir = (
-                self.persistence.working_dir
-                if hasattr(self.persistence, "working_dir")
-                else os.path.dirname(input_path)
-            )
+        :param input_paths: input paths of the images to be processed
+        :param unet: an instance of UNET, UNETPP or an exported network
+        :param classification_postfix: postfix of classified image name
+        :param heatmap_postfix: postfix of heatmap image name
+        :return: input path, path of the classified image and the heatmap image, in the order of completion
+        (empty paths for the images that could not be processed)
+        """
 
-            classification_output_path = Model.output_path(
-                [input_path],
-                classification_postfix,
-                self.persistence.file_extension,
-                working_dir,
-            )
-            heatmap_output_path = Model.output_path(
-                [input_path],
-                heatmap_postfix,
-                self.persistence.file_extension,
-                working_dir,
-            )
+        tile_size = self.get_UNET_tile_size(unet)
+        if tile_size <= 0:
+            for input_path in input_paths:
+                yield (input_path,) + self.create_classification_and_heatmap_with_UNET(
+                    input_path, unet, classification_postfix, heatmap_postfix
+                )
+            return
 
-            # save classification
-            Model.save_tif(
-                input_path=input_path,
-                array=[classification],
-                shape=classification.shape,
-                band_count=1,
-                output_path=classification_output_path,
-            )
+        failed = list()
+
+        def read_inputs() -> Iterator[Tuple[str, np.ndarray]]:
+            for input_path in input_paths:
+                try:
+                    array = self.read_UNET_input(input_path, unet)
+                except:
+                    traceback.print_exc()
+                    failed.append(input_path)
+                    continue
+                yield input_path, array
+
+        predictions = tiling.predict_tiled_images(
+            unet,
+            read_inputs(),
+            tile_size,
+            self.get_UNET_tile_overlap(),
+            self.get_UNET_batch_size(),
+            self.get_UNET_min_valid_fraction(),
+        )
+        for input_path, prob in predictions:
+            while failed:
+                yield failed.pop(0), "", ""
 
-            # save heatmap
-            Model.save_tif(
-                input_path=input_path,
-                array=[heatmap],
-                shape=heatmap.shape,
-                band_count=1,
-                output_path=heatmap_output_path,
-            )
+            try:
+                output_paths = self.save_classification_and_heatmap_of_UNET(
+                    input_path, prob, classification_postfix, heatmap_postfix
+                )
+            except:
+                traceback.print_exc()
+                output_paths = "", ""
+            yield (input_path,) + output_paths
 
-            return classification_output_path, heatmap_output_path
-        except:
-            traceback.print_exc()
-            return "", ""
+        while failed:
+            yield failed.pop(0), "", ""
+
+    def read_UNET_input(
+        self, input_path: str, unet: Union[UNET, UNETPP, unet_export.TorchScriptBackend, unet_export.OnnxBackend]
+    ) -> np.ndarray:
+        """
+        Reads the input bands of UNET Classifier from an image.
+
+        :param input_path: input path of the image to be processed
+        :param unet: an instance of UNET, UNETPP or an exported network
+        :return: array of shape (in_channels, height, width)
+        :raise NotEnoughBandsException: if the image has less bands than the input channels of UNET
+        """
+
+        ds = gdal.Open(input_path, gdal.GA_ReadOnly)
+
+        # initialize variables
+        rows = ds.RasterYSize
+        cols = ds.RasterXSize
+        bands = ds.RasterCount
+        array = ds.ReadAsArray().astype(dtype="float32")
+
+        if bands < unet.in_channels:
+            raise NotEnoughBandsException(bands, unet.in_channels, input_path)
+        array = np.reshape(array, [bands, rows, cols])
+
+        return array[: unet.in_channels, :, :]
+
+    def get_UNET_tile_size(
+        self, unet: Union[UNET, UNETPP, unet_export.TorchScriptBackend, unet_export.OnnxBackend]
+    ) -> int:
+        """
+        Returns the tile size of the tiled UNET inference.
+
+        :param unet: an instance of UNET, UNETPP or an exported network
+        :return: the width and height of the tiles, 0 if the whole images are processed at once
+        """
+
+        if isinstance(unet, (unet_export.TorchScriptBackend, unet_export.OnnxBackend)):
+            # exported networks process tiles of a fixed size
+            return unet.tile_size
+
+        return self.persistence.unet_tile_size if hasattr(self.persistence, "unet_tile_size") else 0
+
+    def get_UNET_tile_overlap(self) -> int:
+        """
+        Returns the overlap of the neighbouring tiles in the tiled UNET inference.
+
+        :return: the overlap in pixels
+        """
+
+        return self.persistence.unet_tile_overlap if hasattr(self.persistence, "unet_tile_overlap") else 32
+
+    def get_UNET_batch_size(self) -> int:
+        """
+        Returns the number of tiles passed to UNET at once in the tiled UNET inference.
+
+        :return: the batch size
+        """
+
+        return self.persistence.unet_batch_size if hasattr(self.persistence, "unet_batch_size") else 4
+
+    def get_UNET_min_valid_fraction(self) -> float:
+        """
+        Returns the fraction of valid pixels, at most which the tiles are skipped in the tiled UNET inference.
+
+        :return: the fraction between 0 and 1
+        """
+
+        return self.persistence.unet_min_valid_fraction if hasattr(self.persistence, "unet_min_valid_fraction") else 0.0
+
+    def save_classification_and_heatmap_of_UNET(
+        self, input_path: str, prob: np.ndarray, classification_postfix: str, heatmap_postfix: str
+    ) -> Tuple[str, str]:
+        """
+        Saves the classification and garbage heatmap created from the prediction of UNET Classifier.
+
+        :param input_path: input path of the processed image
+        :param prob: the garbage probabilities of shape (height, width)
+        :param classification_postfix: postfix of classified image name
+        :param heatmap_postfix: postfix of heatmap image name
+        :return: path of the classified image and the heatmap image
+        """
+
+        classification = np.zeros(prob.shape)
+        classification[prob >= self.persistence.medium_prob_percent / 100] = 1
+
+        low_mask = np.where(
+            (prob > self.persistence.low_prob_percent / 100) & (prob <= self.persistence.medium_prob_percent / 100)
+        )
+        medium_mask = np.where(
+            (prob > self.persistence.medium_prob_percent / 100) & (prob <= self.persistence.high_prob_percent / 100)
+        )
+        high_mask = np.where(prob > self.persistence.high_prob_percent / 100)
+
+        heatmap = np.zeros(prob.shape)
+        heatmap[low_mask] = self.persistence.low_prob_value
+        heatmap[medium_mask] = self.persistence.medium_prob_value
+        heatmap[high_mask] = self.persistence.high_prob_value
+
+        working_dir = (
+            self.persistence.working_dir if hasattr(self.persistence, "working_dir") else os.path.dirname(input_path)
+        )
+
+        classification_output_path = Model.output_path(
+            [input_path],
+            classification_postfix,
+            self.persistence.file_extension,
+            working_dir,
+        )
+        heatmap_output_path = Model.output_path(
+            [input_path],
+            heatmap_postfix,
+            self.persistence.file_extension,
+            working_dir,
+        )
+
+        # save classification
+        Model.save_tif(
+            input_path=input_path,
+            array=[classification],
+            shape=classification.shape,
+            band_count=1,
+            output_path=classification_output_path,
+            profile=self.get_output_profile("classification"),
+        )
+
+        # save heatmap
+        Model.save_tif(
+            input_path=input_path,
+            array=[heatmap],
+            shape=heatmap.shape,
+            band_count=1,
+            output_path=heatmap_output_path,
+            profile=self.get_output_profile("heatmap"),
+        )
+
+        return classification_output_path, heatmap_output_path
 
     def apply_water_and_udm2_masks(
         self,
@@ -660,40 +985,77 @@ class Model(object):
         if self.persistence.masking:
             ndwi = IndexCalculator.calculate_ndwi(bands_and_indices["green"], bands_and_indices["nir"])
 
-            if ndwi is None:
-                logging.warning("Skip masking. NDWI could not be retrieved.")
-                return
+            water_mask = self.get_water_mask(ndwi, udm2_input_path)
 
-            if self.persistence.satellite_type.lower() == "planetscope" and udm2_input_path is not None:
-                udm2_mask = self.get_udm2_bands(udm2_input_path)
-                ndwi[udm2_mask == self.persistence.udm2_eliminator] = np.nan
+            if water_mask is not None:
+                for bands_and_indices in bands_and_indices.values():
+                    bands_and_indices[water_mask == 0] = np.nan
 
-            water_mask = self.create_water_mask(ndwi, self.persistence.invert_water_mask)
+    def get_water_mask(self, ndwi: np.ndarray, udm2_input_path: str) -> Union[np.ndarray, None]:
+        """
+        Creates the transformed water mask from the NDWI values and the UDM2 image (if given).
 
-            water_mask = self.water_mask_morphological_transform(
-                water_mask,
-                self.persistence.open_kernel,
-                self.persistence.close_kernel,
-                self.persistence.dilute_kernel,
-            )
+        :param ndwi: array of NDWI values of the whole image, NaN values of the UDM2 mask are set in place
+        :param udm2_input_path: path of the UDM2 input image
+        :return: the water mask (0 means masked out pixel), None if it could not be created
+        """
+        if ndwi is None:
+            logging.warning("Skip masking. NDWI could not be retrieved.")
+            return None
+
+        if self.persistence.satellite_type.lower() == "planetscope" and udm2_input_path is not None:
+            udm2_mask = self.get_udm2_bands(udm2_input_path)
+            ndwi[udm2_mask == self.persistence.udm2_eliminator] = np.nan
+
+        max_samples = (
+            self.persistence.water_mask_max_samples if hasattr(self.persistence, "water_mask_max_samples") else 0
+        )
+        mask = self.create_water_mask(ndwi, self.persistence.invert_water_mask, max_samples)
+
+        distance_transform_min_kernel = (
+            self.persistence.distance_transform_min_kernel
+            if hasattr(self.persistence, "distance_transform_min_kernel")
+            else 0
+        )
+
+        return self.water_mask_morphological_transform(
+            mask,
+            self.persistence.open_kernel,
+            self.persistence.close_kernel,
+            self.persistence.dilute_kernel,
+            distance_transform_min_kernel,
+        )
+
+    def get_output_profile(self, product: str) -> Union[Dict, None]:
+        """
+        Gets the output profile (data type, compression, tiling) of a product from the output_profiles setting.
+
+        :param product: "bands_indices", "classification", "heatmap" or "washed_up"
+        :return: the output profile, None if it is not configured
+        """
+
+        if not hasattr(self.persistence, "output_profiles"):
+            return None
 
-            if water_mask is not None:
-                for bands_and_indices in bands_and_indices.values():
-                    bands_and_indices[water_mask == 0] = np.nan
+        return self.persistence.output_profiles.get(product)
 
     # Static public methods
     @staticmethod
-    def create_garbage_bbox_geojson(input_path: str, file: TextIO, searched_value: List[int]) -> None:
+    def create_garbage_bbox_geojson(
+        input_path: str, file: TextIO, searched_value: List[int], connectivity: int = 4, min_area: int = 1
+    ) -> None:
         """
         Creates the GeoJSON file containing the bounding boxes of garbage areas.
 
         :param input_path: classified image or heatmap image
         :param file: the GeoJSON file
         :param searched_value: the wanted value
+        :param connectivity: 4 or 8 neighbourhood of the pixels
+        :param min_area: minimum pixel count of the areas
         :return: None
         """
 
-        bbox_coords = Model.get_bbox_coordinates_of_same_areas(input_path, searched_value)
+        bbox_coords = Model.get_bbox_coordinates_of_same_areas(input_path, searched_value, connectivity, min_area)
 
         if bbox_coords is not None:
             features = list()
@@ -710,18 +1072,42 @@ class Model(object):
             geojson.dump(feature_collection, file, indent=4)
 
     @staticmethod
-    def get_min_max_value_of_band(input_path: str, band_number: int) -> Tuple[np.float32, np.float32]:
+    def get_min_max_value_of_band(input_path: str, band_number: int, approximate: bool = False) -> Tuple[float, float]:
         """
         Calculates the minimum and maximum values of a band.
+        The values stored by GDAL or cached next to the image are used if they are available, see get_band_statistics.
 
         :param input_path: Path of an image.
         :param band_number: Serial number of a band.
+        :param approximate: Whether the values can be calculated on a downsampled version of the band.
         :return: Minimum and maximum values.
         """
 
-        with rasterio.open(input_path, "r") as img:
-            band = img.read(band_number)
-            return np.nanmin(band), np.nanmax(band)
+        return Model.get_stretch_of_band(input_path, band_number, None, approximate)
+
+    @staticmethod
+    def get_stretch_of_band(
+        input_path: str,
+        band_number: int,
+        percentiles: Union[Tuple[float, float], None] = None,
+        approximate: bool = False,
+    ) -> Tuple[float, float]:
+        """
+        Calculates the lower and upper values of a linear stretch of a band, e.g. for displaying it in web_app.
+        The statistics are computed only once per image, then they are cached in a sidecar file next to the image.
+
+        :param input_path: Path of an image.
+        :param band_number: Serial number of a band.
+        :param percentiles: The lower and upper percentiles of the stretch, the minimum and maximum values if None.
+        :param approximate: Whether the statistics can be calculated on a downsampled version (overview) of the band.
+        :return: The lower and upper values.
+        """
+
+        statistics = band_statistics.get_band_statistics(
+            input_path, band_number, approximate, percentiles=percentiles if percentiles is not None else ()
+        )
+
+        return statistics.get_stretch(percentiles)
 
     @staticmethod
     def get_coords_inside_polygon(polygon_coords: List[float], bbox_coords: Tuple[int, ...]) -> List[Tuple[int, int]]:
@@ -733,20 +1119,299 @@ class Model(object):
         :return: the list of (x, y) coordinates inside the polygon
         """
 
-        polygon_coords = list(map(int, polygon_coords))
-        polygon_coords = zip(polygon_coords[0::2], polygon_coords[1::2])
-        polygon = Polygon(polygon_coords)
+        xs, ys = Model.get_polygon_interior(polygon_coords, bbox_coords)
+
+        return list(zip(xs.tolist(), ys.tolist()))
+
+    @staticmethod
+    def get_polygon_interior(
+        polygon_coords: List[float], bbox_coords: Tuple[int, ...]
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Calculates the integer points strictly inside a polygon with a vectorized scanline fill.
+        The vertices are truncated to integers, and the points of self-intersecting polygons are inside
+        if a ray from them crosses the edges an odd number of times, the same as shapely's Polygon.contains.
+
+        :param polygon_coords: the coordinates of the vertices of a polygon (x1, y1, x2, y2, ...)
+        :param bbox_coords: the (min x, min y, max x, max y) coordinates of the searched area
+        :return: the x and y coordinates of the points inside the polygon, in row-major order
+        """
+
+        vertices = np.asarray(list(map(int, polygon_coords)), dtype=np.int64).reshape(-1, 2)
+        min_x, min_y, max_x, max_y = map(int, bbox_coords)
+        if len(vertices) < 3 or min_y > max_y:
+            return np.zeros(shape=0, dtype=np.int64), np.zeros(shape=0, dtype=np.int64)
+
+        starts, ends = vertices, np.roll(vertices, -1, axis=0)
+        rows = np.arange(min_y, max_y + 1, dtype=np.int64)
+
+        # the edges crossing the rows, a vertex belongs to the edge above it
+        row_indices, edge_indices = np.nonzero((starts[:, 1] > rows[:, None]) != (ends[:, 1] > rows[:, None]))
+        (start_x, start_y), (end_x, end_y) = starts[edge_indices].T, ends[edge_indices].T
+        y = rows[row_indices]
+
+        # the first integer x not left of the crossing, calculated exactly as the ceil of a fraction
+        denominator = end_y - start_y
+        numerator = (start_x * denominator + (y - start_y) * (end_x - start_x)) * np.sign(denominator)
+        crossings = -(-numerator // np.abs(denominator))
+
+        # every row is crossed an even number of times, the points between odd and even crossings are inside
+        order = np.lexsort((crossings, row_indices))
+        crossings, y = crossings[order], y[order]
+        lows, highs, y = crossings[0::2], crossings[1::2], y[0::2]
+
+        lengths = np.maximum(highs - lows, 0)
+        offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        xs = np.repeat(lows, lengths) + offsets
+        ys = np.repeat(y, lengths)
+
+        # the points on the edges are not inside
+        deltas = ends - starts
+        steps = np.gcd(np.abs(deltas[:, 0]), np.abs(deltas[:, 1]))
+        edge_indices = np.repeat(np.arange(len(vertices)), steps + 1)
+        positions = np.arange(len(edge_indices)) - np.repeat(np.cumsum(steps + 1) - (steps + 1), steps + 1)
+        directions = deltas[edge_indices] // np.maximum(steps[edge_indices], 1)[:, None]
+        boundary = starts[edge_indices] + positions[:, None] * directions
+
+        inside = (min_x <= xs) & (xs <= max_x)
+        inside &= ~np.isin((ys << 32) + xs, (boundary[:, 1] << 32) + boundary[:, 0])
+
+        return xs[inside], ys[inside]
+
+    @staticmethod
+    def rasterize_polygons(
+        layer: np.ndarray, polygons: Iterable[Tuple[List[float], Tuple[int, ...], int]]
+    ) -> np.ndarray:
+        """
+        Burns polygons into a label layer, the later polygons overwrite the earlier ones.
+        The pixels of a polygon are the points inside it (see get_polygon_interior), the pixels outside the layer are
+        ignored.
+
+        :param layer: the label layer of shape (height, width), modified in place
+        :param polygons: (polygon coordinates, bounding box coordinates, value) of each polygon
+        :return: the label layer
+        """
+
+        for polygon_coords, bbox_coords, value in polygons:
+            xs, ys = Model.get_polygon_interior(polygon_coords, bbox_coords)
+            on_layer = (0 <= xs) & (xs < layer.shape[1]) & (0 <= ys) & (ys < layer.shape[0])
+            layer[ys[on_layer], xs[on_layer]] = value
+
+        return layer
+
+    @staticmethod
+    def predict_with_random_forest(
+        clf: RandomForestClassifier, array: np.ndarray, garbage_class_index: int, chunk_size: int
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Classifies the pixels with Random Forest Classifier.
+        Only the pixels without NaN values are classified, in chunks of chunk_size pixels.
+
+        :param clf: an instance of RandomForestClassifier
+        :param array: the bands of the pixels, its shape is (bands, pixels)
+        :param garbage_class_index: index of the garbage class in clf.classes_
+        :param chunk_size: number of pixels classified at once
+        :return: the classes of the pixels (0 for NaN pixels) and the probabilities of the garbage class
+        (NaN for NaN pixels)
+        """
+
+        classes = clf.classes_.astype(np.int32)
+        bands, pixel_count = array.shape
+
+        classification = np.zeros(shape=pixel_count, dtype=classes.dtype)
+        garbage_probabilities = np.full(shape=pixel_count, fill_value=np.nan, dtype="float32")
+
+        valid_pixels = np.flatnonzero(~np.isnan(array).any(axis=0))
+        chunk = np.empty(shape=(min(chunk_size, valid_pixels.size), bands), dtype="float32")
+
+        for start in range(0, valid_pixels.size, chunk_size):
+            pixels = valid_pixels[start : start + chunk_size]
+            chunk_view = chunk[: pixels.size]
+            chunk_view[:] = array[:, pixels].T
+
+            pred_proba = clf.predict_proba(chunk_view)
+
+            classification[pixels] = classes.take(np.argmax(pred_proba, axis=1))
+            garbage_probabilities[pixels] = pred_proba[:, garbage_class_index]
+
+        return classification, garbage_probabilities
+
+    @staticmethod
+    def predict_with_random_forest_in_parallel(
+        clf: RandomForestClassifier,
+        array: np.ndarray,
+        garbage_class_index: int,
+        chunk_size: int,
+        workers: int,
+        clf_path: str = None,
+        start_method: str = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Classifies the pixels with Random Forest Classifier in worker processes, see predict_with_random_forest.
+        The pixels are split into tiles, which are classified by the workers and stitched together.
+        With the fork start method the workers are forked after the classifier and the pixels are loaded,
+        and get them from the pool initializer, so they share their memory pages copy-on-write instead of copying them.
+        Otherwise each worker loads the classifier from a memory-mapped joblib file, and gets the pixels of its tiles.
+
+        :param clf: an instance of RandomForestClassifier
+        :param array: the bands of the pixels, its shape is (bands, pixels)
+        :param garbage_class_index: index of the garbage class in clf.classes_
+        :param chunk_size: number of pixels classified at once by a worker
+        :param workers: number of worker processes
+        :param clf_path: path of the pickled classifier, only used without the fork start method:
+        its joblib version is cached in the temporary directory (see get_joblib_model_path).
+        If not given, the classifier is saved to a temporary joblib file.
+        :param start_method: "fork" or "spawn", by default fork is only used on Linux, because forking is unsafe
+        on macOS and with the threads of some libraries
+        :return: the classes of the pixels (0 for NaN pixels) and the probabilities of the garbage class
+        (NaN for NaN pixels)
+        """
+
+        if start_method is None:
+            start_method = "fork" if sys.platform.startswith("linux") else "spawn"
+
+        pixel_count = array.shape[1]
+        tile_bounds = np.linspace(0, pixel_count, num=max(min(workers * 4, pixel_count), 1) + 1, dtype=int)
+        tiles = list(zip(tile_bounds[:-1].tolist(), tile_bounds[1:].tolist()))
+
+        if start_method == "fork":
+            with multiprocessing.get_context("fork").Pool(
+                workers,
+                initializer=Model.init_shared_prediction_worker,
+                initargs=(clf, array, garbage_class_index, chunk_size),
+            ) as pool:
+                results = pool.starmap(Model.predict_shared_tile_with_random_forest, tiles)
+        else:
+            with tempfile.TemporaryDirectory() as temp_dir:
+                if clf_path is None:
+                    model_path = os.path.join(temp_dir, "clf.joblib")
+                    joblib.dump(clf, model_path)
+                else:
+                    model_path = Model.get_joblib_model_path(clf, clf_path)
+
+                results = joblib.Parallel(n_jobs=workers)(
+                    joblib.delayed(Model.predict_tile_with_random_forest)(
+                        model_path, os.path.getmtime(model_path), array[:, start:stop], garbage_class_index, chunk_size
+                    )
+                    for start, stop in tiles
+                )
+
+        classification = np.concatenate([result[0] for result in results])
+        garbage_probabilities = np.concatenate([result[1] for result in results])
+
+        return classification, garbage_probabilities
+
+    @staticmethod
+    def init_shared_prediction_worker(
+        clf: RandomForestClassifier, array: np.ndarray, garbage_class_index: int, chunk_size: int
+    ) -> None:
+        """
+        Initializes a forked worker process of predict_with_random_forest_in_parallel.
+        The arguments are inherited from the parent process by the fork, they are not pickled.
+
+        :param clf: an instance of RandomForestClassifier
+        :param array: the bands of the pixels, its shape is (bands, pixels)
+        :param garbage_class_index: index of the garbage class in clf.classes_
+        :param chunk_size: number of pixels classified at once
+        :return: None
+        """
+
+        global _worker_prediction
+
+        # the garbage collector would write into every inherited object, copying their memory pages
+        gc.freeze()
+        # the parallelism is given by the worker processes
+        clf.n_jobs = 1
+        _worker_prediction = (clf, array, garbage_class_index, chunk_size)
+
+    @staticmethod
+    def predict_shared_tile_with_random_forest(start: int, stop: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Classifies a tile in a forked worker process with the classifier and the pixels inherited from the parent,
+        see init_shared_prediction_worker.
+
+        :param start: index of the first pixel of the tile
+        :param stop: index after the last pixel of the tile
+        :return: the classes and the garbage probabilities of the pixels
+        """
+
+        clf, array, garbage_class_index, chunk_size = _worker_prediction
+
+        return Model.predict_with_random_forest(clf, array[:, start:stop], garbage_class_index, chunk_size)
+
+    @staticmethod
+    def predict_tile_with_random_forest(
+        model_path: str, model_mtime: float, array: np.ndarray, garbage_class_index: int, chunk_size: int
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Classifies a tile in a worker process with the classifier loaded from a joblib file,
+        see predict_with_random_forest.
+
+        :param model_path: path of the classifier in joblib format
+        :param model_mtime: modification time of the classifier file, the loaded classifier is reused until it changes
+        :param array: the bands of the pixels of the tile, its shape is (bands, pixels)
+        :param garbage_class_index: index of the garbage class in clf.classes_
+        :param chunk_size: number of pixels classified at once
+        :return: the classes and the garbage probabilities of the pixels
+        """
+
+        clf = Model.load_joblib_model(model_path, model_mtime)
+
+        return Model.predict_with_random_forest(clf, array, garbage_class_index, chunk_size)
+
+    @staticmethod
+    @functools.lru_cache(maxsize=2)
+    def load_joblib_model(model_path: str, model_mtime: float) -> RandomForestClassifier:
+        """
+        Loads a classifier saved in joblib format, with its arrays memory-mapped read-only instead of read into memory.
+        The loaded classifier is cached, so a worker process loads it only once. Note that scikit-learn copies
+        the nodes of the trees while unpickling them, so every worker holds its own copy of the trees.
+
+        :param model_path: path of the classifier in joblib format
+        :param model_mtime: modification time of the file, only used as part of the cache key
+        :return: the classifier, which runs in a single thread
+        """
+
+        clf = joblib.load(model_path, mmap_mode="r")
+        # the parallelism is given by the worker processes
+        clf.n_jobs = 1
+
+        return clf
+
+    @staticmethod
+    def get_joblib_model_path(clf: RandomForestClassifier, clf_path: str, cache_dir: str = None) -> str:
+        """
+        Gets the path of the joblib version of a pickled classifier, which is faster to load in the workers.
+        The joblib file is cached in the temporary directory, its name contains a hash of the path of the classifier.
+        It is (re)created if it does not exist or it is older than the classifier,
+        the new file is written to a temporary file first and then moved into place atomically.
+
+        :param clf: the loaded classifier
+        :param clf_path: path of the pickled classifier
+        :param cache_dir: the directory of the joblib file, the temporary directory if not given
+        :return: path of the joblib file
+        """
+
+        if cache_dir is None:
+            cache_dir = tempfile.gettempdir()
 
-        bbox_coords = list(map(int, bbox_coords))
-        coords = list()
+        name = os.path.splitext(os.path.basename(clf_path))[0]
+        digest = hashlib.sha1(os.path.abspath(clf_path).encode("utf-8")).hexdigest()[:12]
+        model_path = os.path.join(cache_dir, f"{name}-{digest}.joblib")
 
-        for y in range(bbox_coords[1], bbox_coords[3] + 1):
-            for x in range(bbox_coords[0], bbox_coords[2] + 1):
-                p = Point(x, y)
-                if polygon.contains(p):
-                    coords.append((x, y))
+        if os.path.exists(model_path) and os.path.getmtime(model_path) >= os.path.getmtime(clf_path):
+            return model_path
+
+        file_descriptor, temp_path = tempfile.mkstemp(suffix=".joblib.tmp", dir=cache_dir)
+        try:
+            with os.fdopen(file_descriptor, "wb") as file:
+                joblib.dump(clf, file)
+            os.replace(temp_path, model_path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
 
-        return coords
+        return model_path
 
     @staticmethod
     def save_tif(
@@ -757,6 +1422,7 @@ class Model(object):
         output_path: str,
         new_geo_trans: Tuple[float, float] = None,
         metadata: Dict[str, str] = None,
+        profile: Dict = None,
     ) -> None:
         """
         Saves arrays (1 or more) to a georeferenced tif file.
@@ -768,9 +1434,54 @@ class Model(object):
         :param output_path: path of the output image
         :param new_geo_trans: other GeoTransform if it is needed
         :param metadata: metadata that can be added to the file if needed
+        :param profile: output profile (data type, compression, tiling), see gdal_utils.get_creation_options
         :return: None
         """
 
+        data_type, no_data_value = gdal_utils.get_output_data_type(array[:band_count], profile)
+        dataset = Model.create_tif(
+            input_path, shape, band_count, output_path, new_geo_trans, metadata, profile, data_type, no_data_value
+        )
+
+        for band in range(band_count):
+            band_array = array[band][:, :]
+            if data_type != gdal.GDT_Float32 and no_data_value is not None:
+                band_array = np.where(np.isnan(band_array), no_data_value, band_array)
+
+            outband = dataset.GetRasterBand(band + 1)
+            outband.WriteArray(band_array)
+            outband.FlushCache()
+
+        dataset.FlushCache()
+        del dataset
+
+    @staticmethod
+    def create_tif(
+        input_path: str,
+        shape: Tuple[int, int],
+        band_count: int,
+        output_path: str,
+        new_geo_trans: Tuple[float, float] = None,
+        metadata: Dict[str, str] = None,
+        profile: Dict = None,
+        data_type: int = gdal.GDT_Float32,
+        no_data_value: Union[float, None] = float("NaN"),
+    ) -> gdal.Dataset:
+        """
+        Creates an empty georeferenced tif file, the bands can be written later.
+
+        :param input_path: georeferenced input image
+        :param shape: shape of the output image
+        :param band_count: number of bands in the output tif file
+        :param output_path: path of the output image
+        :param new_geo_trans: other GeoTransform if it is needed
+        :param metadata: metadata that can be added to the file if needed
+        :param profile: output profile (compression, tiling), see gdal_utils.get_creation_options
+        :param data_type: GDAL data type of the bands
+        :param no_data_value: no data value of the bands, None if it is not set
+        :return: the opened dataset
+        """
+
         try:
             img_gdal = gdal.Open(input_path, gdal.GA_ReadOnly)
             x_pixels = shape[1]
@@ -786,23 +1497,70 @@ class Model(object):
                 geotrans[3] = new_geo_trans[1]
                 geotrans = tuple(geotrans)
 
-            dataset = driver.Create(output_path, x_pixels, y_pixels, band_count, gdal.GDT_Float32)
+            options = gdal_utils.get_creation_options(profile, data_type)
+            dataset = driver.Create(output_path, x_pixels, y_pixels, band_count, data_type, options)
             dataset.SetGeoTransform(geotrans)
             dataset.SetProjection(projection)
 
             if not (metadata is None):
                 dataset.SetMetadata(metadata)
 
-            for band in range(band_count):
-                outband = dataset.GetRasterBand(band + 1)
-                outband.WriteArray(array[band][:, :])
-                outband.SetNoDataValue(float("NaN"))
-                outband.FlushCache()
+            if no_data_value is not None:
+                for band in range(band_count):
+                    dataset.GetRasterBand(band + 1).SetNoDataValue(no_data_value)
 
-            dataset.FlushCache()
+            return dataset
         finally:
             del img_gdal
 
+    @staticmethod
+    def get_input_band_names(band_names: List[str], index_names: List[str]) -> List[str]:
+        """
+        Returns the bands to be read to save the given bands and indices.
+
+        :param band_names: names of the bands to be saved
+        :param index_names: names of the indices to be saved
+        :return: the bands to be saved, followed by the other bands needed by the indices
+        """
+        return band_names + [
+            band_name for band_name in IndexCalculator.get_required_bands(index_names) if band_name not in band_names
+        ]
+
+    @staticmethod
+    def get_block_windows(rows: int, cols: int, block_size: int) -> List[Window]:
+        """
+        Splits an image into block_size x block_size windows (smaller at the right and bottom edges).
+
+        :param rows: number of rows of the image
+        :param cols: number of columns of the image
+        :param block_size: width and height of the windows in pixels
+        :return: list of windows covering the image, in row-major order
+        """
+
+        windows = list()
+        for row_off in range(0, rows, block_size):
+            for col_off in range(0, cols, block_size):
+                height = min(block_size, rows - row_off)
+                width = min(block_size, cols - col_off)
+                windows.append(Window(col_off, row_off, width, height))
+
+        return windows
+
+    @staticmethod
+    def window_slices(window: Window) -> Tuple[slice, slice]:
+        """
+        Returns the row and column slices of a window, for indexing full size arrays.
+
+        :param window: a window of the image
+        :return: row and column slices
+        """
+
+        row_off, col_off = int(window.row_off), int(window.col_off)
+        return (
+            slice(row_off, row_off + int(window.height)),
+            slice(col_off, col_off + int(window.width)),
+        )
+
     @staticmethod
     def output_path(
         input_paths: List[str],
@@ -878,32 +1636,82 @@ class Model(object):
         :param search_value: Numerical value of the pixels.
         :return:
         """
+
+        Model.get_waste_geojsons(input_file, {search_value: output_file})
+
+    @staticmethod
+    def get_waste_geojsons(input_file: str, output_files: Dict[int, str]) -> None:
+        """
+        Unites the adjacent pixels, then creates a GeoJSON file for each searched value containing the result polygons.
+        The input is read and polygonized only once, the polygons are distributed among the outputs by their value.
+
+        :param input_file: Path of input file.
+        :param output_files: Path of output file for each numerical value of the pixels.
+        :return:
+        """
+
+        input_ds = gdal.Open(input_file)
+        mask_ds, polygon_ds = None, None
+        output_datasets = dict()
+
         try:
-            input_ds = gdal.Open(input_file)
             projection = input_ds.GetProjection()
             input_band = input_ds.GetRasterBand(1)
-
-            driver = gdal.ogr.GetDriverByName("GeoJSON")
-            output_ds = driver.CreateDataSource(output_file)
             spatial_reference = gdal.osr.SpatialReference(wkt=projection)
 
-            output_layer = output_ds.CreateLayer("layer", srs=spatial_reference)
-
-            field_definition = gdal.ogr.FieldDefn("field", gdal.ogr.OFTInteger)
-            output_layer.CreateField(field_definition)
-            output_field = output_layer.GetLayerDefn().GetFieldIndex("field")
-
             raster_data = input_band.ReadAsArray()
-            mask = raster_data == search_value
+            mask = np.isin(raster_data, list(output_files.keys()))
             mask_ds = gdal_utils.create_in_memory_dataset(mask, input_ds, gdal.GDT_Byte)
 
-            response = gdal.Polygonize(input_band, mask_ds.GetRasterBand(1), output_layer, output_field)
+            polygon_ds = gdal.ogr.GetDriverByName("Memory").CreateDataSource("")
+            polygon_layer = Model.create_geojson_layer(polygon_ds, spatial_reference)
+            polygon_field = polygon_layer.GetLayerDefn().GetFieldIndex("field")
+
+            response = gdal.Polygonize(input_band, mask_ds.GetRasterBand(1), polygon_layer, polygon_field)
             if response != 0:
                 logging.error("something went wrong when creating polygon. Error code: %s", response)
+
+            driver = gdal.ogr.GetDriverByName("GeoJSON")
+            output_layers = dict()
+            for search_value, output_file in output_files.items():
+                output_datasets[search_value] = driver.CreateDataSource(output_file)
+                output_layers[search_value] = Model.create_geojson_layer(
+                    output_datasets[search_value], spatial_reference
+                )
+
+            polygon_layer.ResetReading()
+            for polygon in polygon_layer:
+                value = polygon.GetField(polygon_field)
+                if value not in output_layers:
+                    continue
+
+                output_layer = output_layers[value]
+                feature = gdal.ogr.Feature(output_layer.GetLayerDefn())
+                feature.SetGeometry(polygon.GetGeometryRef())
+                feature.SetField("field", value)
+                output_layer.CreateFeature(feature)
         finally:
-            del input_ds
-            del output_ds
+            output_datasets.clear()
+            del polygon_ds
             del mask_ds
+            del input_ds
+
+    @staticmethod
+    def create_geojson_layer(
+        data_source: gdal.ogr.DataSource, spatial_reference: gdal.osr.SpatialReference
+    ) -> gdal.ogr.Layer:
+        """
+        Creates the layer of the polygons with an integer field named "field" for the pixel values.
+
+        :param data_source: The data source containing the layer.
+        :param spatial_reference: Spatial reference of the layer.
+        :return: The created layer.
+        """
+
+        layer = data_source.CreateLayer("layer", srs=spatial_reference)
+        layer.CreateField(gdal.ogr.FieldDefn("field", gdal.ogr.OFTInteger))
+
+        return layer
 
     @staticmethod
     def convert_multipolygons_to_polygons(data_file: Dict) -> Dict:
@@ -928,23 +1736,15 @@ class Model(object):
         """
         Transforms coordinates from one CRS to another.
 
+        All coordinates are transformed with a single call of a cached transformer.
+
         :param coords: List of coordinates: [[x1, y1], [x2, y2], ...].
         :param crs_from: Projection of input data.
         :param crs_to: Projection of output data.
         :return: List of transformed coordinates.
         """
 
-        transformed_coords = copy.deepcopy(coords)
-
-        transformer = pyproj.Transformer.from_crs(crs_from=crs_from, crs_to=crs_to, always_xy=True)
-
-        for i in range(len(coords)):
-            x, y = coords[i]
-            new_x, new_y = transformer.transform(x, y)
-            transformed_coords[i][0] = new_x
-            transformed_coords[i][1] = new_y
-
-        return transformed_coords
+        return projections.transform_coordinates(coords, crs_from, crs_to).tolist()
 
     @staticmethod
     def transform_dict_of_coordinates_to_crs(data_file: Dict, crs_to: str) -> Dict:
@@ -956,17 +1756,22 @@ class Model(object):
         :return: Transformed version of data_file.
         """
 
-        transformed_data_file = copy.deepcopy(data_file)
-        for feature in transformed_data_file["features"]:
-            crs_from = "epsg:4326"
-            if "crs" in transformed_data_file.keys():
-                crs_from = transformed_data_file["crs"]["properties"]["name"]
+        crs_from = "epsg:4326"
+        if "crs" in data_file.keys():
+            crs_from = data_file["crs"]["properties"]["name"]
 
-            coordinates = feature["geometry"]["coordinates"][0]
+        # the exterior rings of all features are transformed together
+        rings = [feature["geometry"]["coordinates"][0] for feature in data_file["features"]]
+        transformed_rings = projections.transform_rings(rings, crs_from, crs_to)
 
-            transformed_coords = Model.transform_list_of_coordinates_to_crs(coordinates, crs_from, crs_to)
-
-            feature["geometry"]["coordinates"] = [transformed_coords]
+        # only the transformed parts are copied, the rest of the features is shared with data_file
+        transformed_data_file = dict(data_file)
+        transformed_data_file["features"] = list()
+        for feature, transformed_coords in zip(data_file["features"], transformed_rings):
+            transformed_feature = dict(feature)
+            transformed_feature["geometry"] = dict(feature["geometry"])
+            transformed_feature["geometry"]["coordinates"] = [transformed_coords]
+            transformed_data_file["features"].append(transformed_feature)
 
         transformed_data_file["crs"] = dict()
         transformed_data_file["crs"]["properties"] = dict()
@@ -994,78 +1799,92 @@ class Model(object):
                 dtype="float32,float32",
             )
 
-            for i in range(height):
-                for j in range(width):
-                    coords_xy[i, j] = Model.get_coords_of_pixel(i, j, gt)
+            i, j = np.indices((height, width))
+            x_coords, y_coords = Model.get_coords_of_pixel(i, j, gt)
+            coords_xy["f0"] = x_coords
+            coords_xy["f1"] = y_coords
 
             return coords_xy
         finally:
             del ds
 
     @staticmethod
-    def get_empty_intersection_matrix_and_start_coords(
+    def get_intersection_windows(
         input_path_1: str, input_path_2: str
-    ) -> Union[Tuple[np.ndarray, Tuple], Tuple[None, None]]:
+    ) -> Union[Tuple[Window, Window, Tuple], Tuple[None, None, None]]:
         """
-        Calculates the intersection of two different sized matrices.
+        Calculates the intersection of two images on the same pixel grid, based on their GeoTransforms.
 
         :param input_path_1: path of the first input image
         :param input_path_2: path of the second input image
-        :return: empty intersection matrix, coordinate information for later use
+        :return: window of the intersection on the first and on the second image, coordinate information for later use:
+        (coordinates of the upper left pixel of the intersection, its index on the larger image, its index on the smaller
+        image)
         """
 
-        coords_1 = Model.calculate_coords_for_pixels(input_path_1)
-        coords_2 = Model.calculate_coords_for_pixels(input_path_2)
+        with rasterio.open(input_path_1, "r") as img_1, rasterio.open(input_path_2, "r") as img_2:
+            gt_1 = img_1.transform.to_gdal()
+            gt_2 = img_2.transform.to_gdal()
+            shape_1 = img_1.height, img_1.width
+            shape_2 = img_2.height, img_2.width
 
-        if (coords_1 is not None) and (coords_2 is not None):
-            img_1_size = coords_1.shape[0] * coords_1.shape[1]
-            img_2_size = coords_2.shape[0] * coords_2.shape[1]
+        if not np.allclose(gt_1[1:3] + gt_1[4:6], gt_2[1:3] + gt_2[4:6]) or gt_1[2] != 0 or gt_1[4] != 0:
+            logging.warning("The images must have the same pixel size and must not be rotated!")
+            return None, None, None
 
-            larger_img = coords_1 if img_1_size >= img_2_size else coords_2
-            smaller_img = coords_1 if img_1_size < img_2_size else coords_2
+        # position of the upper left pixel of the second image on the first image
+        col_shift = (gt_2[0] - gt_1[0]) / gt_1[1]
+        row_shift = (gt_2[3] - gt_1[3]) / gt_1[5]
 
-            selector = np.in1d(larger_img.flatten(), smaller_img.flatten())
-            intersection = list(compress(range(len(selector)), selector))
+        if not np.isclose(col_shift, round(col_shift), atol=1e-3) or not np.isclose(
+            row_shift, round(row_shift), atol=1e-3
+        ):
+            logging.warning("The pixel grids of the images are not aligned!")
+            return None, None, None
 
-            new_rows, new_cols = 0, 0
+        col_shift, row_shift = round(col_shift), round(row_shift)
 
-            if intersection:
-                larger_rows, larger_cols = np.unravel_index(intersection, larger_img.shape)
-                larger_start_index = (larger_rows[0], larger_cols[0])
+        row_start, row_end = max(0, row_shift), min(shape_1[0], shape_2[0] + row_shift)
+        col_start, col_end = max(0, col_shift), min(shape_1[1], shape_2[1] + col_shift)
 
-                start_coord = larger_img[larger_start_index]
+        if row_start >= row_end or col_start >= col_end:
+            return None, None, None
 
-                smaller_start_index = np.where(smaller_img == start_coord)
-                smaller_start_index = (
-                    smaller_start_index[0][0],
-                    smaller_start_index[1][0],
-                )
+        window_1 = Window(col_start, row_start, col_end - col_start, row_end - row_start)
+        window_2 = Window(col_start - col_shift, row_start - row_shift, col_end - col_start, row_end - row_start)
 
-                i, j = larger_start_index
-                k, l = smaller_start_index
+        start_coord = Model.get_coords_of_pixel(row_start, col_start, gt_1)
+        start_index_1 = (row_start, col_start)
+        start_index_2 = (row_start - row_shift, col_start - col_shift)
 
-                while i < larger_img.shape[0] and k < smaller_img.shape[0]:
-                    new_rows += 1
-                    i += 1
-                    k += 1
+        if shape_1[0] * shape_1[1] >= shape_2[0] * shape_2[1]:
+            coords_information = (start_coord, start_index_1, start_index_2)
+        else:
+            coords_information = (start_coord, start_index_2, start_index_1)
 
-                while j < larger_img.shape[1] and l < smaller_img.shape[1]:
-                    new_cols += 1
-                    j += 1
-                    l += 1
+        return window_1, window_2, coords_information
 
-                intersection_matrix = np.ndarray(
-                    shape=(new_rows, new_cols),
-                    dtype="float32",
-                )
+    @staticmethod
+    def get_empty_intersection_matrix_and_start_coords(
+        input_path_1: str, input_path_2: str
+    ) -> Union[Tuple[np.ndarray, Tuple], Tuple[None, None]]:
+        """
+        Calculates the intersection of two different sized matrices.
 
-                coords_information = (
-                    start_coord,
-                    larger_start_index,
-                    smaller_start_index,
-                )
+        :param input_path_1: path of the first input image
+        :param input_path_2: path of the second input image
+        :return: empty intersection matrix, coordinate information for later use
+        """
+
+        window_1, _, coords_information = Model.get_intersection_windows(input_path_1, input_path_2)
+
+        if window_1 is not None:
+            intersection_matrix = np.ndarray(
+                shape=(window_1.height, window_1.width),
+                dtype="float32",
+            )
 
-                return intersection_matrix, coords_information
+            return intersection_matrix, coords_information
 
         return None, None
 
@@ -1079,6 +1898,7 @@ class Model(object):
     ) -> Union[np.ndarray, None]:
         """
         Morphological transformations: https://docs.opencv.org/4.5.2/d9/d61/tutorial_py_morphological_ops.html
+        Reads the input image and saves the result, see apply_morphology for the in-memory version.
 
         :param morph_type: type of the morphology: "erosion", "dilation", "opening", "closing"
         :param path: input path
@@ -1090,18 +1910,8 @@ class Model(object):
 
         try:
             img = cv.imread(path, 2)
-            kernel = np.ones(matrix, np.uint8)
 
-            operation = None
-
-            if morph_type == "erosion":
-                operation = cv.erode(img, kernel, iterations=iterations)
-            elif morph_type == "dilation":
-                operation = cv.dilate(img, kernel, iterations=iterations)
-            elif morph_type == "opening":
-                operation = cv.morphologyEx(img, cv.MORPH_OPEN, kernel)
-            elif morph_type == "closing":
-                operation = cv.morphologyEx(img, cv.MORPH_CLOSE, kernel)
+            operation = Model.apply_morphology(morph_type, img, matrix, iterations)
 
             Model.save_tif(
                 input_path=path,
@@ -1118,128 +1928,60 @@ class Model(object):
             del img
 
     @staticmethod
-    def valid_row(shape: Tuple[int, int], row: int) -> bool:
-        """
-        Decides whether the given row is inside the array with the given shape, or not.
-        Source: https://playandlearntocode.com/article/flood-fill-algorithm-in-python
-
-        :param shape: shape of the array
-        :param row: index of the row
-        :return: True or False
-        """
-
-        return 0 <= row < shape[0]
-
-    @staticmethod
-    def valid_col(shape: Tuple[int, int], col: int) -> bool:
-        """
-        Decides whether the given column is inside the array with the given shape, or not.
-        Source: https://playandlearntocode.com/article/flood-fill-algorithm-in-python
-
-        :param shape: shape of the array
-        :param col: index of the column
-        :return: True or False
-        """
-
-        return 0 <= col < shape[1]
-
-    @staticmethod
-    def is_search_value(matrix: np.ndarray, row: int, col: int, search_value: List[int]) -> bool:
+    def apply_morphology(
+        morph_type: str,
+        img: np.ndarray,
+        matrix: Tuple[int, int] = (3, 3),
+        iterations: int = 1,
+    ) -> np.ndarray:
         """
-        Checks whether the value of the given pixel is the expected value or not.
-        Source: https://playandlearntocode.com/article/flood-fill-algorithm-in-python
+        Morphological transformations: https://docs.opencv.org/4.5.2/d9/d61/tutorial_py_morphological_ops.html
 
-        :param matrix: an array of a classified image or a heatmap image
-        :param row: row index
-        :param col: column index
-        :param search_value: the expected value
-        :return: True or False
+        :param morph_type: type of the morphology: "erosion", "dilation", "opening", "closing"
+        :param img: input matrix
+        :param matrix: the helper matrix used for the algorithm
+        :param iterations: number of iterations per image
+        :return: matrix representing the result of transformation
+        :raise ValueError: if the type of the morphology is unknown
         """
 
-        if not Model.valid_row(matrix.shape, row):
-            return False
+        kernel = np.ones(matrix, np.uint8)
 
-        if not Model.valid_col(matrix.shape, col):
-            return False
+        if morph_type == "erosion":
+            return cv.erode(img, kernel, iterations=iterations)
+        if morph_type == "dilation":
+            return cv.dilate(img, kernel, iterations=iterations)
+        if morph_type == "opening":
+            return cv.morphologyEx(img, cv.MORPH_OPEN, kernel)
+        if morph_type == "closing":
+            return cv.morphologyEx(img, cv.MORPH_CLOSE, kernel)
 
-        if matrix[row, col] in search_value:
-            return True
-        else:
-            return False
+        raise ValueError(f"Unknown morphology: {morph_type}")
 
     @staticmethod
-    def iterative_flood_fill(
-        matrix: np.ndarray, row: int, col: int, search_value: List[int]
-    ) -> Union[List[Tuple[int, int]], None]:
+    def find_regions(matrix: np.ndarray, search_value: List[int]) -> List[List[Tuple[int, int]]]:
         """
-        Iterative version of Flood fill algorithm.
-        Returns the indices of a region containing the expected value.
-        Source: https://playandlearntocode.com/article/flood-fill-algorithm-in-python
+        Calculates all the separate regions containing the expected value.
+        Kept for compatibility, see regions.find_regions for bounding boxes, pixel counts and centroids.
 
         :param matrix: an array of a classified image or a heatmap image
-        :param row: row index
-        :param col: column index
         :param search_value: the expected value
-        :return: list of tuples containing the coordinates of pixels inside the region
+        :return: list of all the regions, the (row, column) indices of their pixels in row-major order
         """
 
-        if not Model.valid_row(matrix.shape, row):
-            return
-
-        if not Model.valid_col(matrix.shape, col):
-            return
-
-        if matrix[row, col] not in search_value:
-            return
-
-        q = list()  # init empty queue (FIFO)
-        matrix[row, col] = -1  # mark as visited
-        q.append([row, col])  # add to queue
-        region = list()
-
-        while len(q) > 0:
-            [cur_row, cur_col] = q[0]
-            region.append(tuple(q[0]))
-
-            del q[0]
-
-            if Model.is_search_value(matrix, cur_row - 1, cur_col, search_value):
-                matrix[cur_row - 1, cur_col] = -1
-                q.append([cur_row - 1, cur_col])
-
-            if Model.is_search_value(matrix, cur_row + 1, cur_col, search_value):
-                matrix[cur_row + 1, cur_col] = -1
-                q.append([cur_row + 1, cur_col])
-
-            if Model.is_search_value(matrix, cur_row, cur_col - 1, search_value):
-                matrix[cur_row, cur_col - 1] = -1
-                q.append([cur_row, cur_col - 1])
+        labels, region_count = regions.label_regions(matrix, search_value)
 
-            if Model.is_search_value(matrix, cur_row, cur_col + 1, search_value):
-                matrix[cur_row, cur_col + 1] = -1
-                q.append([cur_row, cur_col + 1])
+        if region_count == 0:
+            return list()
 
-        return region
+        rows, cols = np.nonzero(labels)
+        pixel_labels = labels[rows, cols]
+        order = np.argsort(pixel_labels, kind="stable")
+        split_indices = np.cumsum(np.bincount(pixel_labels)[1:])[:-1]
 
-    @staticmethod
-    def find_regions(matrix: np.ndarray, search_value: List[int]) -> List[List[Tuple[int, int]]]:
-        """
-        Calculates all the separate regions containing the expected value.
-
-        :param matrix: an array of a classified image or a heatmap image
-        :param search_value: the expected value
-        :return: list of all the regions
-        """
-
-        rows, cols = matrix.shape
         all_regions = list()
-
-        for row in range(rows):
-            for col in range(cols):
-                if matrix[row, col] in search_value:
-                    region = Model.iterative_flood_fill(matrix, row, col, search_value)
-                    if not (region is None):
-                        all_regions.append(region)
+        for region_rows, region_cols in zip(np.split(rows[order], split_indices), np.split(cols[order], split_indices)):
+            all_regions.append(list(zip(region_rows.tolist(), region_cols.tolist())))
 
         return all_regions
 
@@ -1288,13 +2030,15 @@ class Model(object):
 
     @staticmethod
     def get_bbox_coordinates_of_same_areas(
-        input_path: str, search_value: List[int]
+        input_path: str, search_value: List[int], connectivity: int = 4, min_area: int = 1
     ) -> Union[List[List[Tuple[int, ...]]], None]:
         """
         Calculates the coordinates of bounding boxes of the same areas.
 
         :param input_path: path of a classified image or a heatmap image
         :param search_value: the wanted value
+        :param connectivity: 4 or 8 neighbourhood of the pixels
+        :param min_area: minimum pixel count of the areas
         :return: list of coordinates of bounding boxes of the same areas
         """
 
@@ -1307,17 +2051,16 @@ class Model(object):
             pixel_size_x = gt[1]
             pixel_size_y = -gt[5]
 
-            regions = Model.find_regions(matrix, search_value)
-            bboxes = Model.get_bbox_indices_of_all_regions(regions)
             bbox_coords = list()
 
-            for bbox in bboxes:
+            for region in regions.find_regions(matrix, search_value, connectivity, min_area):
+                min_row, min_col, max_row, max_col = region.bbox
                 coords = list()
 
-                upper_left = Model.get_coords_of_pixel(bbox[0][0], bbox[0][1], gt)
-                upper_right = Model.get_coords_of_pixel(bbox[1][0], bbox[1][1], gt)
-                bottom_right = Model.get_coords_of_pixel(bbox[2][0], bbox[2][1], gt)
-                bottom_left = Model.get_coords_of_pixel(bbox[3][0], bbox[3][1], gt)
+                upper_left = Model.get_coords_of_pixel(min_row, min_col, gt)
+                upper_right = Model.get_coords_of_pixel(min_row, max_col, gt)
+                bottom_right = Model.get_coords_of_pixel(max_row, max_col, gt)
+                bottom_left = Model.get_coords_of_pixel(max_row, min_col, gt)
 
                 coords.append(upper_left)
                 coords.append((upper_right[0] + pixel_size_x, upper_right[1]))
@@ -1333,26 +2076,33 @@ class Model(object):
             del dataset
 
     @staticmethod
-    def create_water_mask(ndwi: np.ndarray, invert_mask: bool) -> np.ndarray:
+    def create_water_mask(ndwi: np.ndarray, invert_mask: bool, max_samples: int = 0) -> np.ndarray:
         """
         Create water mask using ndwi values and minimum thresholding
 
         :param ndwi: array of ndwi indices
         :param invert_mask: inverts result of water masking
+        :param max_samples: maximum number of pixels used for the histogram of the threshold, all pixels if not positive
 
         :return: created water masks
         """
-        non_nan_ndwi = np.nan_to_num(ndwi, nan=np.nanmin(ndwi))
-        median_filtered = median_filter(non_nan_ndwi, size=3)
-        threshold = threshold_minimum(median_filtered)
-
-        mask_condition = invert_mask ^ (median_filtered > threshold)
+        result = water_masking.create_water_mask(ndwi, invert_mask, max_samples)
+        logging.info(
+            "Water mask threshold: %.4f (median filter %.3f s, threshold %.3f s)",
+            result.threshold,
+            result.median_time,
+            result.threshold_time,
+        )
 
-        return np.uint8(mask_condition) * 255
+        return result.mask
 
     @staticmethod
     def water_mask_morphological_transform(
-        water_mask: np.ndarray, open_kernel: int, close_kernel: int, dilute_kernel: int
+        water_mask: np.ndarray,
+        open_kernel: int,
+        close_kernel: int,
+        dilute_kernel: int,
+        distance_transform_min_kernel: int = 0,
     ) -> np.ndarray:
         """
         Transform water mask, applying opening closing and then diluting morphological transformations.
@@ -1361,22 +2111,15 @@ class Model(object):
         :param open_kernel: size of kernel used in opening
         :param close_kernel: size of kernel used in closing
         :param dilute_kernel: size of kernel used in diluting
+        :param distance_transform_min_kernel: kernels of at least this size are applied with the distance transform,
+        whose runtime does not depend on the kernel size (see water_masking.apply_morphology). Not used if 0.
         :return: transformed water mask after applying opening, closing, and dilating morphological operations.
         """
         try:
-            # Morphological open to reduce noise
-            kernel = cv.getStructuringElement(cv.MORPH_ELLIPSE, (open_kernel, open_kernel))
-            opened_mask = cv.morphologyEx(water_mask, cv.MORPH_OPEN, kernel)
-
-            # Morphological close to connect gaps
-            kernel = cv.getStructuringElement(cv.MORPH_ELLIPSE, (close_kernel, close_kernel))
-            closed = cv.morphologyEx(opened_mask, cv.MORPH_CLOSE, kernel)
-
-            # Dilate closed image
-            kernel = cv.getStructuringElement(cv.MORPH_ELLIPSE, (dilute_kernel, dilute_kernel))
-            diluted = cv.dilate(closed, kernel)
-
-            return diluted
+            # open to reduce noise, close to connect gaps, then dilate
+            return water_masking.morphological_transform(
+                water_mask, open_kernel, close_kernel, dilute_kernel, distance_transform_min_kernel
+            )
 
         except Exception:
             logging.warning("Error apply morphological transformation to the water mask: ")
@@ -1408,8 +2151,7 @@ class FloodPrediction:
         """
         Returns the elevation for a given point from a DEM file.
         """
-        transformer = pyproj.Transformer.from_crs(point_crs, dem_crs, always_xy=True)
-        x, y = transformer.transform(point.x, point.y)
+        x, y = projections.get_transformer(point_crs, dem_crs).transform(point.x, point.y)
         with rasterio.open(dem_path) as dem:
             row, col = dem.index(x, y)
             return float(dem.read(1)[row, col])
@@ -1,8 +1,8 @@
 import os
 import json
-import pickle
 import geojson
 import jsonmerge
+from model.registry import registry
 
 
 class Persistence(object):
@@ -18,10 +18,24 @@ class Persistence(object):
         """
 
         self.config_file_path = config_file_path
-        self.clf = None
+        self._clf = None
         self.data_file = None
         self.load()
 
+    @property
+    def clf(self):
+        """
+        The Random Forest classifier of clf_path, it is loaded on first use and cached in the model registry.
+        """
+
+        if self._clf is None and hasattr(self, "clf_path"):
+            return registry.get_random_forest(self.clf_path)
+        return self._clf
+
+    @clf.setter
+    def clf(self, clf) -> None:
+        self._clf = clf
+
     # Non-static public methods
     def load(self) -> None:
         """
@@ -48,10 +62,6 @@ class Persistence(object):
             with open(self.data_file_path, "r") as file:
                 self.data_file = geojson.load(file)
 
-        if hasattr(self, "clf_path"):
-            with open(self.clf_path, "rb") as file:
-                self.clf = pickle.load(file)
-
     def save(self) -> None:
         """
         Saves the values of the data members to the config file.
@@ -59,7 +69,7 @@ class Persistence(object):
         :return: None
         """
 
-        settings = dict(self.__dict__)
+        settings = {key: value for key, value in self.__dict__.items() if not key.startswith("_")}
         del settings["config_file_path"]
 
         with open(self.config_file_path, "r") as file:
@@ -0,0 +1,66 @@
+import pyproj
+import threading
+import numpy as np
+from typing import Dict, List, Tuple, Union
+
+# the transformers are cached per thread, because a pyproj Transformer must not be used by several threads at once
+_local = threading.local()
+
+
+def get_transformer(crs_from: str, crs_to: str) -> pyproj.Transformer:
+    """
+    Returns the cached transformer between two CRSs, the transformer is created on first use.
+    The coordinates are always in (x, y) order, i.e. (longitude, latitude) for geographic CRSs.
+    :param crs_from: the projection of the input coordinates, e.g. "epsg:4326"
+    :param crs_to: the projection of the output coordinates
+    :returns: the transformer.
+    """
+    transformers: Dict[Tuple[str, str], pyproj.Transformer] = _local.__dict__.setdefault("transformers", dict())
+
+    key = (crs_from, crs_to)
+    if key not in transformers:
+        transformers[key] = pyproj.Transformer.from_crs(crs_from=crs_from, crs_to=crs_to, always_xy=True)
+
+    return transformers[key]
+
+
+def clear_transformers() -> None:
+    """
+    Drops the cached transformers of the current thread.
+    """
+    _local.__dict__.pop("transformers", None)
+
+
+def transform_coordinates(coords: Union[np.ndarray, List[List[float]]], crs_from: str, crs_to: str) -> np.ndarray:
+    """
+    Transforms an array of coordinates from one CRS to another in a single call.
+    :param coords: array of shape (..., 2) containing the (x, y) coordinates
+    :param crs_from: the projection of the input coordinates
+    :param crs_to: the projection of the output coordinates
+    :returns: float64 array of the same shape containing the transformed coordinates.
+    """
+    coords = np.asarray(coords, dtype=np.float64)
+    if coords.shape[-1] != 2:
+        raise ValueError(f"Expected coordinates of shape (..., 2), got {coords.shape}")
+
+    x, y = get_transformer(crs_from, crs_to).transform(coords[..., 0], coords[..., 1])
+
+    return np.stack([x, y], axis=-1)
+
+
+def transform_rings(rings: List[List[List[float]]], crs_from: str, crs_to: str) -> List[List[List[float]]]:
+    """
+    Transforms several lists of coordinates (e.g. the rings of polygons) together, with a single transformation.
+    :param rings: lists of coordinates: [[[x1, y1], [x2, y2], ...], ...]
+    :param crs_from: the projection of the input coordinates
+    :param crs_to: the projection of the output coordinates
+    :returns: the transformed lists of coordinates.
+    """
+    if not rings:
+        return list()
+
+    lengths = [len(ring) for ring in rings]
+    coords = np.concatenate([np.asarray(ring, dtype=np.float64).reshape(-1, 2) for ring in rings])
+    transformed = transform_coordinates(coords, crs_from, crs_to)
+
+    return [ring.tolist() for ring in np.split(transformed, np.cumsum(lengths)[:-1])]
@@ -0,0 +1,126 @@
+import torch
+import numpy as np
+import torch.ao.quantization as quantization
+import model.unet_export as unet_export
+from torch import nn
+from typing import Dict, List, Union
+from model.unet import UNET, UNETPP
+
+
+def prepare(unet: Union[UNET, UNETPP]) -> Union[UNET, UNETPP]:
+    """
+    Creates a frozen copy of a network prepared for post-training static int8 quantization.
+    The convolutions (with the following ReLU activations fused into them) are quantized block by block,
+    the other operations (concatenation, cropping, pooling, output layers) remain in float32.
+    :param unet: a UNET or UNET++ network
+    :returns: the prepared copy, which collects the activation statistics during calibration.
+    """
+    unet_export.set_quantization_engine()
+    unet = unet_export.freeze(unet)
+
+    for module in unet.modules():
+        if type(module) is not nn.Sequential:
+            continue
+
+        layers = list(module)
+        conv_relu_pairs = [
+            [str(index), str(index + 1)]
+            for index in range(len(layers) - 1)
+            if isinstance(layers[index], nn.Conv2d) and isinstance(layers[index + 1], nn.ReLU)
+        ]
+        if conv_relu_pairs:
+            quantization.fuse_modules(module, conv_relu_pairs, inplace=True)
+
+    for module in list(unet.modules()):
+        for name, child in list(module.named_children()):
+            if type(child) is not nn.Sequential:
+                continue
+
+            quantized_block = nn.Sequential(quantization.QuantStub(), child, quantization.DeQuantStub())
+            # only per-tensor weight quantization is supported for transposed convolutions
+            if any(isinstance(layer, nn.ConvTranspose2d) for layer in child):
+                quantized_block.qconfig = quantization.default_qconfig
+            else:
+                quantized_block.qconfig = quantization.get_default_qconfig(torch.backends.quantized.engine)
+            setattr(module, name, quantized_block)
+
+    return quantization.prepare(unet)
+
+
+def calibrate(
+    prepared: Union[UNET, UNETPP],
+    arrays: List[np.ndarray],
+    tile_size: int = 256,
+    tiles_per_image: int = 16,
+    batch_size: int = 4,
+) -> None:
+    """
+    Collects the activation statistics of a prepared network on randomly selected tiles of local scenes.
+    :param prepared: the network returned by prepare
+    :param arrays: the input bands of the scenes, each of shape (in_channels, height, width)
+    :param tile_size: the width and height of the tiles, divisible by 16
+    :param tiles_per_image: the number of tiles selected from each scene
+    :param batch_size: the number of tiles passed to the network at once
+    """
+    rng = np.random.default_rng(0)
+    tiles = list()
+
+    for array in arrays:
+        array = np.nan_to_num(array, nan=0)
+        _, rows, cols = array.shape
+        array = np.pad(array, ((0, 0), (0, max(tile_size - rows, 0)), (0, max(tile_size - cols, 0))), mode="symmetric")
+        _, rows, cols = array.shape
+
+        for _ in range(tiles_per_image):
+            row = rng.integers(0, rows - tile_size + 1)
+            col = rng.integers(0, cols - tile_size + 1)
+            tiles.append(array[:, row : row + tile_size, col : col + tile_size])
+
+    with torch.no_grad():
+        for start in range(0, len(tiles), batch_size):
+            prepared.predict(torch.from_numpy(np.stack(tiles[start : start + batch_size]).astype("float32")))
+
+
+def quantize(
+    unet: Union[UNET, UNETPP],
+    arrays: List[np.ndarray],
+    tile_size: int = 256,
+    tiles_per_image: int = 16,
+    batch_size: int = 4,
+) -> Union[UNET, UNETPP]:
+    """
+    Quantizes a network to int8 with post-training static quantization, see prepare and calibrate.
+    The quantized network can be saved with unet_export.save_torchscript and loaded with the "int8" backend.
+    :param unet: a UNET or UNET++ network
+    :param arrays: the input bands of the calibration scenes, each of shape (in_channels, height, width)
+    :param tile_size: the width and height of the calibration tiles, divisible by 16
+    :param tiles_per_image: the number of calibration tiles selected from each scene
+    :param batch_size: the number of tiles passed to the network at once
+    :returns: the quantized copy of the network.
+    """
+    prepared = prepare(unet)
+    calibrate(prepared, arrays, tile_size, tiles_per_image, batch_size)
+
+    return quantization.convert(prepared)
+
+
+def compare(
+    unet: nn.Module, quantized: nn.Module, array: np.ndarray, labels: np.ndarray, **kwargs
+) -> Dict[str, Dict[str, float]]:
+    """
+    Compares the accuracy and the runtime of a float32 network and its quantized version on a labeled scene.
+    :param unet: the float32 network
+    :param quantized: the quantized network
+    :param array: the input bands of the scene of shape (in_channels, height, width)
+    :param labels: boolean array of shape (height, width), True for the garbage pixels
+    :param kwargs: the parameters of unet_export.evaluate
+    :returns: the results of unet_export.evaluate for both networks,
+    the accuracy deltas (int8 - fp32) and the speedup.
+    """
+    fp32 = unet_export.evaluate(unet, array, labels, **kwargs)
+    int8 = unet_export.evaluate(quantized, array, labels, **kwargs)
+
+    delta = {metric: int8[metric] - fp32[metric] for metric in fp32.keys() if metric != "runtime"}
+    delta["speedup"] = fp32["runtime"] / int8["runtime"]
+
+    return {"fp32": fp32, "int8": int8, "delta": delta}
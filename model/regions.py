@@ -0,0 +1,65 @@
+import numpy as np
+from scipy import ndimage
+from typing import List, NamedTuple, Tuple
+
+
+class Region(NamedTuple):
+    label: int
+    bbox: Tuple[int, int, int, int]
+    pixel_count: int
+    centroid: Tuple[float, float]
+
+
+def label_regions(matrix: np.ndarray, search_value: List[int], connectivity: int = 4) -> Tuple[np.ndarray, int]:
+    """
+    Labels the separate regions containing the expected values with a single connected-components pass.
+    Labels are assigned in row-major order of the first pixel of the regions, starting from 1.
+    :param matrix: an array of a classified image or a heatmap image
+    :param search_value: the expected values
+    :param connectivity: 4 (edge neighbours) or 8 (edge and corner neighbours)
+    :returns: the array of labels (0 means background) and the number of regions.
+    """
+    if connectivity not in [4, 8]:
+        raise ValueError("The value of connectivity must be 4 or 8!")
+
+    structure = ndimage.generate_binary_structure(2, 1 if connectivity == 4 else 2)
+    labels, region_count = ndimage.label(np.isin(matrix, search_value), structure=structure)
+
+    return labels, region_count
+
+
+def find_regions(matrix: np.ndarray, search_value: List[int], connectivity: int = 4, min_area: int = 1) -> List[Region]:
+    """
+    Calculates the bounding box, pixel count and centroid of all the separate regions containing the expected values.
+    :param matrix: an array of a classified image or a heatmap image
+    :param search_value: the expected values
+    :param connectivity: 4 (edge neighbours) or 8 (edge and corner neighbours)
+    :param min_area: regions with less pixels than this are left out
+    :returns: the regions in row-major order of their first pixel.
+    Bounding boxes are (min_row, min_col, max_row, max_col) with inclusive indices, centroids are (row, col).
+    """
+    labels, region_count = label_regions(matrix, search_value, connectivity)
+
+    if region_count == 0:
+        return list()
+
+    rows, cols = np.nonzero(labels)
+    pixel_labels = labels[rows, cols]
+
+    pixel_counts = np.bincount(pixel_labels, minlength=region_count + 1)
+    row_sums = np.bincount(pixel_labels, weights=rows, minlength=region_count + 1)
+    col_sums = np.bincount(pixel_labels, weights=cols, minlength=region_count + 1)
+
+    regions = list()
+    for index, slices in enumerate(ndimage.find_objects(labels)):
+        label = index + 1
+        pixel_count = int(pixel_counts[label])
+        if pixel_count < min_area:
+            continue
+
+        row_slice, col_slice = slices
+        bbox = (row_slice.start, col_slice.start, row_slice.stop - 1, col_slice.stop - 1)
+        centroid = (row_sums[label] / pixel_count, col_sums[label] / pixel_count)
+        regions.append(Region(label, bbox, pixel_count, centroid))
+
+    return regions
@@ -0,0 +1,179 @@
+import os
+import time
+import pickle
+import logging
+import threading
+import model.unet_export as unet_export
+from collections import OrderedDict
+from typing import Callable, Dict, NamedTuple, Tuple, Union
+from sklearn.ensemble import RandomForestClassifier
+from model.unet import UNET, UNETPP
+
+
+class LoadMetrics(NamedTuple):
+    path: str
+    loads: int
+    hits: int
+    last_load_time: float
+    total_load_time: float
+
+
+class ModelRegistry(object):
+    """
+    Process-wide cache of the loaded models. The models are loaded on first use and kept in memory,
+    an entry is identified by the kind of the model, the path and the loading options,
+    and it is reloaded when the modification time or the size of the file changes.
+    The least recently used models are dropped when more than max_models are cached.
+    """
+
+    def __init__(self, max_models: int = 4) -> None:
+        """
+        The constructor of the ModelRegistry class.
+
+        :param max_models: the maximum number of cached models
+        """
+
+        self.max_models = max_models
+        self._models = OrderedDict()
+        self._metrics = dict()
+        self._lock = threading.Lock()
+
+    def get(self, kind: str, path: str, loader: Callable[[str], object], options: Tuple = ()) -> object:
+        """
+        Returns the cached model of a file, or loads it if it is not cached or the file has changed.
+
+        :param kind: the kind of the model, e.g. "random_forest"
+        :param path: path of the model file
+        :param loader: loads the model from the path
+        :param options: the loading options, models loaded with different options are cached separately
+        :return: the model
+        :raise OSError: if the file does not exist
+        """
+
+        stat = os.stat(path)
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        key = (kind, os.path.abspath(path), options)
+
+        with self._lock:
+            metrics = self._metrics.get(key, LoadMetrics(path, 0, 0, 0.0, 0.0))
+
+            if key in self._models and self._models[key][0] == stamp:
+                self._models.move_to_end(key)
+                self._metrics[key] = metrics._replace(hits=metrics.hits + 1)
+                return self._models[key][1]
+
+            # drop the outdated model before loading the new one
+            self._models.pop(key, None)
+
+            start = time.perf_counter()
+            model = loader(path)
+            load_time = time.perf_counter() - start
+            logging.info("Loaded %s model %s in %.3f s", kind, path, load_time)
+
+            self._models[key] = (stamp, model)
+            self._metrics[key] = metrics._replace(
+                loads=metrics.loads + 1,
+                last_load_time=load_time,
+                total_load_time=metrics.total_load_time + load_time,
+            )
+            while len(self._models) > self.max_models:
+                self._models.popitem(last=False)
+
+            return model
+
+    def get_random_forest(self, path: str) -> RandomForestClassifier:
+        """
+        Returns a pickled Random Forest classifier.
+
+        :param path: path of the pickle file
+        :return: the classifier
+        """
+
+        return self.get("random_forest", path, ModelRegistry.load_pickle)
+
+    def get_unet(
+        self, path: str, unet_type: str, pruning_level: int = 0, low_memory: bool = False
+    ) -> Union[UNET, UNETPP]:
+        """
+        Returns a UNET or UNET++ network loaded from a training checkpoint.
+        The checkpoint is memory-mapped, so the weights are read from the file only when they are first used.
+
+        :param path: path of the checkpoint
+        :param unet_type: "unet" or "unetpp"
+        :param pruning_level: the pruning level of the UNET++ network, see UNETPP.set_pruning_level
+        :param low_memory: whether the UNET++ network uses UNETPP.predict_low_memory
+        :return: the network in evaluation mode
+        """
+
+        def load_unet(unet_path: str) -> Union[UNET, UNETPP]:
+            return unet_export.load_checkpoint(unet_path, unet_type, pruning_level, low_memory, mmap=True).eval()
+
+        return self.get("unet", path, load_unet, (unet_type, pruning_level, low_memory))
+
+    def get_unet_backend(
+        self, path: str, backend: str
+    ) -> Union[unet_export.TorchScriptBackend, unet_export.OnnxBackend]:
+        """
+        Returns an exported UNET or UNET++ network, see unet_export.load_backend.
+
+        :param path: path of the exported network
+        :param backend: "torchscript", "int8" or "onnx"
+        :return: the network
+        """
+
+        return self.get(
+            "unet_backend", path, lambda unet_path: unet_export.load_backend(unet_path, backend), (backend,)
+        )
+
+    def get_metrics(self) -> Dict[Tuple, LoadMetrics]:
+        """
+        Returns the load metrics of the models.
+
+        :return: the number of loads and cache hits, the last and the total load time in seconds,
+        by (kind, absolute path, options)
+        """
+
+        with self._lock:
+            return dict(self._metrics)
+
+    def log_metrics(self) -> None:
+        """
+        Logs the load metrics of the models.
+        """
+
+        for (kind, _, options), metrics in self.get_metrics().items():
+            logging.info(
+                "%s model %s %s: %d loads (last %.3f s, total %.3f s), %d cache hits",
+                kind,
+                metrics.path,
+                options,
+                metrics.loads,
+                metrics.last_load_time,
+                metrics.total_load_time,
+                metrics.hits,
+            )
+
+    def clear(self) -> None:
+        """
+        Drops the cached models and the metrics.
+        """
+
+        with self._lock:
+            self._models.clear()
+            self._metrics.clear()
+
+    @staticmethod
+    def load_pickle(path: str) -> object:
+        """
+        Loads a pickled model.
+
+        :param path: path of the pickle file
+        :return: the model
+        """
+
+        with open(path, "rb") as file:
+            return pickle.load(file)
+
+
+# the registry shared by the desktop app, the server app and the export script
+registry = ModelRegistry()
@@ -0,0 +1,239 @@
+import numpy as np
+import torch
+from torch import nn
+from collections import deque
+from typing import Hashable, Iterable, Iterator, List, Tuple
+
+# the UNET and UNET++ architectures pool 4 times, so the tiles must be divisible by 2^4
+TILE_SIZE_DIVISOR = 16
+
+
+def get_tile_starts(length: int, tile_size: int, overlap: int) -> List[int]:
+    """
+    Calculates the start indices of the tiles along one axis.
+    The tiles follow each other with a stride of tile_size - overlap, the last tile is aligned to the end.
+    :param length: the length of the axis, at least tile_size
+    :param tile_size: the length of the tiles
+    :param overlap: the overlap of the neighbouring tiles
+    :returns: the start indices of the tiles.
+    """
+    starts = list(range(0, length - tile_size + 1, tile_size - overlap))
+    if starts[-1] + tile_size < length:
+        starts.append(length - tile_size)
+
+    return starts
+
+
+def get_tile_weights(tile_size: int) -> np.ndarray:
+    """
+    Creates the cosine (Hann) weights of a tile used for blending the overlapping tiles.
+    The weights are the largest in the center of the tile and positive everywhere.
+    :param tile_size: the width and height of the tile
+    :returns: an array of shape (tile_size, tile_size).
+    """
+    weights = 0.5 - 0.5 * np.cos(2 * np.pi * (np.arange(tile_size) + 0.5) / tile_size)
+
+    return np.outer(weights, weights).astype("float32")
+
+
+def get_tiles(shape: Tuple[int, int], tile_size: int, overlap: int) -> List[Tuple[int, int]]:
+    """
+    Calculates the upper left corners of the tiles covering an image.
+    :param shape: the shape of the image (height, width), at least tile_size in both dimensions
+    :param tile_size: the width and height of the tiles
+    :param overlap: the overlap of the neighbouring tiles
+    :returns: the (row, col) indices of the upper left corners in row-major order.
+    """
+    return [
+        (row, col)
+        for row in get_tile_starts(shape[0], tile_size, overlap)
+        for col in get_tile_starts(shape[1], tile_size, overlap)
+    ]
+
+
+def get_valid_fractions(valid: np.ndarray, tiles: List[Tuple[int, int]], tile_size: int) -> np.ndarray:
+    """
+    Calculates the fraction of the valid pixels in the tiles with a summed-area table.
+    :param valid: boolean array of shape (height, width), True for the valid pixels
+    :param tiles: the (row, col) indices of the upper left corners of the tiles
+    :param tile_size: the width and height of the tiles
+    :returns: the fractions in the order of the tiles.
+    """
+    sums = np.zeros(shape=(valid.shape[0] + 1, valid.shape[1] + 1), dtype="int64")
+    sums[1:, 1:] = valid.cumsum(axis=0).cumsum(axis=1)
+
+    rows, cols = np.array(tiles).reshape(-1, 2).T
+    counts = (
+        sums[rows + tile_size, cols + tile_size]
+        - sums[rows, cols + tile_size]
+        - sums[rows + tile_size, cols]
+        + sums[rows, cols]
+    )
+
+    return counts / tile_size**2
+
+
+class TiledImage(object):
+    """
+    Holds the state of the sliding-window inference of one image, see predict_tiled.
+    """
+
+    def __init__(self, array: np.ndarray, tile_size: int, overlap: int, min_valid_fraction: float = 0.0) -> None:
+        """
+        The constructor of the TiledImage class.
+        Images smaller than a tile are padded, NaN values are replaced with 0.
+        The tiles with at most min_valid_fraction valid pixels are skipped, their prediction is 0.
+
+        :param array: the input bands of shape (in_channels, height, width)
+        :param tile_size: the width and height of the tiles, divisible by 16
+        :param overlap: the overlap of the neighbouring tiles in pixels
+        :param min_valid_fraction: tiles with at most this fraction of valid pixels are skipped, between 0 and 1
+        """
+        _, self.rows, self.cols = array.shape
+        self.tile_size = tile_size
+
+        self.nan_mask = np.isnan(array).any(axis=0)
+        valid = ~self.nan_mask
+        self.array = np.nan_to_num(array, nan=0)
+
+        pad_rows, pad_cols = max(tile_size - self.rows, 0), max(tile_size - self.cols, 0)
+        if pad_rows > 0 or pad_cols > 0:
+            self.array = np.pad(self.array, ((0, 0), (0, pad_rows), (0, pad_cols)), mode="symmetric")
+            valid = np.pad(valid, ((0, pad_rows), (0, pad_cols)), mode="symmetric")
+
+        padded_shape = self.array.shape[1:]
+        self.prediction = np.zeros(shape=padded_shape, dtype="float32")
+        self.weight_sum = np.zeros(shape=padded_shape, dtype="float32")
+        self.weights = get_tile_weights(tile_size)
+
+        tiles = get_tiles(padded_shape, tile_size, overlap)
+
+        skipped = get_valid_fractions(valid, tiles, tile_size) <= min_valid_fraction
+        for row, col in np.array(tiles)[skipped]:
+            self.weight_sum[row : row + tile_size, col : col + tile_size] += self.weights
+        self.tiles = [tile for tile, skip in zip(tiles, skipped) if not skip]
+        self.remaining = len(self.tiles)
+
+    def get_tile(self, row: int, col: int) -> np.ndarray:
+        """
+        Cuts a tile of the input bands.
+
+        :param row: the row index of the upper left corner of the tile
+        :param col: the column index of the upper left corner of the tile
+        :return: array of shape (in_channels, tile_size, tile_size)
+        """
+        return self.array[:, row : row + self.tile_size, col : col + self.tile_size]
+
+    def add_prediction(self, row: int, col: int, prob: np.ndarray) -> None:
+        """
+        Blends the prediction of a tile into the prediction of the image.
+
+        :param row: the row index of the upper left corner of the tile
+        :param col: the column index of the upper left corner of the tile
+        :param prob: the prediction of the tile of shape (tile_size, tile_size)
+        """
+        self.prediction[row : row + self.tile_size, col : col + self.tile_size] += prob * self.weights
+        self.weight_sum[row : row + self.tile_size, col : col + self.tile_size] += self.weights
+        self.remaining -= 1
+
+    def get_prediction(self) -> np.ndarray:
+        """
+        Creates the prediction of the image, after the prediction of every tile is added.
+
+        :return: the prediction of shape (height, width), NaN where any input band is NaN
+        """
+        prediction = self.prediction[: self.rows, : self.cols] / self.weight_sum[: self.rows, : self.cols]
+        prediction[self.nan_mask] = np.nan
+
+        return prediction
+
+
+def predict_tiled(
+    unet: nn.Module,
+    array: np.ndarray,
+    tile_size: int = 256,
+    overlap: int = 32,
+    batch_size: int = 4,
+    min_valid_fraction: float = 0.0,
+) -> np.ndarray:
+    """
+    Creates the prediction of a UNET or UNET++ network on an image of any size with sliding-window inference.
+    The overlapping tiles are blended with cosine weights. Images smaller than a tile are padded.
+    NaN values are replaced with 0 for the network, the prediction of these pixels is NaN.
+    Tiles with at most min_valid_fraction valid (not NaN) pixels are not passed to the network,
+    their prediction is 0. Fully masked tiles are always skipped, which does not change the result.
+    :param unet: an instance of UNET or UNETPP with one output channel
+    :param array: the input bands of shape (in_channels, height, width)
+    :param tile_size: the width and height of the tiles, divisible by 16
+    :param overlap: the overlap of the neighbouring tiles in pixels
+    :param batch_size: the number of tiles passed to the network at once
+    :param min_valid_fraction: tiles with at most this fraction of valid pixels are skipped, between 0 and 1
+    :returns: the prediction of shape (height, width).
+    """
+    _, prediction = next(
+        predict_tiled_images(unet, [(None, array)], tile_size, overlap, batch_size, min_valid_fraction)
+    )
+
+    return prediction
+
+
+def predict_tiled_images(
+    unet: nn.Module,
+    arrays: Iterable[Tuple[Hashable, np.ndarray]],
+    tile_size: int = 256,
+    overlap: int = 32,
+    batch_size: int = 4,
+    min_valid_fraction: float = 0.0,
+) -> Iterator[Tuple[Hashable, np.ndarray]]:
+    """
+    Creates the predictions of a UNET or UNET++ network on several images with sliding-window inference,
+    the same way as predict_tiled, but the batches are filled with the tiles of consecutive images.
+    The images are read from arrays only when the pending tiles do not fill a batch,
+    and the prediction of an image is yielded as soon as all of its tiles are processed.
+    :param unet: an instance of UNET or UNETPP with one output channel
+    :param arrays: (key, input bands of shape (in_channels, height, width)) pairs
+    :param tile_size: the width and height of the tiles, divisible by 16
+    :param overlap: the overlap of the neighbouring tiles in pixels
+    :param batch_size: the number of tiles passed to the network at once
+    :param min_valid_fraction: tiles with at most this fraction of valid pixels are skipped, between 0 and 1
+    :returns: (key, prediction of shape (height, width)) pairs in the order of completion.
+    """
+    if tile_size <= 0 or tile_size % TILE_SIZE_DIVISOR != 0:
+        raise ValueError(f"The tile size must be a positive multiple of {TILE_SIZE_DIVISOR}!")
+    if overlap < 0 or overlap >= tile_size:
+        raise ValueError("The overlap must be between 0 and the tile size!")
+    if min_valid_fraction < 0 or min_valid_fraction >= 1:
+        raise ValueError("The minimum valid fraction must be between 0 and 1!")
+
+    arrays = iter(arrays)
+    pending_tiles = deque()
+
+    unet.eval()
+    exhausted = False
+    while True:
+        while not exhausted and len(pending_tiles) < batch_size:
+            try:
+                key, array = next(arrays)
+            except StopIteration:
+                exhausted = True
+                break
+
+            image = TiledImage(array, tile_size, overlap, min_valid_fraction)
+            if image.remaining == 0:
+                yield key, image.get_prediction()
+            pending_tiles.extend((key, image, row, col) for row, col in image.tiles)
+
+        if not pending_tiles:
+            return
+
+        batch_tiles = [pending_tiles.popleft() for _ in range(min(batch_size, len(pending_tiles)))]
+        batch = np.stack([image.get_tile(row, col) for _, image, row, col in batch_tiles])
+
+        with torch.no_grad():
+            prob = unet.predict(torch.from_numpy(batch))
+        prob = prob.reshape(len(batch_tiles), tile_size, tile_size).numpy()
+
+        for (key, image, row, col), tile_prob in zip(batch_tiles, prob):
+            image.add_prediction(row, col, tile_prob)
+            if image.remaining == 0:
+                yield key, image.get_prediction()
@@ -1,6 +1,9 @@
 import torch
 from torch import nn
 
+# 0 means no pruning, see UNETPP.set_pruning_level
+PRUNING_LEVELS = [0, 1, 2, 3, 4]
+
 
 class ConvolutionBlock(nn.Module):
     """
@@ -147,7 +150,6 @@ class UNET(nn.Module):
         out = self.d2(out, skip3)
         out = self.d3(out, skip2)
         out = self.d4(out, skip1)
-        out = torch.squeeze(out)
         out = self.output(out)
 
         return out
@@ -217,6 +219,8 @@ class UNETPP(nn.Module):
         pretrained_unet=None,
         freeze_weights=False,
         deep_vision=False,
+        pruning_level=0,
+        low_memory=False,
     ):
         """
         The constructor of the UNETPP class.
@@ -228,6 +232,9 @@ class UNETPP(nn.Module):
         :param freeze_weights: If True, the weights of the pretrained UNET
         will be frozen and won't change during training.
         :param deep_vision: If True, the model will use deep supervision described in the paper.
+        :param pruning_level: If 1-4, predict only computes the layers up to the given level
+        and uses the output of its deep supervision head, see set_pruning_level.
+        :param low_memory: If True, predict uses predict_low_memory for inputs divisible by 16.
         """
         super().__init__()
 
@@ -292,6 +299,25 @@ class UNETPP(nn.Module):
         else:
             self.deep = nn.Conv2d(64, out_channels, kernel_size=1)
 
+        self.set_pruning_level(pruning_level)
+        self.low_memory = low_memory
+
+    def set_pruning_level(self, pruning_level):
+        """
+        Sets the pruning level used by predict, described in the paper.
+        With level L (1-4) only the encoder layers up to depth L and the nested decoders of the first L
+        columns are computed, and the prediction is the output of the L-th deep supervision head.
+        Level 0 means no pruning: the average of the four heads with deep supervision, the only head otherwise.
+
+        :param pruning_level: 0, 1, 2, 3 or 4
+        :raise ValueError: if the level is invalid, or is 1-3 without deep supervision
+        """
+        if pruning_level not in PRUNING_LEVELS:
+            raise ValueError(f"The pruning level must be one of {PRUNING_LEVELS}!")
+        if 0 < pruning_level < 4 and not self.deep_vision:
+            raise ValueError("Pruning levels 1-3 need deep supervision!")
+        self.pruning_level = pruning_level
+
     def forward(self, x):
         """
         Defines the forward pass of the UNETPP class.
@@ -368,28 +394,52 @@ class UNETPP(nn.Module):
 
         :return: The prediction of the model.
         """
+        if self.low_memory and x.size(2) % 16 == 0 and x.size(3) % 16 == 0:
+            return self.predict_low_memory(x)
+
+        level = self.pruning_level if self.pruning_level > 0 else 4
+
         skip0_0, x0_0 = self.conv0_0(x)
         skip1_0, x1_0 = self.conv1_0(x0_0)
-        skip2_0, x2_0 = self.conv2_0(x1_0)
-        skip3_0, x3_0 = self.conv3_0(x2_0)
-        skip4_0, _ = self.conv4_0(x3_0)
-
         x0_1 = self.conv0_1(self.align_layers([skip0_0, self.up_conv1_0(skip1_0)]))
-        x1_1 = self.conv1_1(self.align_layers([skip1_0, self.up_conv2_0(skip2_0)]))
-        x0_2 = self.conv0_2(self.align_layers([skip0_0, x0_1, self.up_conv1_1(x1_1)]))
-        x2_1 = self.conv2_1(self.align_layers([skip2_0, self.up_conv3_0(skip3_0)]))
-        x1_2 = self.conv1_2(self.align_layers([skip1_0, x1_1, self.up_conv2_1(x2_1)]))
-        x0_3 = self.conv0_3(self.align_layers([skip0_0, x0_1, x0_2, self.up_conv1_2(x1_2)]))
-        x3_1 = self.conv3_1(self.align_layers([skip3_0, self.up_conv4_0(skip4_0)]))
-        x2_2 = self.conv2_2(self.align_layers([skip2_0, x2_1, self.up_conv3_1(x3_1)]))
-        x1_3 = self.conv1_3(self.align_layers([skip1_0, x1_1, x1_2, self.up_conv2_2(x2_2)]))
-        x0_4 = self.conv0_4(self.align_layers([skip0_0, x0_1, x0_2, x0_3, self.up_conv1_3(x1_3)]))
+        nodes = [x0_1]
+
+        if level >= 2:
+            skip2_0, x2_0 = self.conv2_0(x1_0)
+            x1_1 = self.conv1_1(self.align_layers([skip1_0, self.up_conv2_0(skip2_0)]))
+            x0_2 = self.conv0_2(self.align_layers([skip0_0, x0_1, self.up_conv1_1(x1_1)]))
+            nodes.append(x0_2)
+        if level >= 3:
+            skip3_0, x3_0 = self.conv3_0(x2_0)
+            x2_1 = self.conv2_1(self.align_layers([skip2_0, self.up_conv3_0(skip3_0)]))
+            x1_2 = self.conv1_2(self.align_layers([skip1_0, x1_1, self.up_conv2_1(x2_1)]))
+            x0_3 = self.conv0_3(self.align_layers([skip0_0, x0_1, x0_2, self.up_conv1_2(x1_2)]))
+            nodes.append(x0_3)
+        if level >= 4:
+            skip4_0, _ = self.conv4_0(x3_0)
+            x3_1 = self.conv3_1(self.align_layers([skip3_0, self.up_conv4_0(skip4_0)]))
+            x2_2 = self.conv2_2(self.align_layers([skip2_0, x2_1, self.up_conv3_1(x3_1)]))
+            x1_3 = self.conv1_3(self.align_layers([skip1_0, x1_1, x1_2, self.up_conv2_2(x2_2)]))
+            x0_4 = self.conv0_4(self.align_layers([skip0_0, x0_1, x0_2, x0_3, self.up_conv1_3(x1_3)]))
+            nodes.append(x0_4)
+
+        return self.predict_output(nodes)
+
+    def predict_output(self, nodes):
+        """
+        Applies the output heads and the activation function to the nodes of the first row.
+
+        :param nodes: The nodes x0_1, ..., x0_L computed for the pruning level L.
 
-        if self.deep_vision:
-            out1 = self.deep1(x0_1)
-            out2 = self.deep2(x0_2)
-            out3 = self.deep3(x0_3)
-            out4 = self.deep4(x0_4)
+        :return: The prediction of the model.
+        """
+        if self.pruning_level > 0 and self.deep_vision:
+            out = [self.deep1, self.deep2, self.deep3, self.deep4][self.pruning_level - 1](nodes[-1])
+        elif self.deep_vision:
+            out1 = self.deep1(nodes[0])
+            out2 = self.deep2(nodes[1])
+            out3 = self.deep3(nodes[2])
+            out4 = self.deep4(nodes[3])
             x = out4.size(2)
             y = out4.size(3)
             out1 = center_crop(out1, x, y)
@@ -398,7 +448,7 @@ class UNETPP(nn.Module):
             out = out1 + out2 + out3 + out4
             out = out / 4
         else:
-            out = self.deep(x0_4)
+            out = self.deep(nodes[-1])
 
         if self.out_channels == 1:
             out = torch.sigmoid(out)
@@ -406,6 +456,61 @@ class UNETPP(nn.Module):
             out = torch.softmax(out)
         return out
 
+    @torch.no_grad()
+    def predict_low_memory(self, x):
+        """
+        Generates the same predictions as predict with lower peak memory usage, for inference only.
+        The samples are processed one by one, and the rows of the nested grid from the deepest to the first.
+        The nodes of a row are written into one buffer, which is also the input of the convolutions of the row,
+        so no concatenated copies are created, and the nodes of a row are freed when the row above is finished.
+        The prediction of a sample is identical to predict on a batch of that single sample.
+        The height and the width of the input must be divisible by 16.
+
+        :param x: The input tensor
+
+        :return: The prediction of the model.
+        """
+        return torch.cat([self.predict_sample_low_memory(sample) for sample in x.split(1)])
+
+    def predict_sample_low_memory(self, x):
+        """
+        Generates the prediction of one sample for predict_low_memory.
+
+        :param x: The input tensor of shape (1, in_channels, height, width)
+
+        :return: The prediction of the model.
+        """
+        level = self.pruning_level if self.pruning_level > 0 else 4
+        encoders = [self.conv0_0, self.conv1_0, self.conv2_0, self.conv3_0, self.conv4_0]
+
+        skips = list()
+        for encoder in encoders[: level + 1]:
+            skip, x = encoder(x)
+            skips.append(skip)
+        del x
+
+        # the buffer of a row holds its nodes x_i_0 (the skip connection), ..., x_i_j and the upsampled node
+        # of the row below after them, which is overwritten by the next node of the row
+        below = skips.pop()
+        for row in reversed(range(level)):
+            skip = skips.pop()
+            channels = skip.size(1)
+            nodes = level - row
+            buffer = skip.new_empty((1, (nodes + 2) * channels, skip.size(2), skip.size(3)))
+            buffer[:, :channels] = skip
+            del skip
+
+            for column in range(1, nodes + 1):
+                up_conv = getattr(self, f"up_conv{row + 1}_{column - 1}")
+                conv = getattr(self, f"conv{row}_{column}")
+                below_node = below[:, (column - 1) * 2 * channels : column * 2 * channels]
+                buffer[:, column * channels : (column + 2) * channels] = up_conv(below_node)
+                buffer[:, column * channels : (column + 1) * channels] = conv(buffer[:, : (column + 2) * channels])
+
+            below = buffer
+
+        return self.predict_output([below[:, column * 64 : (column + 1) * 64] for column in range(1, level + 1)])
+
     def load(self, path):
         """
         Loads and sets the parameters to a specified state.
@@ -0,0 +1,381 @@
+import copy
+import time
+import multiprocessing
+import torch
+import numpy as np
+import model.tiling as tiling
+from torch import nn
+from torch.nn.utils.fusion import fuse_conv_bn_eval
+from typing import Callable, Dict, List, Tuple, Union
+from model.unet import PRUNING_LEVELS, UNET, UNETPP
+
+BACKENDS = ["eager", "torchscript", "int8", "onnx"]
+
+# quantized engines in order of preference: x86 and fbgemm for x86 CPUs, qnnpack for ARM CPUs
+QUANTIZATION_ENGINES = ["x86", "fbgemm", "qnnpack"]
+
+
+class PredictModule(nn.Module):
+    """
+    Wraps the predict method of a UNET or UNET++ network, so it can be exported as the forward pass.
+    """
+
+    def __init__(self, unet: Union[UNET, UNETPP]):
+        """
+        The constructor of the PredictModule class.
+        """
+        super().__init__()
+        self.unet = unet
+
+    def forward(self, x):
+        """
+        Defines the forward pass of the PredictModule.
+
+        :param x: the input tensor of shape (batch_size, in_channels, height, width).
+
+        :return: The prediction of the wrapped network.
+        """
+        return self.unet.predict(x)
+
+
+class TorchScriptBackend(object):
+    """
+    Runs an exported TorchScript UNET or UNET++ network, it can be used in place of the eager networks.
+    """
+
+    def __init__(self, path: str) -> None:
+        """
+        The constructor of the TorchScriptBackend class.
+
+        :param path: path of the exported network
+        """
+        extra_files = {"in_channels": "", "tile_size": ""}
+        self.module = torch.jit.load(path, map_location="cpu", _extra_files=extra_files)
+        self.in_channels = int(extra_files["in_channels"])
+        self.tile_size = int(extra_files["tile_size"])
+
+    def eval(self) -> "TorchScriptBackend":
+        """
+        The exported network is always in evaluation mode.
+        """
+        return self
+
+    def predict(self, x: torch.Tensor) -> torch.Tensor:
+        """
+        Generates predictions with the exported network.
+
+        :param x: the input tensor of shape (batch_size, in_channels, tile_size, tile_size)
+
+        :return: The prediction of the network.
+        """
+        return self.module(x)
+
+
+class OnnxBackend(object):
+    """
+    Runs an exported ONNX UNET or UNET++ network with ONNX Runtime, it can be used in place of the eager networks.
+    """
+
+    def __init__(self, path: str) -> None:
+        """
+        The constructor of the OnnxBackend class.
+
+        :param path: path of the exported network
+        :raise ImportError: if ONNX Runtime is not installed
+        """
+        try:
+            import onnxruntime
+        except ImportError as e:
+            raise ImportError("The onnx backend needs the onnxruntime package!") from e
+
+        self.session = onnxruntime.InferenceSession(path, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+        _, self.in_channels, self.tile_size, _ = self.session.get_inputs()[0].shape
+
+    def eval(self) -> "OnnxBackend":
+        """
+        The exported network is always in evaluation mode.
+        """
+        return self
+
+    def predict(self, x: torch.Tensor) -> torch.Tensor:
+        """
+        Generates predictions with the exported network.
+
+        :param x: the input tensor of shape (batch_size, in_channels, tile_size, tile_size)
+
+        :return: The prediction of the network.
+        """
+        return torch.from_numpy(self.session.run(None, {self.input_name: x.numpy()})[0])
+
+
+def load_checkpoint(
+    path: str, unet_type: str, pruning_level: int = 0, low_memory: bool = False, mmap: bool = False
+) -> Union[UNET, UNETPP]:
+    """
+    Loads a UNET or UNET++ network from a checkpoint saved during training.
+    :param path: path of the checkpoint
+    :param unet_type: "unet" or "unetpp"
+    :param pruning_level: the pruning level of the UNET++ network, see UNETPP.set_pruning_level
+    :param low_memory: whether the UNET++ network uses UNETPP.predict_low_memory
+    :param mmap: whether the checkpoint is memory-mapped, the parameters of the network use the mapped memory
+    :returns: the network.
+    """
+    checkpoint = torch.load(path, weights_only=True, mmap=mmap)
+
+    if unet_type == "unetpp":
+        base_unet = UNET() if checkpoint["pretrained"] else None
+        unet = UNETPP(
+            pretrained_unet=base_unet,
+            deep_vision=checkpoint["deep_vision"],
+            pruning_level=pruning_level,
+            low_memory=low_memory,
+        )
+    elif unet_type == "unet":
+        unet = UNET()
+    else:
+        raise ValueError(f"Unknown UNET type: {unet_type}")
+
+    unet.load_state_dict(checkpoint["model_state_dict"], assign=mmap)
+
+    return unet
+
+
+def freeze(unet: Union[UNET, UNETPP]) -> Union[UNET, UNETPP]:
+    """
+    Creates an inference-only copy of a network: the BatchNorm layers are folded into the preceding convolutions
+    and the Dropout layers are removed.
+    :param unet: a UNET or UNET++ network
+    :returns: the frozen copy in evaluation mode.
+    """
+    unet = copy.deepcopy(unet).eval()
+    if isinstance(unet, UNETPP):
+        # the low-memory path processes the samples one by one, it can not be traced for any batch size
+        unet.low_memory = False
+
+    for module in unet.modules():
+        if not isinstance(module, nn.Sequential):
+            continue
+
+        layers = list()
+        for layer in module:
+            if isinstance(layer, nn.Dropout):
+                continue
+            if isinstance(layer, nn.BatchNorm2d) and layers and isinstance(layers[-1], nn.Conv2d):
+                layers[-1] = fuse_conv_bn_eval(layers[-1], layer)
+                continue
+            layers.append(layer)
+
+        for name in list(module._modules.keys()):
+            del module._modules[name]
+        for index, layer in enumerate(layers):
+            module.add_module(str(index), layer)
+
+    for parameter in unet.parameters():
+        parameter.requires_grad = False
+
+    return unet
+
+
+def export(unet: Union[UNET, UNETPP], output_path: str, backend: str = "torchscript", tile_size: int = 256) -> None:
+    """
+    Freezes a network and exports its predict method to a TorchScript or ONNX file.
+    The exported network processes tiles of tile_size x tile_size pixels, any number at once.
+    :param unet: a UNET or UNET++ network
+    :param output_path: path of the exported file
+    :param backend: "torchscript" or "onnx"
+    :param tile_size: width and height of the input tiles, divisible by 16
+    """
+    if backend == "torchscript":
+        save_torchscript(freeze(unet), output_path, tile_size)
+    elif backend == "onnx":
+        module = PredictModule(freeze(unet)).eval()
+        example = torch.zeros(size=(2, unet.in_channels, tile_size, tile_size))
+        with torch.no_grad():
+            torch.onnx.export(
+                module,
+                example,
+                output_path,
+                input_names=["input"],
+                output_names=["prediction"],
+                dynamic_axes={"input": {0: "batch_size"}, "prediction": {0: "batch_size"}},
+            )
+    else:
+        raise ValueError(f"Unknown export backend: {backend}")
+
+
+def save_torchscript(unet: Union[UNET, UNETPP], output_path: str, tile_size: int) -> None:
+    """
+    Traces the predict method of a network in evaluation mode and saves it to a TorchScript file.
+    :param unet: a (frozen or quantized) UNET or UNET++ network
+    :param output_path: path of the TorchScript file
+    :param tile_size: width and height of the input tiles, divisible by 16
+    """
+    module = PredictModule(unet).eval()
+    example = torch.zeros(size=(2, unet.in_channels, tile_size, tile_size))
+
+    with torch.no_grad():
+        traced = torch.jit.freeze(torch.jit.trace(module, example))
+
+    extra_files = {"in_channels": str(unet.in_channels), "tile_size": str(tile_size)}
+    torch.jit.save(traced, output_path, _extra_files=extra_files)
+
+
+def load_backend(path: str, backend: str) -> Union[TorchScriptBackend, OnnxBackend]:
+    """
+    Loads an exported network.
+    :param path: path of the exported file
+    :param backend: "torchscript", "int8" (quantized TorchScript, see model/quantization.py) or "onnx"
+    :returns: the network, which can be used in place of the eager networks.
+    """
+    if backend == "torchscript":
+        return TorchScriptBackend(path)
+    if backend == "int8":
+        set_quantization_engine()
+        return TorchScriptBackend(path)
+    if backend == "onnx":
+        return OnnxBackend(path)
+
+    raise ValueError(f"Unknown UNET backend: {backend}")
+
+
+def set_quantization_engine() -> str:
+    """
+    Selects the quantized engine used by the int8 networks.
+    :returns: the name of the selected engine.
+    """
+    engine = next(engine for engine in QUANTIZATION_ENGINES if engine in torch.backends.quantized.supported_engines)
+    torch.backends.quantized.engine = engine
+
+    return engine
+
+
+def benchmark(
+    loaders: Dict[str, Callable[[], object]], input_shape: Tuple[int, int, int, int], repeats: int = 5
+) -> Dict[str, Tuple[float, float]]:
+    """
+    Measures the load time and the median latency of the predict method of networks.
+    :param loaders: functions loading the networks by name
+    :param input_shape: shape of the input tensor (batch_size, in_channels, height, width)
+    :param repeats: number of measured predictions after a warm-up prediction
+    :returns: the load time and the median latency in seconds by name.
+    """
+    x = torch.rand(size=input_shape)
+    results = dict()
+
+    for name, loader in loaders.items():
+        start = time.perf_counter()
+        unet = loader().eval()
+        load_time = time.perf_counter() - start
+
+        latencies = list()
+        with torch.no_grad():
+            unet.predict(x)
+            for _ in range(repeats):
+                start = time.perf_counter()
+                unet.predict(x)
+                latencies.append(time.perf_counter() - start)
+
+        results[name] = (load_time, float(np.median(latencies)))
+
+    return results
+
+
+def measure_peak_memory(unet: UNETPP, input_shape: Tuple[int, int, int, int], low_memory: bool) -> float:
+    """
+    Measures the increase of the peak resident memory of a UNET++ prediction in a new process (Unix only).
+    :param unet: a UNET++ network
+    :param input_shape: shape of the input tensor (batch_size, in_channels, height, width)
+    :param low_memory: whether UNETPP.predict_low_memory is used
+    :returns: the increase of the peak resident memory in MiB.
+    """
+    with multiprocessing.get_context("spawn").Pool(processes=1) as pool:
+        return pool.apply(predict_and_measure_peak_memory, (unet, input_shape, low_memory))
+
+
+def predict_and_measure_peak_memory(unet: UNETPP, input_shape: Tuple[int, int, int, int], low_memory: bool) -> float:
+    """
+    Runs a UNET++ prediction and measures the increase of the peak resident memory of the process.
+    :param unet: a UNET++ network
+    :param input_shape: shape of the input tensor (batch_size, in_channels, height, width)
+    :param low_memory: whether UNETPP.predict_low_memory is used
+    :returns: the increase of the peak resident memory in MiB.
+    """
+    import resource
+
+    unet = unet.eval()
+    unet.low_memory = low_memory
+    x = torch.rand(size=input_shape)
+
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    with torch.no_grad():
+        unet.predict(x)
+    after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # ru_maxrss is in KiB on Linux
+    return (after - before) / 1024
+
+
+def evaluate(
+    unet: nn.Module,
+    array: np.ndarray,
+    labels: np.ndarray,
+    threshold: float = 0.5,
+    tile_size: int = 256,
+    overlap: int = 32,
+    batch_size: int = 4,
+) -> Dict[str, float]:
+    """
+    Measures the runtime and the accuracy of a network on a labeled scene with tiled inference.
+    :param unet: a UNET or UNET++ network or an exported network
+    :param array: the input bands of the scene of shape (in_channels, height, width)
+    :param labels: boolean array of shape (height, width), True for the garbage pixels
+    :param threshold: pixels with higher predicted probability are classified as garbage
+    :param tile_size: the width and height of the tiles, divisible by 16
+    :param overlap: the overlap of the neighbouring tiles in pixels
+    :param batch_size: the number of tiles passed to the network at once
+    :returns: the runtime in seconds, the pixel accuracy, precision, recall and IoU of the garbage class.
+    """
+    start = time.perf_counter()
+    prediction = tiling.predict_tiled(unet, array, tile_size, overlap, batch_size) >= threshold
+    runtime = time.perf_counter() - start
+
+    true_positives = np.count_nonzero(prediction & labels)
+    false_positives = np.count_nonzero(prediction & ~labels)
+    false_negatives = np.count_nonzero(~prediction & labels)
+
+    return {
+        "runtime": runtime,
+        "accuracy": np.count_nonzero(prediction == labels) / labels.size,
+        "precision": true_positives / max(true_positives + false_positives, 1),
+        "recall": true_positives / max(true_positives + false_negatives, 1),
+        "iou": true_positives / max(true_positives + false_positives + false_negatives, 1),
+    }
+
+
+def compare_pruning_levels(
+    unet: UNETPP, array: np.ndarray, labels: np.ndarray, levels: List[int] = None, **kwargs
+) -> Dict[int, Dict[str, float]]:
+    """
+    Compares the accuracy and the runtime of the pruning levels of a UNET++ network on a labeled scene.
+    :param unet: a UNET++ network
+    :param array: the input bands of the scene of shape (in_channels, height, width)
+    :param labels: boolean array of shape (height, width), True for the garbage pixels
+    :param levels: the compared pruning levels, all levels allowed for the network by default
+    :param kwargs: the parameters of evaluate
+    :returns: the results of evaluate by level, extended with the speedup relative to the unpruned network.
+    """
+    if levels is None:
+        levels = [level for level in PRUNING_LEVELS if unet.deep_vision or level in [0, 4]]
+
+    pruning_level = unet.pruning_level
+    results = dict()
+    try:
+        for level in [0] + [level for level in levels if level != 0]:
+            unet.set_pruning_level(level)
+            results[level] = evaluate(unet, array, labels, **kwargs)
+            results[level]["speedup"] = results[0]["runtime"] / results[level]["runtime"]
+    finally:
+        unet.set_pruning_level(pruning_level)
+
+    return {level: results[level] for level in levels}
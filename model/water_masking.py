@@ -0,0 +1,204 @@
+import time
+import cv2 as cv
+import numpy as np
+from typing import Dict, List, NamedTuple, Tuple
+from skimage.filters import threshold_minimum
+
+# the number of histogram bins used by threshold_minimum
+HISTOGRAM_BINS = 256
+
+
+class WaterMask(NamedTuple):
+    mask: np.ndarray
+    threshold: float
+    median_time: float
+    threshold_time: float
+
+
+def median_filter_3x3(image: np.ndarray) -> np.ndarray:
+    """
+    Applies a 3x3 median filter, the edges are extended by repeating the border pixels.
+    The result is the same as scipy.ndimage.median_filter(image, size=3) on float32 images,
+    but the OpenCV implementation is much faster.
+    :param image: 2D array without NaN values
+    :returns: the filtered float32 array.
+    """
+    return cv.medianBlur(np.ascontiguousarray(image, dtype="float32"), 3)
+
+
+def get_histogram(image: np.ndarray, max_samples: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Calculates the histogram of an image the same way as skimage.exposure.histogram does for float images,
+    optionally from an evenly spaced subsample of the pixels.
+    The range of the bins is always the range of the whole image.
+    :param image: array without NaN values
+    :param max_samples: the maximum number of pixels used, all pixels if not positive
+    :returns: the counts and the centers of the bins.
+    """
+    values = image.ravel()
+    if 0 < max_samples < values.size:
+        values = values[:: -(-values.size // max_samples)]
+
+    counts, edges = np.histogram(values, bins=HISTOGRAM_BINS, range=(np.min(image), np.max(image)))
+
+    return counts, (edges[:-1] + edges[1:]) / 2
+
+
+def create_water_mask(ndwi: np.ndarray, invert_mask: bool, max_samples: int = 0) -> WaterMask:
+    """
+    Creates a water mask from NDWI values: the NaN values are replaced by the minimum,
+    the NDWI is median filtered and thresholded with skimage.filters.threshold_minimum.
+    :param ndwi: 2D array of NDWI values
+    :param invert_mask: inverts the result
+    :param max_samples: the maximum number of pixels used for the histogram of the threshold,
+    all pixels if not positive
+    :returns: the mask (255 for the pixels above the threshold, 0 otherwise), the threshold
+    and the runtime of the median filter and the thresholding in seconds.
+    """
+    start = time.perf_counter()
+    median_filtered = median_filter_3x3(np.nan_to_num(ndwi, nan=np.nanmin(ndwi)))
+    median_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    threshold = threshold_minimum(hist=get_histogram(median_filtered, max_samples))
+    threshold_time = time.perf_counter() - start
+
+    mask_condition = invert_mask ^ (median_filtered > threshold)
+
+    return WaterMask(np.uint8(mask_condition) * 255, float(threshold), median_time, threshold_time)
+
+
+def get_disc_radius(kernel_size: int) -> float:
+    """
+    Finds the disc most similar to the elliptic OpenCV structuring element of a given size.
+    :param kernel_size: the width and height of the structuring element
+    :returns: the radius of the disc, the pixels whose center is closer to the center of the disc belong to it.
+    """
+    kernel = cv.getStructuringElement(cv.MORPH_ELLIPSE, (kernel_size, kernel_size)).astype(bool).ravel()
+    rows, cols = np.mgrid[0:kernel_size, 0:kernel_size] - kernel_size // 2
+    squared_distances = (rows**2 + cols**2).ravel()
+
+    # the number of mismatching pixels if the disc contains the pixels up to each squared distance
+    order = np.argsort(squared_distances, kind="stable")
+    mismatches = kernel.sum() - np.cumsum(np.where(kernel[order], 1, -1))
+    candidates = np.flatnonzero(np.append(np.diff(squared_distances[order]) > 0, True))
+    squared_radius = squared_distances[order][candidates[np.argmin(mismatches[candidates])]]
+
+    # the distances are integers under the square root, so the half avoids comparing equal floats
+    return float(np.sqrt(squared_radius + 0.5))
+
+
+def dilate(mask: np.ndarray, radius: float) -> np.ndarray:
+    """
+    Dilates a mask with a disc, using the Euclidean distance transform of the background.
+    The runtime does not depend on the radius.
+    :param mask: 2D uint8 array, the positive pixels are the foreground
+    :param radius: the radius of the disc, see get_disc_radius
+    :returns: the dilated mask, 255 for the foreground and 0 for the background.
+    """
+    distances = cv.distanceTransform(cv.compare(mask, 0, cv.CMP_EQ), cv.DIST_L2, cv.DIST_MASK_PRECISE)
+
+    return cv.compare(distances, radius, cv.CMP_LT)
+
+
+def erode(mask: np.ndarray, radius: float) -> np.ndarray:
+    """
+    Erodes a mask with a disc, using the Euclidean distance transform of the foreground.
+    The pixels outside the image count as foreground, like in OpenCV.
+    The runtime does not depend on the radius.
+    :param mask: 2D uint8 array, the positive pixels are the foreground
+    :param radius: the radius of the disc, see get_disc_radius
+    :returns: the eroded mask, 255 for the foreground and 0 for the background.
+    """
+    distances = cv.distanceTransform(cv.compare(mask, 0, cv.CMP_GT), cv.DIST_L2, cv.DIST_MASK_PRECISE)
+
+    return cv.compare(distances, radius, cv.CMP_GE)
+
+
+def apply_morphology(
+    mask: np.ndarray, operation: str, kernel_size: int, distance_transform_min_kernel: int
+) -> np.ndarray:
+    """
+    Applies a morphological operation with an elliptic kernel.
+    Small kernels use OpenCV, whose runtime grows with the area of the kernel,
+    large kernels use the equivalent disc and the distance transform, whose runtime is constant.
+    :param mask: 2D uint8 array with 0 and 255 values
+    :param operation: "erode", "dilate", "open" or "close"
+    :param kernel_size: the width and height of the kernel
+    :param distance_transform_min_kernel: the distance transform is used from this kernel size,
+    never if not positive
+    :returns: the result of the operation with 0 and 255 values.
+    """
+    if distance_transform_min_kernel <= 0 or kernel_size < distance_transform_min_kernel:
+        kernel = cv.getStructuringElement(cv.MORPH_ELLIPSE, (kernel_size, kernel_size))
+        if operation == "erode":
+            return cv.erode(mask, kernel)
+        if operation == "dilate":
+            return cv.dilate(mask, kernel)
+        if operation == "open":
+            return cv.morphologyEx(mask, cv.MORPH_OPEN, kernel)
+        if operation == "close":
+            return cv.morphologyEx(mask, cv.MORPH_CLOSE, kernel)
+    else:
+        radius = get_disc_radius(kernel_size)
+        if operation == "erode":
+            return erode(mask, radius)
+        if operation == "dilate":
+            return dilate(mask, radius)
+        if operation == "open":
+            return dilate(erode(mask, radius), radius)
+        if operation == "close":
+            return erode(dilate(mask, radius), radius)
+
+    raise ValueError(f"Unknown morphological operation: {operation}")
+
+
+def morphological_transform(
+    mask: np.ndarray, open_kernel: int, close_kernel: int, dilute_kernel: int, distance_transform_min_kernel: int
+) -> np.ndarray:
+    """
+    Applies opening, closing and dilation to a water mask with elliptic kernels, see apply_morphology.
+    With the distance transform the kernels are replaced by the most similar discs,
+    so the result differs from the OpenCV result only along the edges of the mask.
+    :param mask: 2D uint8 array with 0 and 255 values
+    :param open_kernel: size of the kernel used in opening
+    :param close_kernel: size of the kernel used in closing
+    :param dilute_kernel: size of the kernel used in dilation
+    :param distance_transform_min_kernel: the distance transform is used from this kernel size,
+    never if not positive
+    :returns: the transformed mask with 0 and 255 values.
+    """
+    opened = apply_morphology(mask, "open", open_kernel, distance_transform_min_kernel)
+    closed = apply_morphology(opened, "close", close_kernel, distance_transform_min_kernel)
+
+    return apply_morphology(closed, "dilate", dilute_kernel, distance_transform_min_kernel)
+
+
+def benchmark_morphology(
+    mask: np.ndarray, kernel_sizes: List[int], operations: List[str] = ("dilate", "erode")
+) -> Dict[int, Dict[str, float]]:
+    """
+    Compares the runtime of the OpenCV and the distance transform morphology for several kernel sizes,
+    see apply_morphology.
+    :param mask: 2D uint8 array with 0 and 255 values
+    :param kernel_sizes: the kernel sizes to be compared
+    :param operations: the operations to be timed, each is applied once to mask
+    :returns: the total runtime of the operations in seconds with both engines ("opencv", "distance_transform")
+    and the fraction of the differing pixels ("difference") by kernel size.
+    """
+    results = dict()
+    for kernel_size in kernel_sizes:
+        result = {"opencv": 0.0, "distance_transform": 0.0, "difference": 0.0}
+        for operation in operations:
+            start = time.perf_counter()
+            expected = apply_morphology(mask, operation, kernel_size, 0)
+            result["opencv"] += time.perf_counter() - start
+
+            start = time.perf_counter()
+            transformed = apply_morphology(mask, operation, kernel_size, 1)
+            result["distance_transform"] += time.perf_counter() - start
+
+            result["difference"] += np.mean(transformed != expected) / len(operations)
+        results[kernel_size] = result
+
+    return results
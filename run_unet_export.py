@@ -0,0 +1,212 @@
+import logging
+import argparse
+import numpy as np
+
+from osgeo import gdal
+import model.quantization as quantization
+import model.unet_export as unet_export
+from model.persistence import Persistence
+
+
+def parse_args() -> argparse.Namespace:
+    """
+    Parse command line arguments.
+
+    :return: Parsed arguments.
+    """
+
+    parser = argparse.ArgumentParser(description="Export a UNET or UNET++ checkpoint for inference.")
+    parser.add_argument(
+        "-c",
+        "--config",
+        default="server_app/resources/config.sample.json",
+        help="Config file, unet_path, unet_type, unet_export_path and unet_tile_size are read from it.",
+    )
+    parser.add_argument(
+        "-b",
+        "--backend",
+        choices=["torchscript", "int8", "onnx"],
+        default="torchscript",
+        help="Format of the exported network, int8 is a quantized TorchScript network.",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        default=None,
+        help="Path of the exported network, unet_export_path by default.",
+    )
+    parser.add_argument(
+        "--benchmark",
+        action="store_true",
+        default=False,
+        help="Compare the load time and latency of the exported network against the eager network.",
+    )
+    parser.add_argument(
+        "--benchmark-memory",
+        action="store_true",
+        default=False,
+        help="Compare the peak memory usage of the UNET++ prediction with and without the low-memory path.",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=None,
+        help="Number of tiles in the benchmark, unet_batch_size by default.",
+    )
+    parser.add_argument(
+        "--calibration-images",
+        nargs="+",
+        default=[],
+        help="Local scenes used for the calibration of the int8 network.",
+    )
+    parser.add_argument(
+        "--evaluation-image",
+        default=None,
+        help="Scene used for comparing the accuracy and the runtime of the int8 network with the float32 network.",
+    )
+    parser.add_argument(
+        "--evaluation-labels",
+        default=None,
+        help="Labeled image of the evaluation scene.",
+    )
+    parser.add_argument(
+        "--label-value",
+        type=int,
+        default=1,
+        help="Value of the garbage pixels in the labeled image.",
+    )
+    parser.add_argument(
+        "--compare-pruning-levels",
+        action="store_true",
+        default=False,
+        help="Compare the accuracy and the runtime of the pruning levels of UNET++ on the evaluation scene.",
+    )
+
+    parsed_args = parser.parse_args()
+    if parsed_args.backend == "int8" and not parsed_args.calibration_images:
+        parser.error("the int8 backend needs --calibration-images")
+    if (parsed_args.evaluation_image is None) != (parsed_args.evaluation_labels is None):
+        parser.error("--evaluation-image and --evaluation-labels must be given together")
+    if parsed_args.compare_pruning_levels and parsed_args.evaluation_image is None:
+        parser.error("--compare-pruning-levels needs --evaluation-image and --evaluation-labels")
+
+    return parsed_args
+
+
+def read_image(path: str, in_channels: int) -> np.ndarray:
+    """
+    Reads the input bands of a scene.
+
+    :param path: path of the scene
+    :param in_channels: number of input bands of the network
+    :return: Array of shape (in_channels, height, width).
+    """
+
+    ds = gdal.Open(path, gdal.GA_ReadOnly)
+    array = ds.ReadAsArray().astype(dtype="float32")
+    array = np.reshape(array, [ds.RasterCount, ds.RasterYSize, ds.RasterXSize])
+
+    return array[:in_channels, :, :]
+
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    logging.basicConfig(
+        format="%(asctime)s %(levelname)-8s %(message)s",
+        level=logging.INFO,
+        datefmt="%Y-%m-%d %H:%M:%S",
+    )
+
+    persistence = Persistence(config_file_path=args.config)
+    output_path = args.output if args.output is not None else persistence.unet_export_path
+    tile_size = persistence.unet_tile_size if hasattr(persistence, "unet_tile_size") else 0
+    tile_size = tile_size if tile_size > 0 else 256
+    batch_size = args.batch_size
+    if batch_size is None:
+        batch_size = persistence.unet_batch_size if hasattr(persistence, "unet_batch_size") else 1
+
+    pruning_level = persistence.unetpp_pruning_level if hasattr(persistence, "unetpp_pruning_level") else 0
+    unet = unet_export.load_checkpoint(persistence.unet_path, persistence.unet_type, pruning_level)
+    if args.backend == "int8":
+        arrays = [read_image(path, unet.in_channels) for path in args.calibration_images]
+        quantized = quantization.quantize(unet, arrays, tile_size, batch_size=batch_size)
+        unet_export.save_torchscript(quantized, output_path, tile_size)
+    else:
+        unet_export.export(unet, output_path, args.backend, tile_size)
+    logging.info("Exported %s to %s (%s, tile size: %d)", persistence.unet_path, output_path, args.backend, tile_size)
+
+    if args.benchmark:
+        results = unet_export.benchmark(
+            {
+                "eager": lambda: unet_export.load_checkpoint(
+                    persistence.unet_path, persistence.unet_type, pruning_level
+                ),
+                args.backend: lambda: unet_export.load_backend(output_path, args.backend),
+            },
+            (batch_size, unet.in_channels, tile_size, tile_size),
+        )
+        for name, (load_time, latency) in results.items():
+            logging.info("%s: load time %.3f s, latency %.3f s / %d tiles", name, load_time, latency, batch_size)
+
+    if args.benchmark_memory and persistence.unet_type != "unetpp":
+        logging.warning("The low-memory path is only available for UNET++, unet_type is %s", persistence.unet_type)
+    elif args.benchmark_memory:
+        input_shape = (batch_size, unet.in_channels, tile_size, tile_size)
+        for low_memory in [False, True]:
+            peak_memory = unet_export.measure_peak_memory(unet, input_shape, low_memory)
+            logging.info("low_memory=%s: peak memory +%.1f MiB / %d tiles", low_memory, peak_memory, batch_size)
+
+    if args.evaluation_image is not None:
+        array = read_image(args.evaluation_image, unet.in_channels)
+        labels = gdal.Open(args.evaluation_labels, gdal.GA_ReadOnly).ReadAsArray() == args.label_value
+        evaluation_args = dict(
+            threshold=persistence.medium_prob_percent / 100,
+            tile_size=tile_size,
+            overlap=persistence.unet_tile_overlap if hasattr(persistence, "unet_tile_overlap") else 32,
+            batch_size=batch_size,
+        )
+
+    if args.compare_pruning_levels and persistence.unet_type != "unetpp":
+        logging.warning("Pruning levels can only be compared for UNET++, unet_type is %s", persistence.unet_type)
+    elif args.compare_pruning_levels:
+        results = unet_export.compare_pruning_levels(unet_export.freeze(unet), array, labels, **evaluation_args)
+        for level, result in results.items():
+            logging.info(
+                "L%d: runtime %.3f s (%.2fx), accuracy %.4f, precision %.4f, recall %.4f, IoU %.4f",
+                level,
+                result["runtime"],
+                result["speedup"],
+                result["accuracy"],
+                result["precision"],
+                result["recall"],
+                result["iou"],
+            )
+
+    if args.evaluation_image is not None and args.backend == "int8":
+        results = quantization.compare(
+            unet_export.freeze(unet),
+            unet_export.load_backend(output_path, args.backend),
+            array,
+            labels,
+            **evaluation_args,
+        )
+        for name in ["fp32", "int8"]:
+            result = results[name]
+            logging.info(
+                "%s: runtime %.3f s, accuracy %.4f, precision %.4f, recall %.4f, IoU %.4f",
+                name,
+                result["runtime"],
+                result["accuracy"],
+                result["precision"],
+                result["recall"],
+                result["iou"],
+            )
+        logging.info(
+            "delta: accuracy %+.4f, precision %+.4f, recall %+.4f, IoU %+.4f, speedup %.2fx",
+            results["delta"]["accuracy"],
+            results["delta"]["precision"],
+            results["delta"]["recall"],
+            results["delta"]["iou"],
+            results["delta"]["speedup"],
+        )
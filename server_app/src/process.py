@@ -8,13 +8,12 @@ import datetime as dt
 
 from pathlib import Path
 from model.model import Model
-from typing import List, Optional
+from typing import Dict, Iterator, List, Optional, Tuple
 from collections import OrderedDict
 from server_app.src.planetapi import PlanetAPI
 from server_app.src.sentinelapi import SentinelAPI
 
-from model.model import UNET, UNETPP
-import torch
+from model.registry import registry
 
 
 class Process(object):
@@ -67,18 +66,25 @@ class Process(object):
                 data_file=self.api.data_file, crs_to="epsg:3857"
             )
         if self.is_unet:
-            if hasattr(self.model.persistence, "unet_path"):
-                unet_dict = torch.load(self.model.persistence.unet_path, weights_only=True)
-            if hasattr(self.model.persistence, "unet_type"):
-                if self.model.persistence.unet_type == "unetpp":
-                    if unet_dict["pretrained"]:
-                        base_unet = UNET()
-                    else:
-                        base_unet = None
-                    self.unet = UNETPP(pretrained_unet=base_unet, deep_vision=unet_dict["deep_vision"])
-                elif self.model.persistence.unet_type == "unet":
-                    self.unet = UNET()
-                self.unet.load_state_dict(unet_dict["model_state_dict"])
+            unet_backend = (
+                self.model.persistence.unet_backend if hasattr(self.model.persistence, "unet_backend") else "eager"
+            )
+            if unet_backend != "eager":
+                self.unet = registry.get_unet_backend(self.model.persistence.unet_export_path, unet_backend)
+            else:
+                pruning_level = (
+                    self.model.persistence.unetpp_pruning_level
+                    if hasattr(self.model.persistence, "unetpp_pruning_level")
+                    else 0
+                )
+                low_memory = (
+                    self.model.persistence.unetpp_low_memory
+                    if hasattr(self.model.persistence, "unetpp_low_memory")
+                    else False
+                )
+                self.unet = registry.get_unet(
+                    self.model.persistence.unet_path, self.model.persistence.unet_type, pruning_level, low_memory
+                )
 
     def mainloop(self) -> None:
         """
@@ -107,6 +113,8 @@ class Process(object):
         elif self.download_update:
             self.execute_download_pipeline()
 
+        registry.log_metrics()
+
     def startup(self) -> None:
         """
         Executes the startup process: login, search, order, download earlier images.
@@ -261,14 +269,15 @@ class Process(object):
                 )
 
                 heatmap_types = [("low", 1), ("medium", 2), ("high", 3)]
-                for heatmap_type, value in heatmap_types:
-                    Model.get_waste_geojson(
-                        input_file=masked_heatmap,
-                        output_file="/".join([work_dir, feature_id, date, heatmap_type + ".geojson"]),
-                        search_value=value,
-                    )
+                Model.get_waste_geojsons(
+                    input_file=masked_heatmap,
+                    output_files={
+                        value: "/".join([work_dir, feature_id, date, heatmap_type + ".geojson"])
+                        for heatmap_type, value in heatmap_types
+                    },
+                )
 
-                estimation = self.model.estimate_garbage_area(masked_classified, "classified")
+                estimation = self.model.estimate_garbage_areas(classified=masked_classified)["classified"]
 
                 if feature_id not in self.estimations.keys():
                     self.estimations[feature_id] = dict()
@@ -288,6 +297,53 @@ class Process(object):
         planet_path = self.join_path("workspace_root_dir", "result_dir_planetscope")
         work_dir = sentinel_path if self.satellite_type == "sentinel-2" else planet_path
 
+        # the scenes are read lazily, while the batches of UNET are filled with their tiles
+        scenes = dict()
+        results = self.model.create_classifications_and_heatmaps_with_UNET(
+            self.get_pending_unet_inputs(downloaded_images, work_dir, scenes),
+            self.unet,
+            self.model.persistence.unet_classification_postfix,
+            self.model.persistence.unet_heatmap_postfix,
+        )
+
+        for indices_path, classified, heatmap in results:
+            feature_id, date = scenes.pop(indices_path)
+
+            Model.get_waste_geojson(
+                input_file=classified,
+                output_file="/".join([work_dir, feature_id, date, "classified.geojson"]),
+                search_value=1,
+            )
+
+            heatmap_types = [("low", 1), ("medium", 2), ("high", 3)]
+            Model.get_waste_geojsons(
+                input_file=heatmap,
+                output_files={
+                    value: "/".join([work_dir, feature_id, date, heatmap_type + ".geojson"])
+                    for heatmap_type, value in heatmap_types
+                },
+            )
+
+            estimation = self.model.estimate_garbage_areas(classified=classified)["classified"]
+
+            if feature_id not in self.estimations.keys():
+                self.estimations[feature_id] = dict()
+            self.estimations[feature_id][date] = estimation
+
+        self.generate_json_files_for_webapp()
+
+    def get_pending_unet_inputs(
+        self, downloaded_images: OrderedDict, work_dir: str, scenes: Dict[str, Tuple[str, str]]
+    ) -> Iterator[str]:
+        """
+        Creates the inputs of UNET for the scenes without heatmap, one by one when they are needed.
+
+        :param downloaded_images: the paths of the downloaded images by feature id and date
+        :param work_dir: the directory of the results
+        :param scenes: the (feature id, date) pairs of the yielded inputs are stored in it by path
+        :return: the paths of the UNET inputs
+        """
+
         for feature_id in downloaded_images.keys():
             for date in downloaded_images[feature_id].keys():
                 output_dir_path = "/".join([work_dir, feature_id, date])
@@ -315,38 +371,9 @@ class Process(object):
                     "all",
                     output_dir_path,
                 )
-                (
-                    classified,
-                    heatmap,
-                ) = self.model.create_classification_and_heatmap_with_UNET(
-                    indices_path,
-                    self.unet,
-                    self.model.persistence.unet_classification_postfix,
-                    self.model.persistence.unet_heatmap_postfix,
-                )
-
-                Model.get_waste_geojson(
-                    input_file=classified,
-                    output_file="/".join([work_dir, feature_id, date, "classified.geojson"]),
-                    search_value=1,
-                )
-
-                heatmap_types = [("low", 1), ("medium", 2), ("high", 3)]
-
-                for heatmap_type, value in heatmap_types:
-                    Model.get_waste_geojson(
-                        input_file=heatmap,
-                        output_file="/".join([work_dir, feature_id, date, heatmap_type + ".geojson"]),
-                        search_value=value,
-                    )
 
-                estimation = self.model.estimate_garbage_area(classified, "classified")
-
-                if feature_id not in self.estimations.keys():
-                    self.estimations[feature_id] = dict()
-                self.estimations[feature_id][date] = estimation
-
-        self.generate_json_files_for_webapp()
+                scenes[indices_path] = (feature_id, date)
+                yield indices_path
 
     def generate_json_files_for_webapp(self) -> None:
         """
@@ -385,13 +412,27 @@ class Process(object):
         image_dict = OrderedDict()
         geojson_dict = OrderedDict()
 
+        band_statistics_approximate = (
+            self.model.persistence.band_statistics_approximate
+            if hasattr(self.model.persistence, "band_statistics_approximate")
+            else False
+        )
+        web_stretch_percentiles = (
+            tuple(self.model.persistence.web_stretch_percentiles)
+            if hasattr(self.model.persistence, "web_stretch_percentiles")
+            and self.model.persistence.web_stretch_percentiles
+            else None
+        )
+
         for i in range(len(image_files_abs)):
             rel_path_split = image_files_rel[i].split("/")
 
             feature_id = rel_path_split[1]
             date = rel_path_split[2]
 
-            min_value, max_value = self.model.get_min_max_value_of_band(image_files_abs[i], 3)
+            min_value, max_value = self.model.get_stretch_of_band(
+                image_files_abs[i], 3, web_stretch_percentiles, band_statistics_approximate
+            )
 
             if feature_id not in image_dict:
                 image_dict[feature_id] = OrderedDict()
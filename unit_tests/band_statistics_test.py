@@ -0,0 +1,144 @@
+import os
+import json
+import unittest
+import tempfile
+import rasterio
+import numpy as np
+import model.band_statistics as band_statistics
+from unittest import mock
+from model.model import Model
+from rasterio.enums import Resampling
+from rasterio.transform import from_origin
+
+
+class TestBandStatistics(unittest.TestCase):
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, "image.tif")
+
+        rng = np.random.default_rng(0)
+        self.array = rng.gamma(2, 500, size=(3, 600, 500)).astype("float32")
+        self.array[:, :10, :10] = np.nan
+        with rasterio.open(
+            self.path,
+            "w",
+            driver="GTiff",
+            height=600,
+            width=500,
+            count=3,
+            dtype="float32",
+            transform=from_origin(100, 200, 3, 3),
+        ) as dataset:
+            dataset.write(self.array)
+
+    def tearDown(self) -> None:
+        self.temp_dir.cleanup()
+
+    def test_exact(self):
+        statistics = band_statistics.get_band_statistics(self.path, 3, percentiles=[2, 98, 50])
+
+        self.assertFalse(statistics.approximate)
+        self.assertEqual(statistics.get_stretch(), (np.nanmin(self.array[2]), np.nanmax(self.array[2])))
+        for percentile in [2, 50, 98]:
+            self.assertAlmostEqual(
+                statistics.percentiles[percentile], np.nanpercentile(self.array[2], percentile), places=2
+            )
+        self.assertEqual(statistics.get_stretch((2, 98)), (statistics.percentiles[2], statistics.percentiles[98]))
+
+    def test_cached_in_sidecar(self):
+        expected = band_statistics.get_band_statistics(self.path, 3)
+
+        self.assertTrue(os.path.exists(band_statistics.get_sidecar_path(self.path)))
+        with mock.patch("model.band_statistics.rasterio.open") as rasterio_open:
+            self.assertEqual(band_statistics.get_band_statistics(self.path, 3), expected)
+            self.assertEqual(
+                band_statistics.get_band_statistics(self.path, 3, percentiles=()).minimum, expected.minimum
+            )
+            # the exact statistics are used in the approximate mode as well
+            self.assertEqual(band_statistics.get_band_statistics(self.path, 3, approximate=True), expected)
+            rasterio_open.assert_not_called()
+
+        # another percentile is computed from the band
+        band_statistics.get_band_statistics(self.path, 3, percentiles=[10])
+        with open(band_statistics.get_sidecar_path(self.path), "r") as file:
+            self.assertEqual(set(json.load(file)["bands"]["3/exact"]["percentiles"].keys()), {"2.0", "10.0", "98.0"})
+
+    def test_outdated_sidecar(self):
+        band_statistics.get_band_statistics(self.path, 3)
+
+        with rasterio.open(self.path, "r+") as dataset:
+            dataset.write(self.array[2] * 2, 3)
+        os.utime(self.path, ns=(0, 0))
+
+        statistics = band_statistics.get_band_statistics(self.path, 3, percentiles=())
+        self.assertEqual(statistics.maximum, np.nanmax(self.array[2] * 2))
+
+    def test_stored_gdal_statistics(self):
+        with rasterio.open(self.path, "r+") as dataset:
+            dataset.update_tags(3, STATISTICS_MINIMUM="1", STATISTICS_MAXIMUM="2", STATISTICS_APPROXIMATE="YES")
+
+        approximate = band_statistics.get_band_statistics(self.path, 3, approximate=True, percentiles=())
+        exact = band_statistics.get_band_statistics(self.path, 3, percentiles=())
+
+        self.assertEqual((approximate.minimum, approximate.maximum, approximate.approximate), (1, 2, True))
+        self.assertEqual(exact.get_stretch(), (np.nanmin(self.array[2]), np.nanmax(self.array[2])))
+
+    def test_approximate(self):
+        with rasterio.open(self.path, "r+") as dataset:
+            dataset.build_overviews([2, 4], Resampling.nearest)
+
+        statistics = band_statistics.get_band_statistics(self.path, 3, approximate=True, max_size=150)
+
+        self.assertTrue(statistics.approximate)
+        self.assertGreaterEqual(statistics.minimum, np.nanmin(self.array[2]))
+        self.assertLessEqual(statistics.maximum, np.nanmax(self.array[2]))
+        for percentile in [2, 98]:
+            expected = np.nanpercentile(self.array[2], percentile)
+            self.assertLess(abs(statistics.percentiles[percentile] - expected), 0.05 * expected)
+
+        with open(band_statistics.get_sidecar_path(self.path), "r") as file:
+            self.assertEqual(list(json.load(file)["bands"].keys()), ["3/approximate"])
+
+    def test_small_band_is_exact(self):
+        statistics = band_statistics.get_band_statistics(self.path, 3, approximate=True, use_cache=False)
+
+        self.assertFalse(statistics.approximate)
+        self.assertFalse(os.path.exists(band_statistics.get_sidecar_path(self.path)))
+
+    def test_read_only_directory(self):
+        with mock.patch("model.band_statistics.open", side_effect=PermissionError, create=True):
+            with self.assertLogs(level="WARNING"):
+                statistics = band_statistics.get_band_statistics(self.path, 3, percentiles=())
+
+        self.assertEqual(statistics.maximum, np.nanmax(self.array[2]))
+
+    def test_all_nan(self):
+        statistics = band_statistics.compute_statistics(np.full(shape=(4, 4), fill_value=np.nan), [2], False)
+
+        self.assertTrue(np.isnan(statistics.minimum) and np.isnan(statistics.percentiles[2]))
+
+    def test_nodata(self):
+        path = os.path.join(self.temp_dir.name, "nodata.tif")
+        array = np.arange(1, 101, dtype="uint16").reshape(10, 10)
+        array[:5] = 0
+        with rasterio.open(
+            path, "w", driver="GTiff", height=10, width=10, count=1, dtype="uint16", nodata=0
+        ) as dataset:
+            dataset.write(array, 1)
+
+        statistics = band_statistics.get_band_statistics(path, 1)
+
+        self.assertEqual(statistics.get_stretch(), (51, 100))
+        self.assertEqual(statistics.percentiles[2], np.percentile(array[5:], 2))
+
+    def test_model(self):
+        self.assertEqual(
+            Model.get_min_max_value_of_band(self.path, 1), (np.nanmin(self.array[0]), np.nanmax(self.array[0]))
+        )
+        self.assertAlmostEqual(
+            Model.get_stretch_of_band(self.path, 1, (2, 98))[1], np.nanpercentile(self.array[0], 98), places=2
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
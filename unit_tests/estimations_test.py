@@ -1,6 +1,10 @@
+import math
+import pyproj
 import unittest
 import numpy as np
 import model.estimations as estimations
+from affine import Affine
+from rasterio.crs import CRS
 from model.treshold import Treshold
 
 
@@ -55,3 +59,57 @@ class TestEstimations(unittest.TestCase):
 
         # assert
         self.assertTrue(np.all(expected == heatmap), "Heatmap does not have expected values!")
+
+
+class TestAreaStatistics(unittest.TestCase):
+    def test_count_values_of_float_array(self):
+        # arrange
+        array = np.array([[0, 100, 100, np.nan], [200, -1, 0.5, 100]], dtype="float32")
+
+        # act
+        counts = estimations.count_values(array, block_size=3)
+
+        # assert
+        self.assertEqual(counts, {0: 1, 100: 3, 200: 1})
+
+    def test_count_values_of_integer_array(self):
+        # arrange
+        array = np.array([3, 1, 3, 70000, 70000, -5], dtype="int32")
+
+        # act
+        counts = estimations.count_values(array)
+
+        # assert
+        self.assertEqual(counts, {1: 1, 3: 2, 70000: 2})
+
+    def test_get_area(self):
+        # arrange
+        statistics = estimations.AreaStatistics({1: 4, 2: 1}, 9.0)
+
+        # assert
+        self.assertEqual(statistics.get_area(1), 36)
+        self.assertEqual(statistics.get_area(3), 0)
+        self.assertIsNone(estimations.AreaStatistics({1: 4}, None).get_area(1))
+
+    def test_get_pixel_area(self):
+        # arrange
+        transform = Affine(3, 0, 500000, 0, -2.5, 5200000)
+
+        # assert
+        # the scale factor of UTM is 0.9996 at the central meridian
+        self.assertAlmostEqual(estimations.get_pixel_area(transform, CRS.from_epsg(32634)), 7.5 / 0.9996**2, places=3)
+        self.assertIsNone(estimations.get_pixel_area(transform, CRS.from_epsg(4326)))
+        self.assertIsNone(estimations.get_pixel_area(transform, None))
+
+    def test_get_pixel_area_of_web_mercator(self):
+        # arrange
+        x, y = pyproj.Transformer.from_crs("epsg:4326", "epsg:3857", always_xy=True).transform(19, 47.5)
+        transform = Affine(10, 0, x - 500, 0, -10, y + 500)
+
+        # act
+        area = estimations.get_pixel_area(transform, CRS.from_epsg(3857), (100, 100))
+
+        # assert
+        # a Web Mercator pixel covers cos^2(latitude) of its area in the CRS on the ground (on a sphere)
+        expected = 100 * math.cos(math.radians(47.5)) ** 2
+        self.assertLess(abs(area - expected), 0.005 * expected)
@@ -28,3 +28,67 @@ class TestGdalUtils(unittest.TestCase):
         self.assertEqual(mask_ds.RasterYSize, ds.RasterYSize, "RasterYSize didnt match")
         self.assertEqual(mask_ds.RasterCount, 1, "Raster count was not 1")
         self.assertTrue(np.all(mask_ds.ReadAsArray() == expected_mask), "mask was not equal with expected mask")
+
+
+class TestGetOutputDataType(unittest.TestCase):
+    def test_without_profile(self):
+        data_type, no_data_value = gdal_utils.get_output_data_type([np.zeros(shape=(2, 2))])
+
+        self.assertEqual(data_type, gdal.GDT_Float32)
+        self.assertTrue(np.isnan(no_data_value))
+
+    def test_auto_classification(self):
+        classification = np.array([[0, 100], [200, 100]], dtype="float64")
+
+        data_type, no_data_value = gdal_utils.get_output_data_type([classification], {"data_type": "auto"})
+
+        self.assertEqual(data_type, gdal.GDT_Byte)
+        self.assertIsNone(no_data_value)
+
+    def test_auto_with_nan(self):
+        heatmap = np.array([[0, 1], [np.nan, 255]], dtype="float32")
+
+        data_type, no_data_value = gdal_utils.get_output_data_type([heatmap], {"data_type": "auto"})
+
+        self.assertEqual(data_type, gdal.GDT_UInt16)
+        self.assertEqual(no_data_value, 65535)
+
+    def test_auto_with_fractions(self):
+        indices = np.array([[0, 0.5], [1, 2]], dtype="float32")
+
+        data_type, _ = gdal_utils.get_output_data_type([indices], {"data_type": "auto"})
+
+        self.assertEqual(data_type, gdal.GDT_Float32)
+
+    def test_auto_with_negative_values(self):
+        data_type, _ = gdal_utils.get_output_data_type([np.array([-1, 1])], {"data_type": "auto"})
+
+        self.assertEqual(data_type, gdal.GDT_Float32)
+
+    def test_unknown_data_type(self):
+        with self.assertRaises(ValueError):
+            gdal_utils.get_output_data_type([np.zeros(shape=(2, 2))], {"data_type": "int64"})
+
+
+class TestGetCreationOptions(unittest.TestCase):
+    def test_without_profile(self):
+        self.assertEqual(gdal_utils.get_creation_options(), [])
+
+    def test_tiled_compressed_profile(self):
+        profile = {"compress": "deflate", "predictor": True, "tiled": True, "tile_size": 512}
+
+        options = gdal_utils.get_creation_options(profile, gdal.GDT_Byte)
+
+        self.assertEqual(
+            options,
+            ["TILED=YES", "BLOCKXSIZE=512", "BLOCKYSIZE=512", "COMPRESS=DEFLATE", "BIGTIFF=IF_SAFER", "PREDICTOR=2"],
+        )
+
+    def test_floating_point_predictor(self):
+        options = gdal_utils.get_creation_options({"compress": "ZSTD", "predictor": True}, gdal.GDT_Float32)
+
+        self.assertIn("PREDICTOR=3", options)
+
+
+if __name__ == "__main__":
+    unittest.main()
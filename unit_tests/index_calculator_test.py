@@ -102,3 +102,86 @@ class TestIndexCalculator(unittest.TestCase):
         result = IndexCalculator.calculate_fraction(numerator, denominator)
 
         self.assertTrue(np.all(np.isnan(result)))
+
+    def test_calculate_fraction_given_numerator_range_denominator_zeros(self):
+        numerator = np.array([[1.0, -1.0], [2.0, 0.5]])
+        denominator = np.array([[0.0, 0.0], [1.0, 1.0]])
+
+        result = IndexCalculator.calculate_fraction(numerator, denominator, numerator_range=(-10.0, 10.0))
+
+        self.assertEqual(result[0, 0], 10)
+        self.assertEqual(result[0, 1], -10)
+        self.assertEqual(result[1, 0], 2)
+        self.assertEqual(result[1, 1], 0.5)
+
+
+class TestCalculateIndices(unittest.TestCase):
+    def setUp(self) -> None:
+        self.index_names = ["pi", "ndwi", "ndvi", "rndvi", "sr", "apwi", "mndbi", "api"]
+        rng = np.random.default_rng(0)
+        self.bands = OrderedDict()
+        for band_name in ["blue", "green", "red", "nir", "swir"]:
+            band = (rng.integers(-3, 4, size=(37, 23)) / 2).astype("float32")
+            band[rng.random(size=band.shape) < 0.05] = float("NaN")
+            self.bands[band_name] = band
+
+    def calculate_indices_one_by_one(self, numerator_ranges=None) -> OrderedDict:
+        indices = OrderedDict()
+        for index_name in self.index_names:
+            numerator_range = numerator_ranges.get(index_name) if numerator_ranges else None
+            indices[index_name] = IndexCalculator.calculate_index(index_name, self.bands, indices, numerator_range)
+        return indices
+
+    def test_same_as_one_by_one(self):
+        expected = self.calculate_indices_one_by_one()
+
+        for block_pixels in [1, 100, None]:
+            result = IndexCalculator.calculate_indices(self.index_names, self.bands, block_pixels=block_pixels)
+
+            self.assertEqual(list(result.keys()), self.index_names)
+            for index_name in self.index_names:
+                self.assertEqual(result[index_name].dtype, np.float32)
+                self.assertTrue(np.array_equal(result[index_name], expected[index_name], equal_nan=True))
+
+    def test_given_numerator_ranges(self):
+        numerator_ranges = {"pi": (-10.0, 10.0), "ndvi": (-20.0, 20.0)}
+        expected = self.calculate_indices_one_by_one(numerator_ranges)
+
+        result = IndexCalculator.calculate_indices(self.index_names, self.bands, numerator_ranges, block_pixels=100)
+
+        for index_name in self.index_names:
+            self.assertTrue(np.array_equal(result[index_name], expected[index_name], equal_nan=True))
+
+    def test_preallocated_output(self):
+        out = np.zeros(shape=(2, 37, 23), dtype="float32")
+
+        result = IndexCalculator.calculate_indices(["ndvi", "pi"], self.bands, out=out)
+
+        self.assertTrue(np.shares_memory(result["ndvi"], out))
+        self.assertTrue(np.array_equal(out[1], IndexCalculator.calculate_index("pi", self.bands, {}), equal_nan=True))
+        with self.assertRaises(ValueError):
+            IndexCalculator.calculate_indices(["ndvi"], self.bands, out=out)
+
+    def test_unknown_index(self):
+        with self.assertRaises(ValueError):
+            IndexCalculator.calculate_indices(["pi", "unknown"], self.bands)
+
+    def test_dependencies_not_returned(self):
+        expected = self.calculate_indices_one_by_one()
+
+        result = IndexCalculator.calculate_indices(["api", "sr"], self.bands, block_pixels=100)
+
+        self.assertEqual(list(result.keys()), ["api", "sr"])
+        self.assertTrue(np.array_equal(result["api"], expected["api"], equal_nan=True))
+        self.assertTrue(np.array_equal(result["sr"], expected["sr"], equal_nan=True))
+
+    def test_get_dependencies(self):
+        self.assertEqual(IndexCalculator.get_dependencies(["api", "ndvi"]), ["pi", "ndvi", "mndbi", "api"])
+        self.assertEqual(IndexCalculator.get_dependencies(["ndwi"]), ["ndwi"])
+        with self.assertRaises(ValueError):
+            IndexCalculator.get_dependencies(["unknown"])
+
+    def test_get_required_bands(self):
+        self.assertEqual(IndexCalculator.get_required_bands(["api"]), ["nir", "red", "swir"])
+        self.assertEqual(IndexCalculator.get_required_bands(["apwi"]), ["blue", "red", "green", "nir"])
+        self.assertEqual(IndexCalculator.get_required_bands([]), [])
@@ -1,7 +1,22 @@
+import os
+import math
+import json
+import joblib
 import unittest
+import tempfile
+import multiprocessing
+import rasterio
 import numpy as np
+from unittest import mock
+from PIL import ImageColor
 from model.index_calculator import IndexCalculator
 import model.persistence as persistence
+from model.model import Model
+from typing import List, Tuple
+from rasterio import features
+from rasterio.transform import from_origin
+from shapely.geometry import Point, Polygon, shape
+from sklearn.ensemble import RandomForestClassifier
 
 from desktop_app.src.view_model import ViewModel
 
@@ -522,5 +537,653 @@ class TestGetCoordsInsidePolygon(unittest.TestCase, ViewModel):
             self.assertTrue(value in result)
 
 
+class TestRasterizePolygons(unittest.TestCase):
+    def test_same_as_shapely(self):
+        rng = np.random.default_rng(0)
+        for _ in range(100):
+            vertices = rng.integers(0, 15, size=(rng.integers(3, 8), 2))
+            polygon = Polygon(vertices)
+            bbox_coords = (0, 0, 14, 14)
+
+            xs, ys = Model.get_polygon_interior(vertices.ravel().tolist(), bbox_coords)
+
+            expected = [(x, y) for y in range(15) for x in range(15) if polygon.contains(Point(x, y))]
+            self.assertEqual(list(zip(xs.tolist(), ys.tolist())), expected)
+
+    def test_later_polygons_overwrite(self):
+        layer = np.zeros(shape=(6, 8), dtype=int)
+        polygons = [
+            ([0.0, 0.0, 6.0, 0.0, 6.0, 5.0, 0.0, 5.0], (0, 0, 6, 5), 100),
+            ([2.0, 1.0, 9.0, 1.0, 9.0, 4.0, 2.0, 4.0], (2, 1, 9, 4), 200),
+        ]
+
+        result = Model.rasterize_polygons(layer, polygons)
+
+        expected = np.zeros(shape=(6, 8), dtype=int)
+        expected[1:5, 1:6] = 100
+        expected[2:4, 3:8] = 200
+        self.assertTrue(np.array_equal(result, expected))
+
+    def test_degenerate_polygon(self):
+        xs, ys = Model.get_polygon_interior([1.0, 1.0, 3.0, 3.0], (0, 0, 4, 4))
+
+        self.assertEqual(len(xs), 0)
+        self.assertEqual(len(ys), 0)
+
+
+class TestGetBlockWindows(unittest.TestCase):
+    def test_windows_cover_image(self):
+        rows, cols = 7, 10
+        coverage = np.zeros(shape=(rows, cols), dtype=int)
+
+        windows = Model.get_block_windows(rows, cols, 4)
+
+        self.assertEqual(len(windows), 6)
+        for window in windows:
+            self.assertTrue(window.width <= 4 and window.height <= 4)
+            coverage[Model.window_slices(window)] += 1
+        self.assertTrue(np.all(coverage == 1))
+
+    def test_block_larger_than_image(self):
+        windows = Model.get_block_windows(3, 5, 512)
+
+        self.assertEqual(len(windows), 1)
+        self.assertEqual((windows[0].height, windows[0].width), (3, 5))
+
+
+class TestSaveBandsIndicesByBlocks(unittest.TestCase):
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.model = Model(persistence.Persistence(CONFIG_FILE_NAME_DESKTOP_APP))
+        self.model.persistence.open_kernel = 3
+        self.model.persistence.close_kernel = 5
+        self.model.persistence.dilute_kernel = 3
+
+        rows, cols = 70, 53
+        rng = np.random.default_rng(0)
+        array = rng.uniform(100, 1000, size=(4, rows, cols)).astype("float32")
+        array[1] = rng.uniform(100, 300, size=(rows, cols))
+        array[3] = rng.uniform(600, 1000, size=(rows, cols))
+        # water (green > nir) on the left side of the image
+        array[1, :, :20] += 2000
+        array[3, :, :20] /= 10
+        # zero denominators of sr, their values come from the numerator range
+        array[2, 5:9, 10:14] = 0
+        array[:, 0, 0] = np.nan
+
+        self.input_path = os.path.join(self.temp_dir.name, "input.tif")
+        with rasterio.open(
+            self.input_path,
+            "w",
+            driver="GTiff",
+            height=rows,
+            width=cols,
+            count=4,
+            dtype="float32",
+            transform=from_origin(100, 200, 3, 3),
+        ) as dataset:
+            dataset.write(array)
+
+    def tearDown(self) -> None:
+        self.temp_dir.cleanup()
+
+    def save_bands_indices(self, block_size: int) -> np.ndarray:
+        working_dir = os.path.join(self.temp_dir.name, str(block_size))
+        os.mkdir(working_dir)
+
+        output_path = self.model.save_bands_indices(
+            self.input_path,
+            ["red", "nir"],
+            ["pi", "ndwi", "ndvi", "sr", "apwi"],
+            "_bands_indices",
+            working_dir,
+            block_size=block_size,
+        )
+
+        with rasterio.open(output_path, "r") as dataset:
+            return dataset.read()
+
+    def assert_same_as_whole_image(self) -> np.ndarray:
+        expected = self.save_bands_indices(0)
+
+        for block_size in [16, 25]:
+            result = self.save_bands_indices(block_size)
+
+            self.assertEqual(result.shape, (7, 70, 53))
+            self.assertTrue(np.array_equal(result, expected, equal_nan=True))
+
+        return expected
+
+    def test_without_masking(self):
+        self.model.persistence.masking = False
+
+        expected = self.assert_same_as_whole_image()
+
+        self.assertTrue(np.all(np.isfinite(expected[:, 1:, :])))
+        self.assertTrue(np.all(np.isnan(expected[:, 0, 0])))
+        # the sr values of the zero red pixels are the maximum of the nir values
+        self.assertTrue(np.all(expected[5, 5:9, 10:14] == np.nanmax(expected[1])))
+
+    def test_with_water_mask(self):
+        self.model.persistence.masking = True
+
+        expected = self.assert_same_as_whole_image()
+
+        # the land on the right side is masked out
+        masked = np.all(np.isnan(expected), axis=0)
+        self.assertTrue(np.all(masked[:, 25:]))
+        self.assertFalse(np.any(masked[1:, :19]))
+
+
+class TestGetInputBandNames(unittest.TestCase):
+    def test_bands_of_dependencies(self):
+        band_names = Model.get_input_band_names(["blue", "red"], ["api"])
+
+        self.assertEqual(band_names, ["blue", "red", "nir", "swir"])
+
+    def test_no_indices(self):
+        self.assertEqual(Model.get_input_band_names(["green"], []), ["green"])
+
+
+class TestGetIntersectionWindows(unittest.TestCase):
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self) -> None:
+        self.temp_dir.cleanup()
+
+    def create_image(self, name: str, x: float, y: float, shape: Tuple[int, int]) -> str:
+        path = os.path.join(self.temp_dir.name, name)
+        with rasterio.open(
+            path,
+            "w",
+            driver="GTiff",
+            height=shape[0],
+            width=shape[1],
+            count=1,
+            dtype="float32",
+            transform=from_origin(x, y, 3, 3),
+        ) as dataset:
+            dataset.write(np.zeros(shape=(1,) + shape, dtype="float32"))
+        return path
+
+    def test_overlapping_images(self):
+        path_1 = self.create_image("first.tif", 100, 200, (20, 30))
+        path_2 = self.create_image("second.tif", 100 + 5 * 3, 200 - 4 * 3, (15, 12))
+
+        window_1, window_2, coords_information = Model.get_intersection_windows(path_1, path_2)
+
+        self.assertEqual(Model.window_slices(window_1), (slice(4, 19), slice(5, 17)))
+        self.assertEqual(Model.window_slices(window_2), (slice(0, 15), slice(0, 12)))
+        self.assertEqual(coords_information, ((115, 188), (4, 5), (0, 0)))
+
+    def test_larger_second_image(self):
+        path_1 = self.create_image("first.tif", 100, 200, (20, 30))
+        path_2 = self.create_image("second.tif", 100 - 7 * 3, 200 + 2 * 3, (25, 40))
+
+        window_1, window_2, coords_information = Model.get_intersection_windows(path_1, path_2)
+
+        self.assertEqual(Model.window_slices(window_1), (slice(0, 20), slice(0, 30)))
+        self.assertEqual(Model.window_slices(window_2), (slice(2, 22), slice(7, 37)))
+        self.assertEqual(coords_information, ((100, 200), (2, 7), (0, 0)))
+
+    def test_disjoint_images(self):
+        path_1 = self.create_image("first.tif", 100, 200, (10, 10))
+        path_2 = self.create_image("second.tif", 100 + 10 * 3, 200, (10, 10))
+
+        self.assertEqual(Model.get_intersection_windows(path_1, path_2), (None, None, None))
+
+
+class TestGetPiDifferenceHeatmap(unittest.TestCase):
+    def setUp(self) -> None:
+        self.model = Model(persistence.Persistence(CONFIG_FILE_NAME_DESKTOP_APP))
+        self.model.persistence.washed_up_heatmap_sections = 5
+
+    def test_sections(self):
+        difference = np.array([[-4, -3, -2], [-1, 0, 1], [2, 3, 4]], dtype="float32")
+
+        heatmap_pos, heatmap_neg = self.model.get_pi_difference_heatmap(difference)
+
+        self.assertTrue(np.array_equal(heatmap_pos, [[0, 0, 0], [0, 0, 0], [1, 2, 3]]))
+        self.assertTrue(np.array_equal(heatmap_neg, [[3, 2, 1], [0, 0, 0], [0, 0, 0]]))
+
+    def test_nan_values(self):
+        difference = np.array([[-4, -3, -2], [-1, np.nan, 1], [2, 3, 4]], dtype="float32")
+
+        heatmap_pos, heatmap_neg = self.model.get_pi_difference_heatmap(difference)
+
+        self.assertEqual(heatmap_pos[1, 1], 0)
+        self.assertEqual(heatmap_neg[1, 1], 0)
+        self.assertEqual(heatmap_pos[2, 2], 3)
+        self.assertEqual(heatmap_neg[0, 0], 3)
+
+    def test_zero_difference(self):
+        difference = np.zeros(shape=(3, 3), dtype="float32")
+
+        heatmap_pos, heatmap_neg = self.model.get_pi_difference_heatmap(difference)
+
+        self.assertTrue(np.all(heatmap_pos == 0))
+        self.assertTrue(np.all(heatmap_neg == 0))
+
+
+class TestGetUNETSettings(unittest.TestCase):
+    def setUp(self) -> None:
+        self.model = Model(persistence.Persistence(CONFIG_FILE_NAME_DESKTOP_APP))
+
+    def test_configured(self):
+        self.assertEqual(self.model.get_UNET_tile_overlap(), self.model.persistence.unet_tile_overlap)
+        self.assertEqual(self.model.get_UNET_batch_size(), self.model.persistence.unet_batch_size)
+
+    def test_missing_settings(self):
+        del self.model.persistence.unet_tile_overlap
+        del self.model.persistence.unet_batch_size
+
+        self.assertEqual(self.model.get_UNET_tile_overlap(), 32)
+        self.assertEqual(self.model.get_UNET_batch_size(), 4)
+
+
+def get_private_memory() -> int:
+    # the memory pages of the process which are not shared with other processes, in bytes
+    with open("/proc/self/smaps_rollup", "r") as file:
+        fields = dict(line.split(":", 1) for line in file.read().splitlines()[1:])
+    return sum(int(fields[field].split()[0]) * 1024 for field in ["Private_Clean", "Private_Dirty"])
+
+
+def measure_shared_tile(start: int, stop: int) -> int:
+    before = get_private_memory()
+    Model.predict_shared_tile_with_random_forest(start, stop)
+    return get_private_memory() - before
+
+
+def measure_loaded_model(model_path: str) -> int:
+    before = get_private_memory()
+    clf = joblib.load(model_path, mmap_mode="r")
+    after = get_private_memory()
+    del clf
+    return after - before
+
+
+class TestPredictWithRandomForest(unittest.TestCase):
+    def setUp(self) -> None:
+        rng = np.random.default_rng(0)
+        data = rng.random(size=(200, 2))
+        labels = np.where(data[:, 0] > 0.5, "100", "200")
+        self.clf = RandomForestClassifier(n_estimators=5, random_state=0).fit(data, labels)
+
+        self.array = rng.random(size=(2, 50)).astype("float32")
+        self.array[0, [3, 17, 40]] = np.nan
+
+    def test_nan_pixels(self):
+        classification, garbage_probabilities = Model.predict_with_random_forest(self.clf, self.array, 0, 8)
+
+        self.assertTrue(np.all(classification[[3, 17, 40]] == 0))
+        self.assertTrue(np.all(np.isnan(garbage_probabilities[[3, 17, 40]])))
+
+    def test_same_result_as_whole_image(self):
+        valid = ~np.isnan(self.array).any(axis=0)
+        pred_proba = self.clf.predict_proba(self.array[:, valid].T)
+
+        classification, garbage_probabilities = Model.predict_with_random_forest(self.clf, self.array, 0, 8)
+
+        self.assertTrue(np.array_equal(classification[valid], self.clf.classes_.astype(np.int32)[pred_proba.argmax(1)]))
+        self.assertTrue(np.allclose(garbage_probabilities[valid], pred_proba[:, 0]))
+
+    def test_parallel_same_result_as_serial(self):
+        classification, garbage_probabilities = Model.predict_with_random_forest(self.clf, self.array, 0, 8)
+
+        parallel_classification, parallel_garbage_probabilities = Model.predict_with_random_forest_in_parallel(
+            self.clf, self.array, 0, 8, 2
+        )
+
+        self.assertTrue(np.array_equal(classification, parallel_classification))
+        self.assertTrue(np.allclose(garbage_probabilities, parallel_garbage_probabilities, equal_nan=True))
+
+    def test_parallel_without_fork(self):
+        classification, garbage_probabilities = Model.predict_with_random_forest(self.clf, self.array, 0, 8)
+
+        parallel_classification, parallel_garbage_probabilities = Model.predict_with_random_forest_in_parallel(
+            self.clf, self.array, 0, 8, 2, start_method="spawn"
+        )
+
+        self.assertTrue(np.array_equal(classification, parallel_classification))
+        self.assertTrue(np.allclose(garbage_probabilities, parallel_garbage_probabilities, equal_nan=True))
+
+    def test_no_fork_by_default_on_macos(self):
+        with mock.patch("model.model.sys.platform", "darwin"), mock.patch(
+            "model.model.joblib.dump", wraps=joblib.dump
+        ) as dump:
+            classification, _ = Model.predict_with_random_forest_in_parallel(self.clf, self.array, 0, 8, 2)
+
+        # the classifier is saved for the spawned workers
+        dump.assert_called_once()
+        self.assertEqual(classification.shape, (50,))
+
+    @unittest.skipUnless(
+        os.path.exists("/proc/self/smaps_rollup") and "fork" in multiprocessing.get_all_start_methods(),
+        "needs the fork start method and /proc/self/smaps_rollup",
+    )
+    def test_forked_workers_share_classifier(self):
+        rng = np.random.default_rng(0)
+        data = rng.random(size=(20000, 4))
+        labels = rng.integers(1, 4, size=20000) * 100
+        clf = RandomForestClassifier(n_estimators=10, random_state=0).fit(data, labels)
+        forest_size = sum(
+            estimator.tree_.__getstate__()["nodes"].nbytes + estimator.tree_.value.nbytes
+            for estimator in clf.estimators_
+        )
+        array = rng.random(size=(4, 2000)).astype("float32")
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            model_path = os.path.join(temp_dir, "clf.joblib")
+            joblib.dump(clf, model_path)
+
+            with multiprocessing.get_context("fork").Pool(
+                1, initializer=Model.init_shared_prediction_worker, initargs=(clf, array, 0, 256)
+            ) as pool:
+                # the first tile initializes the worker (e.g. the imports of scikit-learn)
+                pool.apply(measure_shared_tile, (0, array.shape[1]))
+                shared_growth = pool.apply(measure_shared_tile, (0, array.shape[1]))
+                copy_growth = pool.apply(measure_loaded_model, (model_path,))
+
+        # loading the classifier in the worker copies the trees, the forked worker does not
+        self.assertGreater(copy_growth, 0.8 * forest_size)
+        self.assertLess(shared_growth, 0.1 * forest_size)
+
+
+class TestGetJoblibModelPath(unittest.TestCase):
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.clf = RandomForestClassifier(n_estimators=2, random_state=0).fit([[0], [1]], ["100", "200"])
+        self.clf_path = os.path.join(self.temp_dir.name, "clf.pkl")
+        joblib.dump(self.clf, self.clf_path)
+
+    def tearDown(self) -> None:
+        self.temp_dir.cleanup()
+        self.cache_dir.cleanup()
+
+    def test_cached(self):
+        model_path = Model.get_joblib_model_path(self.clf, self.clf_path, self.cache_dir.name)
+
+        self.assertEqual(os.path.dirname(model_path), self.cache_dir.name)
+        self.assertEqual(os.listdir(self.cache_dir.name), [os.path.basename(model_path)])
+        self.assertEqual(os.listdir(self.temp_dir.name), ["clf.pkl"])
+        self.assertTrue(np.array_equal(joblib.load(model_path).classes_, self.clf.classes_))
+
+        mtime = os.path.getmtime(model_path)
+        self.assertEqual(Model.get_joblib_model_path(self.clf, self.clf_path, self.cache_dir.name), model_path)
+        self.assertEqual(os.path.getmtime(model_path), mtime)
+
+    def test_outdated(self):
+        model_path = Model.get_joblib_model_path(self.clf, self.clf_path, self.cache_dir.name)
+        os.utime(model_path, ns=(0, 0))
+
+        Model.get_joblib_model_path(self.clf, self.clf_path, self.cache_dir.name)
+
+        self.assertGreater(os.path.getmtime(model_path), 0)
+
+    def test_classifiers_of_the_same_name(self):
+        other_path = os.path.join(self.temp_dir.name, "other", "clf.pkl")
+        os.makedirs(os.path.dirname(other_path))
+        joblib.dump(self.clf, other_path)
+
+        self.assertNotEqual(
+            Model.get_joblib_model_path(self.clf, self.clf_path, self.cache_dir.name),
+            Model.get_joblib_model_path(self.clf, other_path, self.cache_dir.name),
+        )
+
+    def test_temporary_directory_by_default(self):
+        with mock.patch("model.model.tempfile.gettempdir", return_value=self.cache_dir.name):
+            model_path = Model.get_joblib_model_path(self.clf, self.clf_path)
+
+        self.assertEqual(os.path.dirname(model_path), self.cache_dir.name)
+
+
+class TestGetWasteGeojsons(unittest.TestCase):
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.input_path = os.path.join(self.temp_dir.name, "heatmap.tif")
+
+        # adjacent regions of different levels, a hole, and regions touching only diagonally
+        self.heatmap = np.zeros(shape=(12, 10), dtype="uint8")
+        self.heatmap[1:6, 1:6] = 1
+        self.heatmap[2:5, 2:5] = 3
+        self.heatmap[3, 3] = 0
+        self.heatmap[1:6, 6:8] = 2
+        self.heatmap[7:9, 1:3] = 3
+        self.heatmap[9:11, 3:5] = 3
+        self.heatmap[8:11, 7:9] = 2
+
+        with rasterio.open(
+            self.input_path,
+            "w",
+            driver="GTiff",
+            height=12,
+            width=10,
+            count=1,
+            dtype="uint8",
+            crs="EPSG:32634",
+            transform=from_origin(100, 200, 3, 3),
+        ) as dataset:
+            dataset.write(self.heatmap, 1)
+            self.transform = dataset.transform
+
+    def tearDown(self) -> None:
+        self.temp_dir.cleanup()
+
+    def get_per_level_polygons(self, value: int) -> List[Polygon]:
+        # the polygons of the old per-level polygonization of the pixels with the given value
+        return [
+            shape(geometry)
+            for geometry, _ in features.shapes(
+                self.heatmap, mask=self.heatmap == value, connectivity=4, transform=self.transform
+            )
+        ]
+
+    def assert_same_polygons(self, output_file: str, value: int) -> None:
+        with open(output_file, "r") as file:
+            output_features = json.load(file)["features"]
+
+        self.assertEqual(
+            [feature["properties"]["field"] for feature in output_features], [value] * len(output_features)
+        )
+
+        polygons = sorted((shape(feature["geometry"]).normalize().wkt for feature in output_features))
+        expected = sorted(polygon.normalize().wkt for polygon in self.get_per_level_polygons(value))
+        self.assertEqual(polygons, expected)
+
+    def test_same_as_per_level_polygonization(self):
+        output_files = {value: os.path.join(self.temp_dir.name, f"{value}.geojson") for value in [1, 2, 3]}
+
+        Model.get_waste_geojsons(self.input_path, output_files)
+
+        self.assertEqual([len(self.get_per_level_polygons(value)) for value in [1, 2, 3]], [1, 2, 3])
+        for value, output_file in output_files.items():
+            self.assert_same_polygons(output_file, value)
+
+    def test_single_level(self):
+        output_file = os.path.join(self.temp_dir.name, "2.geojson")
+
+        Model.get_waste_geojson(self.input_path, output_file, 2)
+
+        self.assertEqual(sorted(os.listdir(self.temp_dir.name)), ["2.geojson", "heatmap.tif"])
+        self.assert_same_polygons(output_file, 2)
+
+    def test_missing_level(self):
+        output_file = os.path.join(self.temp_dir.name, "4.geojson")
+
+        Model.get_waste_geojsons(self.input_path, {4: output_file})
+
+        with open(output_file, "r") as file:
+            self.assertEqual(json.load(file)["features"], [])
+
+
+class TestGetClassificationColorMap(unittest.TestCase, ViewModel):
+    def setUp(self) -> None:
+        ViewModel.__init__(self, persistence=persistence.Persistence(CONFIG_FILE_NAME_DESKTOP_APP))
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, "classified.tif")
+        with rasterio.open(
+            self.path,
+            "w",
+            driver="GTiff",
+            height=2,
+            width=2,
+            count=1,
+            dtype="uint8",
+            nodata=255,
+            transform=from_origin(100, 200, 3, 3),
+        ) as dataset:
+            dataset.write(np.array([[0, 100], [200, 255]], dtype="uint8"), 1)
+
+    def tearDown(self) -> None:
+        self.temp_dir.cleanup()
+
+    def test_nodata_has_no_color(self):
+        color_map = self.get_classification_color_map(self.path)
+
+        self.assertEqual(color_map.N, 3)
+        self.assertEqual(
+            [color[:3] for color in color_map.colors],
+            [[value / 255 for value in ImageColor.getrgb(color)] for color in self.persistence.colors[:3]],
+        )
+
+
+class TestSaveTif(unittest.TestCase):
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.input_path = os.path.join(self.temp_dir.name, "input.tif")
+        with rasterio.open(
+            self.input_path,
+            "w",
+            driver="GTiff",
+            height=32,
+            width=48,
+            count=1,
+            dtype="float32",
+            transform=from_origin(100, 200, 3, 3),
+        ) as dataset:
+            dataset.write(np.zeros(shape=(1, 32, 48), dtype="float32"))
+
+    def tearDown(self) -> None:
+        self.temp_dir.cleanup()
+
+    def test_compact_profile(self):
+        output_path = os.path.join(self.temp_dir.name, "heatmap.tif")
+        heatmap = np.tile(np.arange(4, dtype="float64"), (32, 12))
+        heatmap[0, 0] = np.nan
+        profile = {"data_type": "auto", "compress": "DEFLATE", "predictor": True, "tiled": True, "tile_size": 16}
+
+        Model.save_tif(self.input_path, [heatmap], heatmap.shape, 1, output_path, profile=profile)
+
+        with rasterio.open(output_path, "r") as dataset:
+            self.assertEqual(dataset.dtypes[0], "uint8")
+            self.assertEqual(dataset.nodata, 255)
+            self.assertEqual(dataset.compression, rasterio.enums.Compression.deflate)
+            self.assertEqual(dataset.block_shapes[0], (16, 16))
+            result = dataset.read(1)
+
+        self.assertEqual(result[0, 0], 255)
+        self.assertTrue(np.array_equal(result[1:], heatmap[1:]))
+
+    def test_without_profile(self):
+        output_path = os.path.join(self.temp_dir.name, "classification.tif")
+        classification = np.full(shape=(32, 48), fill_value=100, dtype="float64")
+
+        Model.save_tif(self.input_path, [classification], classification.shape, 1, output_path)
+
+        with rasterio.open(output_path, "r") as dataset:
+            self.assertEqual(dataset.dtypes[0], "float32")
+            self.assertIsNone(dataset.compression)
+            self.assertTrue(np.array_equal(dataset.read(1), classification))
+
+
+class TestEstimateGarbageAreas(unittest.TestCase, ViewModel):
+    def setUp(self) -> None:
+        ViewModel.__init__(self, persistence=persistence.Persistence(CONFIG_FILE_NAME_DESKTOP_APP))
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.classified = np.zeros(shape=(10, 20), dtype="float32")
+        self.classified[:2, :3] = self.persistence.garbage_c_id * 100
+        self.heatmap = np.zeros(shape=(10, 20), dtype="uint8")
+        self.heatmap[0, :4] = self.persistence.low_prob_value
+        self.heatmap[1, :5] = self.persistence.high_prob_value
+
+    def tearDown(self) -> None:
+        self.temp_dir.cleanup()
+
+    def save(self, name: str, array: np.ndarray, crs: str) -> str:
+        path = os.path.join(self.temp_dir.name, name)
+        with rasterio.open(
+            path,
+            "w",
+            driver="GTiff",
+            height=array.shape[0],
+            width=array.shape[1],
+            count=1,
+            dtype=array.dtype,
+            crs=crs,
+            transform=from_origin(500000, 5200000, 4, 5),
+        ) as dataset:
+            dataset.write(array, 1)
+        return path
+
+    def test_pixel_area_of_projected_image(self):
+        classified = self.save("classified.tif", self.classified, "EPSG:32634")
+        heatmap = self.save("heatmap.tif", self.heatmap, "EPSG:32634")
+
+        areas = self.estimate_garbage_areas(classified=classified, heatmap=heatmap)
+
+        pixel_area = 20 / 0.9996**2
+        self.assertEqual(areas.keys(), {"classified", "low", "medium", "high"})
+        for key, count in [("classified", 6), ("low", 4), ("medium", 0), ("high", 5)]:
+            self.assertAlmostEqual(areas[key], count * pixel_area, places=2)
+        self.assertEqual(self.estimate_garbage_area(heatmap, "heatmap", "high"), areas["high"])
+
+    def test_pixel_area_of_web_mercator_image(self):
+        classified = self.save("classified.tif", self.classified, "EPSG:3857")
+
+        area = self.estimate_garbage_area(classified, "classified")
+
+        # the 4 x 5 m pixels of the CRS are smaller on the ground by cos^2 of the latitude (on a sphere)
+        latitude = math.degrees(math.atan(math.sinh(5200000 / 6378137)))
+        expected = 6 * 20 * math.cos(math.radians(latitude)) ** 2
+        self.assertLess(abs(area - expected), 0.005 * expected)
+
+    def test_nominal_pixel_area(self):
+        classified = self.save("classified.tif", self.classified, "EPSG:4326")
+        pixel_area = self.pixel_size_x * self.pixel_size_y
+
+        self.assertEqual(self.estimate_garbage_area(classified, "classified"), 6 * pixel_area)
+        self.assertEqual(
+            self.estimate_garbage_areas(heatmap=self.save("heatmap.tif", self.heatmap, "EPSG:4326")),
+            {"low": 4 * pixel_area, "medium": 0, "high": 5 * pixel_area},
+        )
+
+
+class TestApplyMorphology(unittest.TestCase):
+    def setUp(self) -> None:
+        self.matrix = np.zeros(shape=(7, 7), dtype="float32")
+        self.matrix[1:4, 1:4] = 1
+        self.matrix[5, 5] = 1
+
+    def test_opening(self):
+        result = Model.apply_morphology("opening", self.matrix, matrix=(3, 3))
+
+        self.assertTrue(np.array_equal(result[1:4, 1:4], np.ones(shape=(3, 3))))
+        self.assertEqual(result[5, 5], 0)
+        self.assertEqual(result.dtype, self.matrix.dtype)
+
+    def test_dilation(self):
+        result = Model.apply_morphology("dilation", self.matrix, iterations=1)
+
+        self.assertTrue(np.array_equal(result[0:5, 0:5], np.ones(shape=(5, 5))))
+        self.assertTrue(np.array_equal(result[4:7, 4:7], np.ones(shape=(3, 3))))
+        self.assertEqual(result[0, 6], 0)
+
+    def test_unknown_morphology(self):
+        with self.assertRaises(ValueError):
+            Model.apply_morphology("thinning", self.matrix)
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,102 @@
+import pyproj
+import unittest
+import threading
+import numpy as np
+import model.projections as projections
+from model.model import Model
+
+
+class TestProjections(unittest.TestCase):
+    def setUp(self) -> None:
+        rng = np.random.default_rng(0)
+        self.coords = np.stack([rng.uniform(16, 23, 100), rng.uniform(45.5, 48.5, 100)], axis=-1)
+        self.transformer = pyproj.Transformer.from_crs("epsg:4326", "epsg:3857", always_xy=True)
+
+    def expected(self, coords: np.ndarray) -> np.ndarray:
+        return np.array([self.transformer.transform(x, y) for x, y in coords])
+
+    def test_cached_transformer(self):
+        transformer = projections.get_transformer("epsg:4326", "epsg:3857")
+
+        self.assertIs(projections.get_transformer("epsg:4326", "epsg:3857"), transformer)
+        self.assertIsNot(projections.get_transformer("epsg:3857", "epsg:4326"), transformer)
+
+        projections.clear_transformers()
+        self.assertIsNot(projections.get_transformer("epsg:4326", "epsg:3857"), transformer)
+
+    def test_transformers_per_thread(self):
+        transformers = list()
+        thread = threading.Thread(
+            target=lambda: transformers.append(projections.get_transformer("epsg:4326", "epsg:3857"))
+        )
+        thread.start()
+        thread.join()
+
+        self.assertIsNot(projections.get_transformer("epsg:4326", "epsg:3857"), transformers[0])
+
+    def test_transform_coordinates(self):
+        result = projections.transform_coordinates(self.coords, "epsg:4326", "epsg:3857")
+
+        self.assertEqual(result.shape, self.coords.shape)
+        self.assertTrue(np.array_equal(result, self.expected(self.coords)))
+
+        result = projections.transform_coordinates(self.coords.reshape(10, 10, 2), "epsg:4326", "epsg:3857")
+        self.assertTrue(np.array_equal(result.reshape(-1, 2), self.expected(self.coords)))
+
+    def test_wrong_shape(self):
+        with self.assertRaises(ValueError):
+            projections.transform_coordinates(np.zeros(shape=(4, 3)), "epsg:4326", "epsg:3857")
+
+    def test_transform_rings(self):
+        rings = [self.coords[:10].tolist(), self.coords[10:11].tolist(), self.coords[11:].tolist()]
+
+        result = projections.transform_rings(rings, "epsg:4326", "epsg:3857")
+
+        self.assertEqual([len(ring) for ring in result], [10, 1, 89])
+        self.assertTrue(np.array_equal(np.concatenate(result), self.expected(self.coords)))
+        self.assertEqual(projections.transform_rings([], "epsg:4326", "epsg:3857"), [])
+
+    def test_transform_list_of_coordinates(self):
+        result = Model.transform_list_of_coordinates_to_crs(self.coords.tolist(), "epsg:4326", "epsg:3857")
+
+        self.assertIsInstance(result, list)
+        self.assertTrue(np.array_equal(result, self.expected(self.coords)))
+
+    def test_transform_dict_of_coordinates(self):
+        data_file = {
+            "type": "FeatureCollection",
+            "features": [
+                {
+                    "type": "Feature",
+                    "properties": {"name": str(index)},
+                    "geometry": {"type": "Polygon", "coordinates": [self.coords[index : index + 20].tolist()]},
+                }
+                for index in range(0, 100, 20)
+            ],
+        }
+
+        result = Model.transform_dict_of_coordinates_to_crs(data_file, "epsg:3857")
+
+        self.assertEqual(result["crs"]["properties"]["name"], "epsg:3857")
+        self.assertNotIn("crs", data_file)
+        for index, feature in enumerate(result["features"]):
+            self.assertEqual(feature["properties"]["name"], str(index * 20))
+            self.assertEqual(feature["geometry"]["type"], "Polygon")
+            self.assertTrue(
+                np.array_equal(
+                    feature["geometry"]["coordinates"][0], self.expected(self.coords[index * 20 : index * 20 + 20])
+                )
+            )
+            # the input is not modified
+            self.assertEqual(
+                data_file["features"][index]["geometry"]["coordinates"][0][0], self.coords[index * 20].tolist()
+            )
+
+        result = Model.transform_dict_of_coordinates_to_crs(result, "epsg:4326")
+        self.assertTrue(
+            np.allclose(np.concatenate([f["geometry"]["coordinates"][0] for f in result["features"]]), self.coords)
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+import os
+import unittest
+import tempfile
+import numpy as np
+import torch
+import model.quantization as quantization
+import model.unet_export as unet_export
+from model.unet import UNET, UNETPP
+
+
+class TestQuantize(unittest.TestCase):
+    def setUp(self) -> None:
+        torch.manual_seed(0)
+        rng = np.random.default_rng(0)
+        self.arrays = [rng.random(size=(4, 48, 40)).astype("float32") for _ in range(2)]
+        self.x = torch.from_numpy(rng.random(size=(2, 4, 32, 32)).astype("float32"))
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, "unet_int8.pt")
+
+    def tearDown(self) -> None:
+        self.temp_dir.cleanup()
+
+    def test_close_to_float_prediction(self):
+        for unet in [UNET().eval(), UNETPP().eval()]:
+            quantized = quantization.quantize(unet, self.arrays, tile_size=32, tiles_per_image=4)
+
+            with torch.no_grad():
+                expected = unet.predict(self.x)
+                result = quantized.predict(self.x)
+
+            self.assertEqual(result.shape, expected.shape)
+            self.assertTrue(torch.allclose(result, expected, atol=0.05))
+
+    def test_quantized_convolutions(self):
+        quantized = quantization.quantize(UNET().eval(), self.arrays, tile_size=32, tiles_per_image=2)
+
+        self.assertTrue(any(isinstance(module, torch.ao.nn.quantized.Conv2d) for module in quantized.modules()))
+
+    def test_int8_backend(self):
+        unet = UNET().eval()
+        quantized = quantization.quantize(unet, self.arrays, tile_size=32, tiles_per_image=2)
+        unet_export.save_torchscript(quantized, self.path, tile_size=32)
+        backend = unet_export.load_backend(self.path, "int8")
+
+        with torch.no_grad():
+            expected = quantized.predict(self.x)
+            result = backend.predict(self.x)
+
+        self.assertEqual(backend.tile_size, 32)
+        self.assertTrue(torch.allclose(result, expected, atol=1e-5))
+
+
+class TestEvaluate(unittest.TestCase):
+    def test_compare(self):
+        torch.manual_seed(0)
+        unet = UNET().eval()
+        array = np.random.default_rng(0).random(size=(4, 40, 40)).astype("float32")
+        labels = np.zeros(shape=(40, 40), dtype=bool)
+        labels[10:20, 10:20] = True
+
+        results = quantization.compare(unet, unet, array, labels, tile_size=32, overlap=8)
+
+        self.assertEqual(results["fp32"]["accuracy"], results["int8"]["accuracy"])
+        self.assertEqual(results["delta"]["iou"], 0)
+        self.assertGreater(results["delta"]["speedup"], 0)
+        self.assertTrue(0 <= results["fp32"]["accuracy"] <= 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+import unittest
+import numpy as np
+import model.regions as regions
+
+
+class TestRegions(unittest.TestCase):
+    def setUp(self) -> None:
+        self.matrix = np.array(
+            [
+                [1, 1, 0, 0, 0],
+                [1, 0, 0, 2, 0],
+                [0, 0, 0, 0, 1],
+                [0, 3, 0, 0, 1],
+            ]
+        )
+
+    def test_find_regions_with_4_connectivity(self):
+        # act
+        result = regions.find_regions(self.matrix, [1, 2])
+
+        # assert
+        self.assertEqual(len(result), 3)
+        self.assertEqual(result[0].bbox, (0, 0, 1, 1))
+        self.assertEqual(result[0].pixel_count, 3)
+        self.assertAlmostEqual(result[0].centroid[0], 1 / 3)
+        self.assertAlmostEqual(result[0].centroid[1], 1 / 3)
+        self.assertEqual(result[1].bbox, (1, 3, 1, 3))
+        self.assertEqual(result[2].bbox, (2, 4, 3, 4))
+        self.assertEqual(result[2].centroid, (2.5, 4.0))
+
+    def test_find_regions_with_8_connectivity(self):
+        # act
+        result = regions.find_regions(self.matrix, [1, 2], connectivity=8)
+
+        # assert
+        self.assertEqual(len(result), 2)
+        self.assertEqual(result[1].bbox, (1, 3, 3, 4))
+        self.assertEqual(result[1].pixel_count, 3)
+
+    def test_find_regions_with_min_area(self):
+        # act
+        result = regions.find_regions(self.matrix, [1, 2, 3], min_area=2)
+
+        # assert
+        self.assertEqual([region.pixel_count for region in result], [3, 2])
+
+    def test_find_regions_without_search_value(self):
+        # act
+        result = regions.find_regions(self.matrix, [100])
+
+        # assert
+        self.assertEqual(result, [])
+
+    def test_label_regions_with_wrong_connectivity(self):
+        with self.assertRaises(ValueError):
+            regions.label_regions(self.matrix, [1], connectivity=6)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+import os
+import pickle
+import unittest
+import tempfile
+import torch
+from model.registry import ModelRegistry
+from model.unet import UNET, UNETPP
+
+
+class TestModelRegistry(unittest.TestCase):
+    def setUp(self) -> None:
+        self.registry = ModelRegistry(max_models=2)
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, "model.sav")
+        self.write_model({"version": 1})
+
+    def tearDown(self) -> None:
+        self.temp_dir.cleanup()
+
+    def write_model(self, model: object) -> None:
+        with open(self.path, "wb") as file:
+            pickle.dump(model, file)
+
+    def test_cached_model(self):
+        first = self.registry.get_random_forest(self.path)
+        second = self.registry.get_random_forest(self.path)
+
+        metrics = list(self.registry.get_metrics().values())[0]
+        self.assertIs(first, second)
+        self.assertEqual(metrics.loads, 1)
+        self.assertEqual(metrics.hits, 1)
+
+    def test_reload_changed_file(self):
+        self.registry.get_random_forest(self.path)
+        self.write_model({"version": 2, "trees": 10})
+        os.utime(self.path, ns=(0, 0))
+
+        model = self.registry.get_random_forest(self.path)
+
+        self.assertEqual(model["version"], 2)
+        self.assertEqual(list(self.registry.get_metrics().values())[0].loads, 2)
+
+    def test_least_recently_used_models_are_dropped(self):
+        loads = list()
+
+        def loader(path):
+            loads.append(path)
+            return object()
+
+        self.registry.get("a", self.path, loader)
+        self.registry.get("b", self.path, loader)
+        self.registry.get("a", self.path, loader)
+        self.registry.get("c", self.path, loader)
+        self.registry.get("a", self.path, loader)
+        self.registry.get("b", self.path, loader)
+
+        self.assertEqual(len(loads), 4)
+
+    def test_missing_file(self):
+        with self.assertRaises(OSError):
+            self.registry.get_random_forest(os.path.join(self.temp_dir.name, "missing.sav"))
+
+    def test_memory_mapped_unet(self):
+        torch.manual_seed(0)
+        unet = UNETPP(pretrained_unet=UNET(), deep_vision=True).eval()
+        path = os.path.join(self.temp_dir.name, "unetpp.sav")
+        torch.save({"model_state_dict": unet.state_dict(), "pretrained": True, "deep_vision": True}, path)
+        x = torch.rand(size=(1, 4, 32, 32))
+
+        loaded = self.registry.get_unet(path, "unetpp")
+        pruned = self.registry.get_unet(path, "unetpp", pruning_level=1)
+
+        with torch.no_grad():
+            self.assertTrue(torch.equal(loaded.predict(x), unet.predict(x)))
+        self.assertIs(self.registry.get_unet(path, "unetpp"), loaded)
+        self.assertIsNot(pruned, loaded)
+        self.assertEqual(pruned.pruning_level, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,171 @@
+import unittest
+import numpy as np
+import torch
+import model.tiling as tiling
+from model.unet import UNET, UNETPP
+
+
+class TestGetTiles(unittest.TestCase):
+    def test_tile_starts(self):
+        self.assertEqual(tiling.get_tile_starts(100, 32, 8), [0, 24, 48, 68])
+        self.assertEqual(tiling.get_tile_starts(32, 32, 8), [0])
+
+    def test_tiles_cover_image(self):
+        covered = np.zeros(shape=(70, 90), dtype=bool)
+
+        for row, col in tiling.get_tiles(covered.shape, 32, 4):
+            covered[row : row + 32, col : col + 32] = True
+
+        self.assertTrue(covered.all())
+
+    def test_tile_weights(self):
+        weights = tiling.get_tile_weights(16)
+
+        self.assertEqual(weights.shape, (16, 16))
+        self.assertTrue(np.all(weights > 0))
+        self.assertTrue(np.allclose(weights, weights.T))
+
+
+class CountingUNET(UNET):
+    def __init__(self):
+        super().__init__(in_channels=4)
+        self.tiles = 0
+
+    def predict(self, x):
+        self.tiles += x.shape[0]
+        return super().predict(x)
+
+
+class TestMaskedTiles(unittest.TestCase):
+    def setUp(self) -> None:
+        torch.manual_seed(0)
+        self.unet = CountingUNET()
+        self.array = np.random.default_rng(0).random(size=(4, 64, 96)).astype("float32")
+        # only the left third of the image is valid, e.g. the water mask of a river
+        self.array[:, :, 40:] = np.nan
+
+    def test_valid_fractions(self):
+        valid = np.zeros(shape=(64, 64), dtype=bool)
+        valid[:16, :32] = True
+
+        fractions = tiling.get_valid_fractions(valid, [(0, 0), (0, 32), (32, 0), (8, 16)], 32)
+
+        self.assertTrue(np.allclose(fractions, [0.5, 0, 0, 0.125]))
+
+    def test_fully_masked_tiles_are_skipped(self):
+        array = np.nan_to_num(self.array, nan=0)
+        expected = tiling.predict_tiled(self.unet, array, tile_size=32, overlap=8)
+        expected[:, 40:] = np.nan
+        self.unet.tiles = 0
+
+        result = tiling.predict_tiled(self.unet, self.array, tile_size=32, overlap=8)
+
+        self.assertEqual(self.unet.tiles, 6)
+        self.assertTrue(np.array_equal(result, expected, equal_nan=True))
+
+    def test_tiles_with_few_valid_pixels_are_skipped(self):
+        result = tiling.predict_tiled(self.unet, self.array, tile_size=32, overlap=8, min_valid_fraction=0.5)
+
+        # the tiles starting at column 24 have exactly half valid pixels
+        self.assertEqual(self.unet.tiles, 3)
+        self.assertTrue(np.all(result[:, 32:40] == 0))
+        self.assertTrue(np.all(np.isnan(result[:, 40:])))
+
+    def test_invalid_min_valid_fraction(self):
+        with self.assertRaises(ValueError):
+            tiling.predict_tiled(self.unet, self.array, tile_size=32, min_valid_fraction=1)
+
+
+class BatchRecordingUNET(UNET):
+    def __init__(self):
+        super().__init__(in_channels=4)
+        self.batch_sizes = list()
+
+    def predict(self, x):
+        self.batch_sizes.append(x.shape[0])
+        return super().predict(x)
+
+
+class TestPredictTiledImages(unittest.TestCase):
+    def setUp(self) -> None:
+        torch.manual_seed(0)
+        self.unet = BatchRecordingUNET()
+        rng = np.random.default_rng(0)
+        self.arrays = [
+            ("a", rng.random(size=(4, 20, 30)).astype("float32")),
+            ("b", rng.random(size=(4, 50, 40)).astype("float32")),
+            ("c", np.full(shape=(4, 32, 32), fill_value=np.nan, dtype="float32")),
+            ("d", rng.random(size=(4, 32, 32)).astype("float32")),
+        ]
+
+    def test_same_as_single_images(self):
+        results = dict(tiling.predict_tiled_images(self.unet, self.arrays, tile_size=32, overlap=8, batch_size=3))
+
+        self.assertEqual(sorted(results.keys()), ["a", "b", "c", "d"])
+        for key, array in self.arrays:
+            expected = tiling.predict_tiled(self.unet, array, tile_size=32, overlap=8)
+            self.assertTrue(np.allclose(results[key], expected, atol=1e-5, equal_nan=True))
+
+    def test_full_batches(self):
+        list(tiling.predict_tiled_images(self.unet, self.arrays, tile_size=32, overlap=8, batch_size=3))
+
+        # 1 + 4 + 0 + 1 tiles
+        self.assertEqual(self.unet.batch_sizes, [3, 3])
+
+    def test_lazy_reading(self):
+        read = list()
+
+        def read_arrays():
+            for key, array in self.arrays:
+                read.append(key)
+                yield key, array
+
+        predictions = tiling.predict_tiled_images(self.unet, read_arrays(), tile_size=32, overlap=8, batch_size=2)
+        key, _ = next(predictions)
+
+        self.assertEqual(key, "a")
+        self.assertEqual(read, ["a", "b"])
+
+
+class TestPredictTiled(unittest.TestCase):
+    def setUp(self) -> None:
+        torch.manual_seed(0)
+        self.unet = UNET(in_channels=4)
+        self.array = np.random.default_rng(0).random(size=(4, 50, 70)).astype("float32")
+
+    def test_exact_output_shape(self):
+        prediction = tiling.predict_tiled(self.unet, self.array, tile_size=32, overlap=8, batch_size=3)
+
+        self.assertEqual(prediction.shape, (50, 70))
+        self.assertTrue(np.all((prediction >= 0) & (prediction <= 1)))
+
+    def test_same_as_whole_image_with_single_tile(self):
+        array = self.array[:, :32, :32]
+        self.unet.eval()
+        with torch.no_grad():
+            expected = self.unet.predict(torch.tensor(array).unsqueeze(0)).squeeze().numpy()
+
+        prediction = tiling.predict_tiled(self.unet, array, tile_size=32, overlap=8)
+
+        self.assertTrue(np.allclose(prediction, expected, atol=1e-6))
+
+    def test_small_image_and_nan_values(self):
+        array = self.array[:, :20, :25].copy()
+        array[1, 3, 4] = np.nan
+
+        prediction = tiling.predict_tiled(UNETPP(in_channels=4), array, tile_size=32, overlap=8)
+
+        self.assertEqual(prediction.shape, (20, 25))
+        self.assertTrue(np.isnan(prediction[3, 4]))
+        self.assertEqual(np.count_nonzero(np.isnan(prediction)), 1)
+
+    def test_wrong_tile_size(self):
+        with self.assertRaises(ValueError):
+            tiling.predict_tiled(self.unet, self.array, tile_size=30)
+
+        with self.assertRaises(ValueError):
+            tiling.predict_tiled(self.unet, self.array, tile_size=32, overlap=32)
+
+
+if __name__ == "__main__":
+    unittest.main()
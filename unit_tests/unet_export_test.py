@@ -0,0 +1,186 @@
+import os
+import unittest
+import tempfile
+import numpy as np
+import torch
+import model.tiling as tiling
+import model.unet_export as unet_export
+from torch import nn
+from model.unet import UNET, UNETPP
+
+
+class TestFreeze(unittest.TestCase):
+    def setUp(self) -> None:
+        torch.manual_seed(0)
+        self.x = torch.rand(size=(2, 4, 32, 32))
+
+    @staticmethod
+    def randomize_batch_norms(unet: nn.Module) -> None:
+        for module in unet.modules():
+            if isinstance(module, nn.BatchNorm2d):
+                module.running_mean.uniform_(-0.1, 0.1)
+                module.running_var.uniform_(0.5, 1.5)
+
+    def test_same_prediction(self):
+        for unet in [UNET(), UNETPP(deep_vision=True)]:
+            TestFreeze.randomize_batch_norms(unet)
+            unet.eval()
+
+            with torch.no_grad():
+                expected = unet.predict(self.x)
+                result = unet_export.freeze(unet).predict(self.x)
+
+            self.assertTrue(torch.allclose(result, expected, atol=1e-5))
+
+    def test_no_batch_norm_and_dropout(self):
+        frozen = unet_export.freeze(UNETPP())
+
+        self.assertFalse(any(isinstance(module, (nn.BatchNorm2d, nn.Dropout)) for module in frozen.modules()))
+
+
+class TestPruning(unittest.TestCase):
+    def setUp(self) -> None:
+        torch.manual_seed(0)
+        self.unet = UNETPP(deep_vision=True).eval()
+        self.x = torch.rand(size=(2, 4, 32, 32))
+
+    def test_pruned_prediction_uses_one_head(self):
+        with torch.no_grad():
+            full = self.unet.forward(self.x)
+            for level in [1, 2, 3, 4]:
+                self.unet.set_pruning_level(level)
+                result = self.unet.predict(self.x)
+
+                self.assertTrue(torch.allclose(result, torch.sigmoid(full[level - 1]), atol=1e-6))
+
+    def test_pruning_level_0_averages_heads(self):
+        with torch.no_grad():
+            expected = torch.sigmoid(sum(self.unet.forward(self.x)) / 4)
+            result = self.unet.predict(self.x)
+
+        self.assertTrue(torch.allclose(result, expected, atol=1e-6))
+
+    def test_invalid_pruning_level(self):
+        with self.assertRaises(ValueError):
+            self.unet.set_pruning_level(5)
+
+        with self.assertRaises(ValueError):
+            UNETPP(deep_vision=False, pruning_level=2)
+
+    def test_export_pruned_network(self):
+        self.unet.set_pruning_level(2)
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, "unetpp.pt")
+            unet_export.export(self.unet, path, "torchscript", tile_size=32)
+            backend = unet_export.load_backend(path, "torchscript")
+
+            with torch.no_grad():
+                expected = self.unet.predict(self.x)
+                result = backend.predict(self.x)
+
+        self.assertTrue(torch.allclose(result, expected, atol=1e-5))
+
+    def test_compare_pruning_levels(self):
+        array = np.random.default_rng(0).random(size=(4, 32, 32)).astype("float32")
+        labels = np.zeros(shape=(32, 32), dtype=bool)
+
+        results = unet_export.compare_pruning_levels(self.unet, array, labels, tile_size=32, overlap=0)
+
+        self.assertEqual(list(results.keys()), [0, 1, 2, 3, 4])
+        self.assertEqual(results[0]["speedup"], 1)
+        self.assertEqual(self.unet.pruning_level, 0)
+
+
+class TestLowMemory(unittest.TestCase):
+    def setUp(self) -> None:
+        torch.manual_seed(0)
+        self.x = torch.rand(size=(3, 4, 32, 48))
+
+    def test_same_prediction_as_single_samples(self):
+        for unet in [UNETPP(deep_vision=True), UNETPP(deep_vision=False), UNETPP(deep_vision=True, pruning_level=2)]:
+            unet.eval()
+
+            with torch.no_grad():
+                expected = torch.cat([unet.predict(sample) for sample in self.x.split(1)])
+                result = unet.predict_low_memory(self.x)
+
+            self.assertTrue(torch.equal(result, expected))
+
+    def test_close_to_batch_prediction(self):
+        unet = UNETPP(deep_vision=True).eval()
+
+        with torch.no_grad():
+            expected = unet.predict(self.x)
+            unet.low_memory = True
+            result = unet.predict(self.x)
+
+        self.assertTrue(torch.allclose(result, expected, atol=1e-6))
+
+    def test_not_divisible_input(self):
+        unet = UNETPP().eval()
+        x = torch.rand(size=(1, 4, 33, 40))
+
+        with torch.no_grad():
+            expected = unet.predict(x)
+            unet.low_memory = True
+            result = unet.predict(x)
+
+        self.assertTrue(torch.equal(result, expected))
+
+    def test_export_low_memory_network(self):
+        unet = UNETPP(low_memory=True).eval()
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, "unetpp.pt")
+            unet_export.export(unet, path, "torchscript", tile_size=32)
+            backend = unet_export.load_backend(path, "torchscript")
+            x = torch.rand(size=(3, 4, 32, 32))
+
+            with torch.no_grad():
+                result = backend.predict(x)
+
+        self.assertEqual(result.shape, (3, 1, 32, 32))
+
+
+class TestExport(unittest.TestCase):
+    def setUp(self) -> None:
+        torch.manual_seed(0)
+        self.unet = UNET().eval()
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, "unet.pt")
+
+    def tearDown(self) -> None:
+        self.temp_dir.cleanup()
+
+    def test_torchscript_backend(self):
+        unet_export.export(self.unet, self.path, "torchscript", tile_size=32)
+        backend = unet_export.load_backend(self.path, "torchscript")
+        x = torch.rand(size=(3, 4, 32, 32))
+
+        with torch.no_grad():
+            expected = self.unet.predict(x)
+            result = backend.predict(x)
+
+        self.assertEqual(backend.in_channels, 4)
+        self.assertEqual(backend.tile_size, 32)
+        self.assertTrue(torch.allclose(result, expected, atol=1e-5))
+
+    def test_tiled_inference_with_backend(self):
+        unet_export.export(self.unet, self.path, "torchscript", tile_size=32)
+        backend = unet_export.load_backend(self.path, "torchscript")
+        array = np.random.default_rng(0).random(size=(4, 40, 50)).astype("float32")
+
+        expected = tiling.predict_tiled(self.unet, array, tile_size=32, overlap=8)
+        result = tiling.predict_tiled(backend, array, tile_size=32, overlap=8)
+
+        self.assertTrue(np.allclose(result, expected, atol=1e-5))
+
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            unet_export.export(self.unet, self.path, "tensorrt")
+
+        with self.assertRaises(ValueError):
+            unet_export.load_backend(self.path, "tensorrt")
+
+
+if __name__ == "__main__":
+    unittest.main()
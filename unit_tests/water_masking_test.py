@@ -0,0 +1,111 @@
+import unittest
+import cv2 as cv
+import numpy as np
+import model.water_masking as water_masking
+from scipy.ndimage import median_filter
+from skimage.filters import threshold_minimum
+
+
+class TestCreateWaterMask(unittest.TestCase):
+    def setUp(self) -> None:
+        rng = np.random.default_rng(0)
+        shape = (200, 150)
+        water = np.zeros(shape=shape, dtype=bool)
+        water[:, :60] = True
+        self.ndwi = np.where(water, rng.normal(0.4, 0.15, shape), rng.normal(-0.4, 0.2, shape)).astype("float32")
+        self.ndwi[rng.random(size=shape) < 0.01] = np.nan
+
+        median_filtered = median_filter(np.nan_to_num(self.ndwi, nan=np.nanmin(self.ndwi)), size=3)
+        self.threshold = threshold_minimum(median_filtered)
+        self.mask = np.uint8(median_filtered > self.threshold) * 255
+
+    def test_median_filter(self):
+        image = np.nan_to_num(self.ndwi)
+
+        self.assertTrue(np.array_equal(water_masking.median_filter_3x3(image), median_filter(image, size=3)))
+
+    def test_same_as_full_histogram(self):
+        result = water_masking.create_water_mask(self.ndwi, False)
+
+        self.assertEqual(result.threshold, self.threshold)
+        self.assertTrue(np.array_equal(result.mask, self.mask))
+        self.assertTrue(result.median_time >= 0 and result.threshold_time >= 0)
+
+    def test_inverted(self):
+        result = water_masking.create_water_mask(self.ndwi, True)
+
+        self.assertTrue(np.array_equal(result.mask, 255 - self.mask))
+
+    def test_subsampled_histogram(self):
+        result = water_masking.create_water_mask(self.ndwi, False, max_samples=5000)
+
+        self.assertLess(abs(result.threshold - self.threshold), 0.1)
+        self.assertGreater(np.mean(result.mask == self.mask), 0.999)
+
+    def test_histogram_range(self):
+        image = np.arange(100, dtype="float32").reshape(10, 10)
+
+        counts, centers = water_masking.get_histogram(image, max_samples=10)
+
+        self.assertEqual(counts.sum(), 10)
+        self.assertEqual(len(centers), water_masking.HISTOGRAM_BINS)
+        self.assertAlmostEqual(centers[0], 99 / 512)
+        self.assertAlmostEqual(centers[-1], 99 - 99 / 512, places=4)
+
+
+class TestMorphology(unittest.TestCase):
+    def setUp(self) -> None:
+        rows, cols = np.mgrid[0:300, 0:400]
+        self.mask = (
+            np.uint8(((rows - 150) ** 2 / 2 + (cols - 180) ** 2 < 90**2) | ((cols > 300) & (cols < 306))) * 255
+        )
+        self.mask[140:152, 170:182] = 0
+
+    def assert_differs_at_edges(self, result: np.ndarray, expected: np.ndarray, max_fraction: float) -> None:
+        # the pixels at most 2 pixels away from the edges of the expected mask
+        kernel = np.ones(shape=(5, 5), dtype=np.uint8)
+        edges = cv.dilate(expected, kernel) != cv.erode(expected, kernel)
+
+        self.assertLess(np.mean(result != expected), max_fraction)
+        self.assertTrue(np.all(edges[result != expected]))
+
+    def test_single_pixel_dilation(self):
+        mask = np.zeros(shape=(9, 9), dtype=np.uint8)
+        mask[4, 4] = 255
+
+        for kernel_size in [1, 3]:
+            kernel = cv.getStructuringElement(cv.MORPH_ELLIPSE, (kernel_size, kernel_size))
+            result = water_masking.dilate(mask, water_masking.get_disc_radius(kernel_size))
+
+            self.assertTrue(np.array_equal(result, cv.dilate(mask, kernel)))
+
+    def test_bounded_difference(self):
+        for kernel_size in [5, 15, 20, 50]:
+            for operation in ["erode", "dilate", "open", "close"]:
+                expected = water_masking.apply_morphology(self.mask, operation, kernel_size, 0)
+                result = water_masking.apply_morphology(self.mask, operation, kernel_size, 1)
+
+                self.assertEqual(result.dtype, np.uint8)
+                self.assert_differs_at_edges(result, expected, 0.01)
+
+    def test_transform(self):
+        expected = water_masking.morphological_transform(self.mask, 15, 50, 20, 0)
+
+        self.assertTrue(np.array_equal(expected, water_masking.morphological_transform(self.mask, 15, 50, 20, 51)))
+        self.assert_differs_at_edges(water_masking.morphological_transform(self.mask, 15, 50, 20, 1), expected, 0.01)
+
+    def test_unknown_operation(self):
+        with self.assertRaises(ValueError):
+            water_masking.apply_morphology(self.mask, "thinning", 3, 1)
+
+    def test_benchmark(self):
+        results = water_masking.benchmark_morphology(self.mask, [3, 25])
+
+        self.assertEqual(list(results.keys()), [3, 25])
+        for result in results.values():
+            self.assertTrue(result["opencv"] > 0 and result["distance_transform"] > 0)
+            self.assertLess(result["difference"], 0.005)
+
+
+if __name__ == "__main__":
+    unittest.main()
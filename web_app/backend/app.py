@@ -10,6 +10,7 @@ from flask_migrate import Migrate
 from sqlalchemy.exc import IntegrityError
 from flask import Flask, jsonify, request
 from model.model import FloodPrediction
+import model.projections as projections
 from models import db, User, SatelliteImage, Annotation
 from flask_login import (
     LoginManager,
@@ -23,7 +24,6 @@ import requests
 import geopandas as gpd
 import rasterio
 from shapely.geometry import Point
-from pyproj import Transformer
 from models import db
 
 # Create app
@@ -368,8 +368,7 @@ def get_forecasts(station_id):
 
 
 def transform_coordinates(lon, lat, source_crs="EPSG:4326", target_crs="EPSG:23700"):
-    transformer = Transformer.from_crs(source_crs, target_crs, always_xy=True)
-    ex, ey = transformer.transform(lon, lat)
+    ex, ey = projections.get_transformer(source_crs, target_crs).transform(lon, lat)
     return Point(ex, ey)
 
 